@@ -0,0 +1 @@
+"""Helpers for the Deskbird booking automation"""
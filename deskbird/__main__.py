@@ -0,0 +1,3 @@
+from deskbird.cli import main
+
+raise SystemExit(main())
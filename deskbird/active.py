@@ -0,0 +1,67 @@
+"""The per-thread state that instrumented code records into during a run
+
+Metrics, debug capture, checkpoints, the memory watchdog and the availability
+history each have one ``ActiveSlot``. A run activates its objects on the
+thread doing the work (batch and daemon runs each get their own thread), and
+helpers such as ``phase()`` or ``snapshot()`` look the current one up through
+the slot. With nothing active the slot returns a no-op stand-in, so
+instrumented code never has to check whether a run is in progress.
+"""
+import threading
+
+
+class ActiveSlot:
+    """One kind of run state, active per thread, with a no-op stand-in"""
+
+    def __init__(self, null):
+        self.null = null
+        self._local = threading.local()
+
+    def current(self):
+        value = getattr(self._local, "value", None)
+        return self.null if value is None else value
+
+    def set(self, value):
+        self._local.value = value
+
+    def clear(self, value):
+        """Deactivate ``value`` if it is still the active one on this thread"""
+        if getattr(self._local, "value", None) is value:
+            self._local.value = None
+
+
+class Activatable:
+    """Mixin giving run state activate()/deactivate() through the class's ``slot``"""
+
+    slot = None
+
+    def activate(self):
+        """Make this the object the module's helpers use on this thread"""
+        self.slot.set(self)
+        return self
+
+    def deactivate(self):
+        self.slot.clear(self)
+
+
+class ActiveRun:
+    """The objects a run activated, deactivated together in reverse order by close()"""
+
+    def __init__(self):
+        self.objects = []
+
+    def add(self, obj):
+        """Activate ``obj`` and return it; None (a disabled feature) is passed through"""
+        if obj is not None:
+            self.objects.append(obj.activate())
+        return obj
+
+    def close(self):
+        while self.objects:
+            self.objects.pop().deactivate()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
@@ -0,0 +1,208 @@
+import os
+import json
+import logging
+from datetime import datetime
+from urllib.parse import urlencode
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_API_URL = "https://api.deskbird.com/v1.1"
+
+# Endpoints called by the Deskbird web app, kept together so they are easy to
+# adjust when Deskbird changes them (the offline stub server mirrors these)
+ENDPOINTS = {
+    "user_bookings": "/user/bookings",
+    "availability": "/internalWorkspaces/{office_id}/zones/availability",
+    "create_booking": "/bookings",
+}
+
+# Reads the Firebase ID token the Deskbird app keeps in IndexedDB, falling
+# back to anything token-shaped in localStorage
+CAPTURE_TOKEN_SCRIPT = """
+const done = arguments[arguments.length - 1];
+function fromLocalStorage() {
+    for (let i = 0; i < window.localStorage.length; i++) {
+        const key = window.localStorage.key(i);
+        const value = window.localStorage.getItem(key) || "";
+        try {
+            const parsed = JSON.parse(value);
+            if (parsed && parsed.stsTokenManager && parsed.stsTokenManager.accessToken) {
+                return parsed.stsTokenManager.accessToken;
+            }
+        } catch (e) {}
+        if (/token/i.test(key) && /^[\\w-]+\\.[\\w-]+\\.[\\w-]+$/.test(value)) {
+            return value;
+        }
+    }
+    return null;
+}
+const request = window.indexedDB.open("firebaseLocalStorageDb");
+request.onerror = () => done(fromLocalStorage());
+request.onsuccess = () => {
+    const db = request.result;
+    if (!db.objectStoreNames.contains("firebaseLocalStorage")) {
+        done(fromLocalStorage());
+        return;
+    }
+    const rows = db.transaction("firebaseLocalStorage", "readonly").objectStore("firebaseLocalStorage").getAll();
+    rows.onerror = () => done(fromLocalStorage());
+    rows.onsuccess = () => {
+        for (const row of rows.result) {
+            const user = row.value || {};
+            if (user.stsTokenManager && user.stsTokenManager.accessToken) {
+                done(user.stsTokenManager.accessToken);
+                return;
+            }
+        }
+        done(fromLocalStorage());
+    };
+};
+"""
+
+
+class DeskbirdApiError(Exception):
+    """Raised when the Deskbird API returns an error or an unexpected response"""
+
+    def __init__(self, message, status=None):
+        super().__init__(message)
+        self.status = status
+
+
+def capture_bearer_token(driver):
+    """Read the bearer token from a browser that is logged in to Deskbird"""
+    token = driver.execute_async_script(CAPTURE_TOKEN_SCRIPT)
+    if not token:
+        raise DeskbirdApiError("No Deskbird access token found in the browser session")
+    logger.debug(f"Captured bearer token ({len(token)} characters)")
+    return token
+
+
+def normalize_desk_name(name):
+    """Collapse whitespace and case so '5.09  d' matches 'Desk 5.09 D'"""
+    return " ".join(name.replace("Desk", " ").split()).lower()
+
+
+class DeskbirdClient:
+    """Minimal Deskbird API client sharing one pooled HTTP connection"""
+
+    def __init__(self, token, base_url=None, timeout=10):
+        import urllib3
+        self.base_url = (base_url or os.environ.get("DESKBIRD_API_URL", DEFAULT_API_URL)).rstrip("/")
+        self._http = urllib3.PoolManager(
+            maxsize=8,
+            headers={
+                "Authorization": f"Bearer {token}",
+                "Accept": "application/json",
+                "Content-Type": "application/json",
+            },
+            timeout=urllib3.Timeout(total=timeout),
+            # Only reads are retried automatically; a POST that failed may still have been committed
+            retries=urllib3.Retry(total=2, backoff_factor=0.2, status_forcelist=(502, 503, 504), allowed_methods=frozenset({"GET"})),
+        )
+
+    def _request(self, method, path, params=None, body=None):
+        url = f"{self.base_url}{path}"
+        if params:
+            url = f"{url}?{urlencode(params)}"
+        logger.debug(f"{method} {url}")
+        import urllib3
+        payload = json.dumps(body).encode() if body is not None else None
+        try:
+            response = self._http.request(method, url, body=payload)
+        except urllib3.exceptions.HTTPError as e:
+            raise DeskbirdApiError(f"{method} {path} failed: {type(e).__name__}: {str(e)[:200]}")
+        if response.status >= 400:
+            raise DeskbirdApiError(f"{method} {path} failed with HTTP {response.status}: {response.data[:200]!r}", response.status)
+        if not response.data:
+            return {}
+        try:
+            return json.loads(response.data)
+        except ValueError:
+            raise DeskbirdApiError(f"{method} {path} returned invalid JSON", response.status)
+
+    def list_bookings(self, start_time, end_time):
+        """Return the user's bookings overlapping the given epoch-millisecond window"""
+        data = self._request("GET", ENDPOINTS["user_bookings"], {"startTime": start_time, "endTime": end_time})
+        return [
+            booking for booking in data.get("results", [])
+            if booking.get("bookingStartTime", 0) < end_time and booking.get("bookingEndTime", 0) > start_time
+        ]
+
+    def list_desks(self, office_id, floor_id, start_time, end_time):
+        """Return every flex desk on the floor with its availability for the window"""
+        path = ENDPOINTS["availability"].format(office_id=office_id)
+        data = self._request("GET", path, {
+            "floorId": floor_id,
+            "areaType": "flexDesk",
+            "startTime": start_time,
+            "endTime": end_time,
+        })
+        return data.get("results", [])
+
+    def create_booking(self, office_id, desk, start_time, end_time):
+        """Book a desk for the whole window and return the created booking"""
+        try:
+            data = self._request("POST", ENDPOINTS["create_booking"], body={"bookings": [{
+                "workspaceId": office_id,
+                "resourceId": desk.get("zoneId"),
+                "zoneItemId": desk["id"],
+                "bookingStartTime": start_time,
+                "bookingEndTime": end_time,
+                "isAnonymous": False,
+                "isDayPass": True,
+            }]})
+        except DeskbirdApiError as e:
+            # A gateway error or lost response can come after the booking was committed, so look before anyone resends
+            if e.status is not None and e.status < 500:
+                raise
+            committed = self.committed_booking(start_time, end_time)
+            if not committed:
+                raise
+            logger.info(f"Booking request failed ({str(e)[:100]}) but booking {committed.get('id')} exists for this window")
+            return committed
+        created = data.get("successfulBookings") or data.get("results") or []
+        if not created:
+            raise DeskbirdApiError(f"Booking desk {desk.get('name')} was not confirmed: {str(data)[:200]}")
+        return created[0]
+
+    def committed_booking(self, start_time, end_time):
+        """The user's booking in the window after an ambiguous POST failure, or None if there is none or it cannot be checked"""
+        try:
+            existing = self.list_bookings(start_time, end_time)
+        except DeskbirdApiError as e:
+            logger.warning(f"Could not check whether the failed booking request was committed: {str(e)[:100]}")
+            return None
+        return existing[0] if existing else None
+
+
+def book_full_day(client, office_id, floor_id, start_time, end_time, preferred_desk=None):
+    """Book a full-day desk through the API, preferring the named desk when it is free
+
+    Returns a dict with a ``status`` of ``already_booked``, ``booked`` or
+    ``unavailable`` plus the desk and booking id where known.
+    """
+    existing = client.list_bookings(start_time, end_time)
+    if existing:
+        logger.info(f"✓ Desk already booked for this date (booking {existing[0].get('id')}) - no action needed")
+        return {"status": "already_booked", "booking_id": existing[0].get("id"), "desk": existing[0].get("zoneItemName")}
+
+    from deskbird.history import observe  # Imported here because the history module depends on this one
+    desks = client.list_desks(office_id, floor_id, start_time, end_time)
+    observe(office_id, floor_id, datetime.fromtimestamp(start_time / 1000), [(desk.get("name"), desk.get("isAvailable")) for desk in desks])
+    available = [desk for desk in desks if desk.get("isAvailable")]
+    logger.info(f"{len(available)} of {len(desks)} desks available")
+    if not available:
+        return {"status": "unavailable", "booking_id": None, "desk": None}
+
+    target = available[0]
+    if preferred_desk:
+        from deskbird.inventory import preferred_matches
+        matches = preferred_matches(available, preferred_desk)
+        if matches:
+            target = matches[0]
+        else:
+            logger.warning(f"Preferred desk '{preferred_desk}' not available, will book any other desk")
+
+    booking = client.create_booking(office_id, target, start_time, end_time)
+    logger.info(f"✓ Booked desk {target.get('name')} (booking {booking.get('id')})")
+    return {"status": "booked", "booking_id": booking.get("id"), "desk": target.get("name")}
@@ -0,0 +1,133 @@
+"""Book desks for a whole team from one process
+
+Run ``python -m deskbird.batch roster.json``. The roster is a JSON list of
+users; every key is optional and falls back to the environment, e.g.::
+
+    [
+      {"name": "alice", "op_item_name": "Alice Microsoft", "preferred_desk": "5.09 D"},
+      {"name": "bob", "op_item_name": "Bob Microsoft", "floor_id": "67890", "booking_weekdays": "Tue,Thu"}
+    ]
+
+The dates are worked out per user like a single run's, from ``booking_dates``
+and ``booking_weekdays`` in the entry or BOOKING_DATES / BOOKING_WEEKDAYS.
+"""
+import os
+import re
+import json
+import time
+import logging
+import argparse
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from deskbird.config import BookingConfig
+from deskbird.schedule import booking_dates_from_env
+
+logger = logging.getLogger(__name__)
+
+
+def load_roster(path, defaults, today=None):
+    """Read the roster file and return a list of (name, BookingConfig, booking dates)"""
+    with open(path) as f:
+        entries = json.load(f)
+    if not isinstance(entries, list) or not entries:
+        raise ValueError(f"Roster {path} must be a non-empty JSON list of users")
+
+    session_dir = os.path.join(os.path.dirname(os.environ.get("SESSION_STORE_PATH", "/var/lib/deskbird/session.enc")), "sessions")
+    users = []
+    for index, entry in enumerate(entries):
+        name = entry.get("name") or entry.get("op_item_name") or f"user-{index + 1}"
+        # The schedule keys pick this user's dates rather than configuring the booking
+        schedule = {"dates": entry.pop("booking_dates", None), "weekdays": entry.pop("booking_weekdays", None)}
+        slug = re.sub(r"[^A-Za-z0-9_.-]+", "-", name).strip("-").lower()
+        # Each user gets their own screenshots and session cache so workers never share files
+        try:
+            config = defaults.with_overrides({
+                "artifact_dir": os.path.join(defaults.artifact_dir, "deskbird-batch", slug),
+                "session_store_path": os.path.join(session_dir, f"{slug}.enc"),
+            }).with_overrides(entry)
+            config.validate()
+            dates = booking_dates_from_env(today, **schedule)
+        except ValueError as e:
+            raise ValueError(f"Roster entry '{name}': {e}")
+        users.append((name, config, dates))
+    if len({name for name, _, _ in users}) != len(users):
+        raise ValueError("Roster entries must have unique names")
+    return users
+
+
+def worker_count(user_count, max_workers, memory_budget_mb, cpu_budget, per_browser_mb, per_browser_cpu):
+    """Number of concurrent browsers that fits in the memory and CPU budget"""
+    by_memory = int(memory_budget_mb // per_browser_mb)
+    by_cpu = int(cpu_budget // per_browser_cpu)
+    workers = max(1, min(user_count, max_workers, by_memory, by_cpu))
+    logger.info(f"Running {workers} concurrent bookings (memory allows {by_memory}, CPU allows {by_cpu}, cap {max_workers})")
+    return workers
+
+
+def book_for_user(name, config, dates):
+    """Run one user's bookings and capture one result per date instead of raising"""
+    from deskbird.flow import run_bookings  # Imported here so roster checks work without selenium
+    threading.current_thread().name = name
+    if not dates:
+        logger.warning(f"No dates to book for {name}, the schedule selects none")
+        return []
+    started = time.monotonic()
+    try:
+        outcomes = run_bookings(config, dates)
+    except Exception as e:
+        error = f"{type(e).__name__}: {str(e)[:200]}"
+        outcomes = [{"date": date.strftime("%Y-%m-%d"), "status": "failed", "desk": None, "error": error} for date in dates]
+    seconds = round(time.monotonic() - started, 1)
+    return [{"user": name, "date": outcome["date"], "status": outcome["status"], "desk": outcome.get("desk"),
+             "error": outcome.get("error"), "seconds": seconds} for outcome in outcomes]
+
+
+def run_batch(users, workers):
+    """Book for every user with a bounded worker pool and return per-user, per-date results"""
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        futures = [pool.submit(book_for_user, name, config, dates) for name, config, dates in users]
+        return [result for future in futures for result in future.result()]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Book Deskbird desks for every user in a roster")
+    parser.add_argument("roster", help="JSON file listing the users to book for")
+    parser.add_argument("--max-workers", type=int, default=int(os.environ.get("BATCH_MAX_WORKERS", "4")))
+    parser.add_argument("--memory-budget-mb", type=float, default=float(os.environ.get("BATCH_MEMORY_BUDGET_MB", "1024")))
+    parser.add_argument("--cpu-budget", type=float, default=float(os.environ.get("BATCH_CPU_BUDGET", "1.0")))
+    parser.add_argument("--per-browser-mb", type=float, default=float(os.environ.get("BATCH_PER_BROWSER_MB", "350")))
+    parser.add_argument("--per-browser-cpu", type=float, default=float(os.environ.get("BATCH_PER_BROWSER_CPU", "0.25")))
+    parser.add_argument("--report", help="Also write the per-user results to this JSON file")
+    args = parser.parse_args()
+
+    log_level = os.environ.get("LOG_LEVEL", "INFO").upper()
+    logging.basicConfig(
+        level=getattr(logging, log_level, logging.INFO),
+        format='%(asctime)s - %(levelname)s - [%(threadName)s] %(message)s',
+        datefmt='%Y-%m-%d %H:%M:%S'
+    )
+
+    users = load_roster(args.roster, BookingConfig.from_env())
+    for name, _, dates in users:
+        logger.info(f"{name}: {', '.join(d.strftime('%Y-%m-%d') for d in dates) or 'no dates'}")
+    workers = worker_count(len(users), args.max_workers, args.memory_budget_mb, args.cpu_budget,
+                           args.per_browser_mb, args.per_browser_cpu)
+    results = run_batch(users, workers)
+
+    logger.info("Batch results:")
+    for result in results:
+        detail = result["desk"] or result["error"] or ""
+        logger.info(f"  {result['user']:<20} {result['date']}  {result['status']:<15} {result['seconds']:>6}s  {detail}")
+    failed = [result for result in results if result["status"] not in ("booked", "already_booked")]
+    logger.info(f"{len(results) - len(failed)} of {len(results)} user dates booked or already booked")
+
+    if args.report:
+        with open(args.report, "w") as f:
+            json.dump({"results": results}, f, indent=2)
+    if failed:
+        raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
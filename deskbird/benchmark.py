@@ -0,0 +1,185 @@
+"""Repeatable end-to-end timing of the booking flow against the offline mock site
+
+Run ``python -m deskbird.benchmark --runs 10``. A mock Deskbird app and
+Microsoft sign-in (``deskbird.mock_site``) is started on localhost, the real
+flow is pointed at it with ``DESKBIRD_APP_URL``/``DESKBIRD_API_URL`` and run
+``--runs`` times with a fresh browser, and the run reports are aggregated into
+median/p95 per step, peak browser memory and success rate. ``--save-baseline``
+stores the result; ``--baseline`` compares against a stored one and exits
+non-zero when a step or the total got slower than ``--tolerance`` allows.
+"""
+import os
+import json
+import math
+import logging
+import argparse
+import tempfile
+import statistics
+from datetime import date, datetime, timedelta
+
+from deskbird.config import BookingConfig
+from deskbird.mock_site import add_site_arguments, state_from_arguments, start_mock_site
+
+logger = logging.getLogger(__name__)
+
+# Test secret from RFC 6238; the mock sign-in accepts any six-digit code
+BENCHMARK_TOTP_SECRET = "GEZDGNBVGY3TQOJQGEZDGNBVGY3TQOJQ"
+
+# Steps faster than this are too noisy to flag as regressions
+MIN_COMPARED_SECONDS = 0.05
+
+
+def percentile(values, fraction):
+    """Nearest-rank percentile of a non-empty list"""
+    ordered = sorted(values)
+    return ordered[max(0, math.ceil(fraction * len(ordered)) - 1)]
+
+
+def point_flow_at(base_url, work_dir):
+    """Environment that sends the flow, API client and credentials to the mock site"""
+    os.environ.update({
+        "DESKBIRD_APP_URL": base_url,
+        "DESKBIRD_API_URL": f"{base_url}/v1.1",
+        "CREDENTIALS_BACKEND": "env",
+        "DESKBIRD_EMAIL": "benchmark@example.com",
+        "DESKBIRD_PASSWORD": "benchmark",
+        "DESKBIRD_TOTP_SECRET": BENCHMARK_TOTP_SECRET,
+        "SELECTOR_CACHE_PATH": os.path.join(work_dir, "selector_cache.json"),
+        # Runs stay comparable: no run is skipped or steered by what an earlier one recorded
+        "LEDGER_PATH": "off",
+        "HISTORY_PATH": "off",
+    })
+    # Every run starts signed out, like a cold CronJob pod
+    os.environ.pop("SESSION_STORE_KEY", None)
+    os.environ.pop("RACE_RELEASE_AT", None)
+
+
+def run_once(config, booking_date):
+    """One full run with its own browser; returns the run report"""
+    from deskbird.flow import run_bookings  # Imported here so --help and comparisons work without selenium
+    try:
+        run_bookings(config, [booking_date])
+    except Exception as e:
+        logger.warning(f"Run failed: {type(e).__name__}: {str(e)[:200]}")
+    try:
+        with open(os.path.join(config.artifact_dir, "deskbird_run_report.json")) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {"success": False, "duration_seconds": None, "steps": {}, "browser_rss_bytes": {}}
+
+
+def summarize(reports):
+    """Median and p95 per step and for the whole run, peak memory and success rate"""
+    durations = [r["duration_seconds"] for r in reports if r.get("duration_seconds") is not None]
+    steps = {}
+    for report in reports:
+        for name, step in report.get("steps", {}).items():
+            steps.setdefault(name, []).append(step["seconds"])
+    peaks = [r["browser_rss_bytes"]["peak"] for r in reports if r.get("browser_rss_bytes", {}).get("peak")]
+    return {
+        "created_at": datetime.now().isoformat(timespec="seconds"),
+        "runs": len(reports),
+        "success_rate": round(sum(1 for r in reports if r.get("success")) / len(reports), 3),
+        "total": {
+            "median": round(statistics.median(durations), 3) if durations else None,
+            "p95": round(percentile(durations, 0.95), 3) if durations else None,
+        },
+        "steps": {
+            name: {"median": round(statistics.median(values), 3), "p95": round(percentile(values, 0.95), 3), "runs": len(values)}
+            for name, values in steps.items()
+        },
+        "peak_rss_mb": round(max(peaks) / 2**20, 1) if peaks else None,
+    }
+
+
+def log_summary(summary):
+    logger.info(f"{summary['runs']} runs, {summary['success_rate']:.0%} succeeded")
+    total = summary["total"]
+    if total["median"] is not None:
+        logger.info(f"  {'total':<24} median {total['median']:7.3f}s  p95 {total['p95']:7.3f}s")
+    for name, step in sorted(summary["steps"].items(), key=lambda item: -item[1]["median"]):
+        logger.info(f"  {name:<24} median {step['median']:7.3f}s  p95 {step['p95']:7.3f}s")
+    if summary["peak_rss_mb"] is not None:
+        logger.info(f"  Peak browser memory {summary['peak_rss_mb']:.0f} MiB")
+
+
+def compare(summary, baseline, tolerance):
+    """Regressions of the current summary against a baseline, as human-readable lines"""
+    regressions = []
+    pairs = [("total", summary["total"], baseline.get("total", {}))]
+    pairs += [(name, step, baseline.get("steps", {}).get(name, {})) for name, step in summary["steps"].items()]
+    for name, current, before in pairs:
+        for stat in ("median", "p95"):
+            old, new = before.get(stat), current.get(stat)
+            if old is None or new is None or max(old, new) < MIN_COMPARED_SECONDS:
+                continue
+            if new > old * (1 + tolerance):
+                regressions.append(f"{name} {stat} {old:.3f}s -> {new:.3f}s (+{(new / old - 1) if old else 1:.0%})")
+    if summary["success_rate"] < baseline.get("success_rate", 0):
+        regressions.append(f"success rate {baseline['success_rate']:.0%} -> {summary['success_rate']:.0%}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the booking flow against the offline mock site")
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--backend", choices=("browser", "http"), default="browser", help="Booking backend to exercise")
+    parser.add_argument("--preferred-desk", help="PREFERRED_DESK for the runs")
+    parser.add_argument("--output", help="Write the summary JSON here")
+    parser.add_argument("--save-baseline", help="Write the summary as a baseline file")
+    parser.add_argument("--baseline", help="Compare against this baseline and exit 1 on regression")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="Allowed slowdown against the baseline (0.2 = 20%%)")
+    add_site_arguments(parser)
+    args = parser.parse_args()
+
+    log_level = os.environ.get("LOG_LEVEL", "INFO").upper()
+    logging.basicConfig(
+        level=getattr(logging, log_level, logging.INFO),
+        format='%(asctime)s - %(levelname)s - %(message)s',
+        datefmt='%Y-%m-%d %H:%M:%S'
+    )
+
+    server, base_url = start_mock_site(state_from_arguments(args))
+    work_dir = tempfile.mkdtemp(prefix="deskbird-benchmark-")
+    point_flow_at(base_url, work_dir)
+    reports = []
+    try:
+        for index in range(args.runs):
+            # A new date per run so earlier bookings never turn later runs into "already booked"
+            booking_date = datetime.combine(date.today() + timedelta(days=index + 1), datetime.min.time())
+            config = BookingConfig(
+                op_item_name="benchmark",
+                office_id=args.office_id,
+                floor_id=args.floor_id,
+                preferred_desk=args.preferred_desk,
+                booking_backend=args.backend,
+                artifact_dir=os.path.join(work_dir, f"run-{index + 1:03d}"),
+            )
+            logger.info(f"Benchmark run {index + 1}/{args.runs}")
+            reports.append(run_once(config, booking_date))
+    finally:
+        server.shutdown()
+
+    summary = summarize(reports)
+    log_summary(summary)
+    logger.info(f"Run reports and artifacts: {work_dir}")
+    for path in (args.output, args.save_baseline):
+        if path:
+            with open(path, "w") as f:
+                json.dump(summary, f, indent=2)
+            logger.info(f"Summary written to {path}")
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        regressions = compare(summary, baseline, args.tolerance)
+        if regressions:
+            logger.error(f"{len(regressions)} regression(s) beyond {args.tolerance:.0%} against {args.baseline}:")
+            for line in regressions:
+                logger.error(f"  {line}")
+            raise SystemExit(1)
+        logger.info(f"✓ No regressions beyond {args.tolerance:.0%} against {args.baseline}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,65 @@
+import os
+import logging
+
+from selenium import webdriver
+from selenium.webdriver.chrome.options import Options
+from selenium.webdriver.chrome.service import Service
+
+from deskbird.memory import low_memory_options
+from deskbird.network import network_profile, configure_options, install_filter
+from deskbird.waits import track_requests
+
+logger = logging.getLogger(__name__)
+
+CHROMIUM_BINARY = "/usr/bin/chromium"
+CHROMEDRIVER_PATH = "/usr/bin/chromedriver"
+
+
+def chrome_options():
+    """Chrome options for headless mode"""
+    options = Options()
+    options.add_argument("--headless=new")  # Use new headless mode
+    options.add_argument("--no-sandbox")
+    options.add_argument("--disable-dev-shm-usage")
+    options.add_argument("--disable-gpu")
+    options.add_argument("--window-size=1920x1080")
+    options.add_argument("--disable-blink-features=AutomationControlled")
+    options.add_argument("--user-agent=Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36")
+    options.add_experimental_option("excludeSwitches", ["enable-automation"])
+    options.add_experimental_option('useAutomationExtension', False)
+    options.binary_location = CHROMIUM_BINARY
+    return options
+
+
+def driver_backend(name=None):
+    """The DRIVER_BACKEND to use: selenium (chromedriver) or cdp (DevTools directly)"""
+    name = (name or os.environ.get("DRIVER_BACKEND", "selenium")).lower()
+    if name not in ("selenium", "cdp"):
+        raise ValueError(f"Unknown DRIVER_BACKEND '{name}', expected selenium or cdp")
+    return name
+
+
+def create_driver(profile=None, backend=None):
+    """Start headless Chromium through chromedriver, with the NETWORK_FILTER profile applied"""
+    profile = network_profile(profile)
+    if driver_backend(backend) == "cdp":
+        return create_cdp_driver(profile)
+    logger.info("Initializing Chrome WebDriver")
+    service = Service(CHROMEDRIVER_PATH)
+    driver = webdriver.Chrome(service=service, options=low_memory_options(configure_options(chrome_options(), profile)))
+    install_filter(driver, profile)
+    track_requests(driver)
+    logger.info(f"Chrome WebDriver initialized successfully (network filter: {profile})")
+    return driver
+
+
+def create_cdp_driver(profile):
+    """Start headless Chromium and drive it over the DevTools Protocol, without chromedriver"""
+    from deskbird.cdp import create_cdp_driver as start  # Imported here so the selenium backend works without websockets
+    logger.info("Initializing Chromium over DevTools")
+    options = low_memory_options(configure_options(chrome_options(), profile))
+    driver = start(CHROMIUM_BINARY, options.arguments, record_network=profile != "off")
+    install_filter(driver, profile)
+    track_requests(driver)
+    logger.info(f"Chromium DevTools driver initialized successfully (network filter: {profile})")
+    return driver
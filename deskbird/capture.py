@@ -0,0 +1,112 @@
+"""Cheap per-step snapshots, with full debug artifacts only when a run fails
+
+Each step records its URL and title (and, with ``CAPTURE_DOM=1``, a
+compressed copy of the DOM) in a small in-memory ring buffer of
+``CAPTURE_RING_SIZE`` entries. Nothing is written for a successful run. On
+failure ``dump()`` writes one screenshot plus a zip bundle holding the step
+history, the current page source and any buffered DOMs. With
+``DEBUG_CAPTURE=1`` (or ``LOG_LEVEL=DEBUG``) every step also writes its own
+screenshot, as before.
+"""
+import os
+import json
+import time
+import zlib
+import logging
+import zipfile
+from collections import deque
+
+from deskbird.active import Activatable, ActiveSlot
+
+logger = logging.getLogger(__name__)
+
+SNAPSHOT_SCRIPT = "return [location.href, document.title];"
+SNAPSHOT_DOM_SCRIPT = "return [location.href, document.title, document.documentElement.outerHTML];"
+
+
+def debug_enabled():
+    """DEBUG_CAPTURE=1, or a debug log level, turns on per-step screenshots"""
+    flag = os.environ.get("DEBUG_CAPTURE")
+    if flag is not None:
+        return flag.lower() in ("1", "true", "yes")
+    return os.environ.get("LOG_LEVEL", "INFO").upper() == "DEBUG"
+
+
+class _NullCapture:
+    """Keeps no snapshots outside a run"""
+
+    def snapshot(self, driver, name):
+        pass
+
+
+class DebugCapture(Activatable):
+    """Ring buffer of step snapshots for one run"""
+
+    slot = ActiveSlot(_NullCapture())
+
+    def __init__(self, artifact_dir, debug=None, size=None, keep_dom=None):
+        self.artifact_dir = artifact_dir
+        self.debug = debug_enabled() if debug is None else debug
+        self.keep_dom = os.environ.get("CAPTURE_DOM", "0") == "1" if keep_dom is None else keep_dom
+        self.snapshots = deque(maxlen=size or int(os.environ.get("CAPTURE_RING_SIZE", "20")))
+
+    def snapshot(self, driver, name):
+        """Record the step with a single round trip (plus a screenshot in debug mode)"""
+        entry = {"step": name, "time": time.time()}
+        try:
+            values = driver.execute_script(SNAPSHOT_DOM_SCRIPT if self.keep_dom else SNAPSHOT_SCRIPT)
+            entry["url"], entry["title"] = values[0], values[1]
+            if self.keep_dom:
+                entry["dom"] = zlib.compress(values[2].encode(), 6)
+        except Exception as e:
+            entry["error"] = str(e)[:100]
+        self.snapshots.append(entry)
+        if self.debug:
+            self.screenshot(driver, name)
+
+    def screenshot(self, driver, name):
+        path = os.path.join(self.artifact_dir, f"deskbird_{name}.png")
+        driver.save_screenshot(path)
+        logger.debug(f"Screenshot saved: {path}")
+        return path
+
+    def dump(self, driver, name, error=None, page_source=None):
+        """Write a screenshot and one zip bundle for a failure; never raises
+
+        Pass ``page_source`` when the caller already serialized the DOM, so it
+        is not read from the browser a second time.
+        """
+        bundle_path = os.path.join(self.artifact_dir, f"deskbird_{name}_bundle.zip")
+        png, source = None, page_source
+        try:
+            png = driver.get_screenshot_as_png()
+            with open(os.path.join(self.artifact_dir, f"deskbird_{name}.png"), "wb") as f:
+                f.write(png)
+        except Exception:
+            logger.debug("Could not save error screenshot (driver may be closed)")
+        if source is None:
+            try:
+                source = driver.page_source
+            except Exception:
+                logger.debug("Could not read page source (driver may be closed)")
+        try:
+            steps = [{key: value for key, value in entry.items() if key != "dom"} for entry in self.snapshots]
+            with zipfile.ZipFile(bundle_path, "w", zipfile.ZIP_DEFLATED) as bundle:
+                bundle.writestr("steps.json", json.dumps({"error": error and str(error), "steps": steps}, indent=2))
+                if source is not None:
+                    bundle.writestr("page.html", source)
+                if png is not None:
+                    bundle.writestr("screenshot.png", png)
+                for index, entry in enumerate(self.snapshots):
+                    if "dom" in entry:
+                        bundle.writestr(f"dom/{index:02d}_{entry['step']}.html", zlib.decompress(entry["dom"]))
+            logger.info(f"Debug bundle saved: {bundle_path}")
+        except Exception as e:
+            logger.warning(f"Could not write debug bundle: {str(e)[:100]}")
+            return None
+        return bundle_path
+
+
+def snapshot(driver, name):
+    """Record a named step of the current run"""
+    DebugCapture.slot.current().snapshot(driver, name)
@@ -0,0 +1,665 @@
+"""Drive Chromium directly over the DevTools Protocol instead of through chromedriver
+
+Selected with ``DRIVER_BACKEND=cdp``. Chromium is started with a remote
+debugging port and driven over its websocket with asyncio, so there is no
+chromedriver process and no WebDriver HTTP hop per action. ``CdpDriver``
+offers the part of Selenium's WebDriver API the flow uses (find_element,
+execute_script, window handles, screenshots, ...) and raises Selenium's
+exceptions, so the waits and the flow run unchanged on either backend.
+
+- Scripts and element lookups are one ``Runtime`` call, with any DOM nodes in
+  the result resolved in one more batched call
+- Page loads and window changes are tracked from DevTools events instead of
+  being polled
+- ``new_tab()`` and ``evaluate_in_tabs()`` drive several tabs concurrently over
+  the same connection
+"""
+import os
+import json
+import time
+import base64
+import asyncio
+import logging
+import itertools
+import shutil
+import tempfile
+import threading
+import subprocess
+from types import SimpleNamespace
+
+from selenium.webdriver.common.by import By
+from selenium.common.exceptions import (
+    ElementNotInteractableException,
+    JavascriptException,
+    NoSuchElementException,
+    NoSuchWindowException,
+    StaleElementReferenceException,
+    TimeoutException,
+    WebDriverException,
+)
+
+logger = logging.getLogger(__name__)
+
+COMMAND_TIMEOUT = 30
+PAGE_LOAD_TIMEOUT = 60
+STARTUP_TIMEOUT = 20
+
+# Runs a WebDriver-style script body and returns [value, node count]. DOM nodes
+# anywhere in the result are swapped for markers and kept in a page global, so
+# the value itself can be returned by value in the same call.
+PACK_SCRIPT = """
+const nodes = [];
+const pack = value => {
+    if (value instanceof Node) {
+        nodes.push(value);
+        return {"__deskbird_node__": nodes.length - 1};
+    }
+    if (value instanceof NodeList || value instanceof HTMLCollection) {
+        value = Array.from(value);
+    }
+    if (Array.isArray(value)) {
+        return value.map(pack);
+    }
+    if (value && typeof value === "object" && Object.getPrototypeOf(value) === Object.prototype) {
+        const out = {};
+        for (const key of Object.keys(value)) {
+            out[key] = pack(value[key]);
+        }
+        return out;
+    }
+    return value === undefined ? null : value;
+};
+const done = result => {
+    const packed = pack(result);
+    globalThis.__deskbirdNodes = nodes;
+    return [packed, nodes.length];
+};
+"""
+
+SYNC_WRAPPER = "function() {%s\nreturn done((function() {\n%s\n}).apply(null, arguments));\n}"
+
+ASYNC_WRAPPER = """function() {%s
+const args = Array.from(arguments);
+return new Promise((resolve, reject) => {
+    args.push(resolve);
+    try {
+        (function() {
+%s
+        }).apply(null, args);
+    } catch (e) {
+        reject(e);
+    }
+}).then(done);
+}"""
+
+FIND_SCRIPT = """
+const root = arguments[2] || document;
+if (arguments[0] === "xpath") {
+    const result = document.evaluate(arguments[1], root, null, XPathResult.ORDERED_NODE_SNAPSHOT_TYPE, null);
+    const found = [];
+    for (let i = 0; i < result.snapshotLength; i++) {
+        found.push(result.snapshotItem(i));
+    }
+    return found;
+}
+return Array.from(root.querySelectorAll(arguments[1]));
+"""
+
+CLICK_POINT_SCRIPT = """function() {
+    this.scrollIntoView({block: "center", inline: "center"});
+    const rect = this.getBoundingClientRect();
+    return [rect.left + rect.width / 2, rect.top + rect.height / 2, rect.width > 0 && rect.height > 0];
+}"""
+
+VISIBLE_SCRIPT = """function() {
+    const style = window.getComputedStyle(this);
+    return style.visibility !== "hidden" && style.display !== "none"
+        && !!(this.offsetWidth || this.offsetHeight || this.getClientRects().length);
+}"""
+
+
+class CdpError(Exception):
+    """An error response to a DevTools command"""
+
+
+def _locator(by, value):
+    """Translate a Selenium locator into ("css" | "xpath", selector)"""
+    if by == By.XPATH:
+        return "xpath", value
+    if by == By.CSS_SELECTOR:
+        return "css", value
+    if by == By.ID:
+        return "css", f"[id={json.dumps(value)}]"
+    if by == By.NAME:
+        return "css", f"[name={json.dumps(value)}]"
+    if by == By.CLASS_NAME:
+        return "css", f"[class~={json.dumps(value)}]"
+    if by == By.TAG_NAME:
+        return "css", value
+    if by == By.LINK_TEXT:
+        return "xpath", f"//a[normalize-space(.)={json.dumps(value)}]"
+    if by == By.PARTIAL_LINK_TEXT:
+        return "xpath", f"//a[contains(., {json.dumps(value)})]"
+    raise WebDriverException(f"Unsupported locator strategy: {by}")
+
+
+def _driver_error(error):
+    """Map a DevTools error onto the Selenium exception the flow expects"""
+    message = str(error)
+    if "Could not find object" in message or "Cannot find context" in message:
+        return StaleElementReferenceException(message)
+    if "Session with given id not found" in message or "No target with given id" in message:
+        return NoSuchWindowException(message)
+    return WebDriverException(message)
+
+
+class CdpConnection:
+    """One DevTools websocket, multiplexing the browser and every attached page session"""
+
+    def __init__(self, websocket):
+        self.websocket = websocket
+        self.closed = False
+        self._ids = itertools.count(1)
+        self._pending = {}
+        self._listeners = []
+        self._reader = asyncio.ensure_future(self._read())
+
+    @classmethod
+    async def connect(cls, url):
+        import websockets  # Imported here so the selenium backend works without websockets installed
+        websocket = await websockets.connect(url, max_size=None, ping_interval=None)
+        return cls(websocket)
+
+    async def send(self, method, params=None, session_id=None, timeout=COMMAND_TIMEOUT):
+        if self.closed:
+            raise CdpError("DevTools connection is closed")
+        command_id = next(self._ids)
+        future = asyncio.get_running_loop().create_future()
+        self._pending[command_id] = future
+        message = {"id": command_id, "method": method, "params": params or {}}
+        if session_id:
+            message["sessionId"] = session_id
+        await self.websocket.send(json.dumps(message))
+        try:
+            return await asyncio.wait_for(future, timeout)
+        finally:
+            self._pending.pop(command_id, None)
+
+    def listen(self, callback):
+        """Call ``callback(message)`` for every event; returns a function that stops listening"""
+        self._listeners.append(callback)
+        return lambda: self._listeners.remove(callback) if callback in self._listeners else None
+
+    def expect(self, method, session_id=None, predicate=None):
+        """A future for the next event named ``method`` (on a session), created before triggering it"""
+        future = asyncio.get_running_loop().create_future()
+
+        def on_event(message):
+            if message.get("method") != method or (session_id and message.get("sessionId") != session_id):
+                return
+            if predicate and not predicate(message.get("params", {})):
+                return
+            if not future.done():
+                future.set_result(message.get("params", {}))
+        stop = self.listen(on_event)
+        future.add_done_callback(lambda _: stop())
+        return future
+
+    async def _read(self):
+        try:
+            async for raw in self.websocket:
+                message = json.loads(raw)
+                if "id" in message:
+                    future = self._pending.get(message["id"])
+                    if future and not future.done():
+                        if "error" in message:
+                            future.set_exception(CdpError(message["error"].get("message", "DevTools error")))
+                        else:
+                            future.set_result(message.get("result", {}))
+                    continue
+                for listener in list(self._listeners):
+                    try:
+                        listener(message)
+                    except Exception as e:
+                        logger.debug(f"DevTools event listener failed: {e}")
+        except Exception as e:
+            logger.debug(f"DevTools connection closed: {e}")
+        finally:
+            self.closed = True
+            for future in self._pending.values():
+                if not future.done():
+                    future.set_exception(CdpError("DevTools connection closed"))
+
+    async def close(self):
+        self.closed = True
+        await self.websocket.close()
+
+
+class CdpPage:
+    """An attached page target (tab or popup) and its session"""
+
+    def __init__(self, connection, target_id, session_id, record_network=False):
+        self.connection = connection
+        self.target_id = target_id
+        self.session_id = session_id
+        self.network_log = []
+        self._stop = connection.listen(self._on_event) if record_network else None
+
+    def _on_event(self, message):
+        if message.get("sessionId") == self.session_id and message.get("method", "").startswith("Network."):
+            # Same shape as chromedriver's performance log, for NetworkStats
+            self.network_log.append({"message": json.dumps({"message": {"method": message["method"], "params": message.get("params", {})}})})
+
+    async def send(self, method, params=None, timeout=COMMAND_TIMEOUT):
+        return await self.connection.send(method, params, self.session_id, timeout)
+
+    async def navigate(self, url, timeout=PAGE_LOAD_TIMEOUT):
+        """Navigate and wait for the load event"""
+        loaded = self.connection.expect("Page.loadEventFired", self.session_id)
+        try:
+            result = await self.send("Page.navigate", {"url": url})
+            if result.get("errorText"):
+                raise WebDriverException(f"Navigation to {url} failed: {result['errorText']}")
+            # Same-document navigations (only the fragment changes) fire no load event
+            if result.get("loaderId"):
+                await asyncio.wait_for(loaded, timeout)
+        except asyncio.TimeoutError:
+            raise TimeoutException(f"Timed out after {timeout}s loading {url}")
+        finally:
+            loaded.cancel()
+
+    async def call(self, script, args=(), awaiting=False):
+        """Run a WebDriver-style script body with ``arguments`` and return its value, nodes as CdpElement"""
+        declaration = (ASYNC_WRAPPER if awaiting else SYNC_WRAPPER) % (PACK_SCRIPT, script)
+        elements = [arg for arg in args if isinstance(arg, CdpElement)]
+        if elements:
+            params = {
+                "functionDeclaration": declaration,
+                "objectId": elements[0].object_id,
+                "arguments": [{"objectId": arg.object_id} if isinstance(arg, CdpElement) else {"value": arg} for arg in args],
+            }
+            method = "Runtime.callFunctionOn"
+        else:
+            params = {"expression": f"({declaration}).apply(null, {json.dumps(list(args))})"}
+            method = "Runtime.evaluate"
+        params.update(returnByValue=True, awaitPromise=awaiting)
+        result = await self.send(method, params)
+        if result.get("exceptionDetails"):
+            details = result["exceptionDetails"]
+            description = details.get("exception", {}).get("description") or details.get("text", "Script error")
+            raise JavascriptException(description)
+        value, node_count = result["result"].get("value") or [None, 0]
+        if not node_count:
+            return value
+        nodes = await self._stashed_nodes(node_count)
+        return self._unpack(value, nodes)
+
+    async def _stashed_nodes(self, count):
+        """Remote object ids of the nodes the last call stashed, in one batched lookup"""
+        holder = await self.send("Runtime.evaluate", {"expression": "globalThis.__deskbirdNodes"})
+        properties = await self.send("Runtime.getProperties", {"objectId": holder["result"]["objectId"], "ownProperties": True})
+        nodes = [None] * count
+        for entry in properties.get("result", []):
+            if entry.get("name", "").isdigit() and int(entry["name"]) < count:
+                nodes[int(entry["name"])] = CdpElement(self, entry["value"]["objectId"])
+        return nodes
+
+    def _unpack(self, value, nodes):
+        if isinstance(value, list):
+            return [self._unpack(item, nodes) for item in value]
+        if isinstance(value, dict):
+            if set(value) == {"__deskbird_node__"}:
+                return nodes[value["__deskbird_node__"]]
+            return {key: self._unpack(item, nodes) for key, item in value.items()}
+        return value
+
+    async def call_on(self, element, declaration, args=()):
+        """Run a function with ``this`` bound to an element and return its value"""
+        result = await self.send("Runtime.callFunctionOn", {
+            "functionDeclaration": declaration,
+            "objectId": element.object_id,
+            "arguments": [{"value": arg} for arg in args],
+            "returnByValue": True,
+        })
+        if result.get("exceptionDetails"):
+            raise JavascriptException(result["exceptionDetails"].get("text", "Script error"))
+        return result["result"].get("value")
+
+    async def click(self, element):
+        """A trusted mouse click at the element's centre, like Selenium's"""
+        x, y, visible = await self.call_on(element, CLICK_POINT_SCRIPT)
+        if not visible:
+            raise ElementNotInteractableException("Element has no size and cannot be clicked")
+        event = {"x": x, "y": y, "button": "left", "clickCount": 1}
+        # Both events are sent back to back; DevTools handles a session's commands in order
+        await asyncio.gather(
+            self.send("Input.dispatchMouseEvent", dict(event, type="mousePressed")),
+            self.send("Input.dispatchMouseEvent", dict(event, type="mouseReleased")),
+        )
+
+    async def type_text(self, element, text):
+        await self.call_on(element, "function() { this.focus(); }")
+        await self.send("Input.insertText", {"text": text})
+
+    async def close(self):
+        if self._stop:
+            self._stop()
+        await self.connection.send("Target.closeTarget", {"targetId": self.target_id})
+
+
+class CdpBrowser:
+    """A Chromium process started with a DevTools port, and its page targets"""
+
+    def __init__(self, process, profile_dir, connection, record_network):
+        self.process = process
+        self.profile_dir = profile_dir
+        self.connection = connection
+        self.record_network = record_network
+        # Page targets in the order they were opened, like WebDriver window handles
+        self.targets = {}
+        self.pages = {}
+        connection.listen(self._on_event)
+
+    @classmethod
+    async def start(cls, binary, arguments, record_network=False):
+        profile_dir = tempfile.mkdtemp(prefix="deskbird-cdp-")
+        command = [binary, "--remote-debugging-port=0", f"--user-data-dir={profile_dir}", *arguments, "about:blank"]
+        logger.debug(f"Starting {binary} with {len(arguments)} arguments")
+        process = subprocess.Popen(command, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        # Chromium writes the port it picked, and the browser target path, to DevToolsActivePort
+        port_file = os.path.join(profile_dir, "DevToolsActivePort")
+        deadline = time.monotonic() + STARTUP_TIMEOUT
+        while not os.path.exists(port_file) or os.path.getsize(port_file) == 0:
+            if process.poll() is not None or time.monotonic() > deadline:
+                process.kill()
+                shutil.rmtree(profile_dir, ignore_errors=True)
+                raise WebDriverException(f"Chromium did not open a DevTools port (exit code {process.poll()})")
+            await asyncio.sleep(0.05)
+        with open(port_file) as f:
+            port, path = f.read().split()[:2]
+        connection = await CdpConnection.connect(f"ws://127.0.0.1:{port}{path}")
+        browser = cls(process, profile_dir, connection, record_network)
+        await connection.send("Target.setDiscoverTargets", {"discover": True})
+        for info in (await connection.send("Target.getTargets")).get("targetInfos", []):
+            browser._track(info)
+        return browser
+
+    def _track(self, info):
+        if info.get("type") == "page":
+            self.targets[info["targetId"]] = info
+
+    def _on_event(self, message):
+        method, params = message.get("method"), message.get("params", {})
+        if method in ("Target.targetCreated", "Target.targetInfoChanged"):
+            self._track(params["targetInfo"])
+        elif method == "Target.targetDestroyed":
+            self.targets.pop(params["targetId"], None)
+            self.pages.pop(params["targetId"], None)
+
+    async def attach(self, target_id):
+        """The session for a page target, attaching to it on first use"""
+        if target_id in self.pages:
+            return self.pages[target_id]
+        if target_id not in self.targets:
+            raise NoSuchWindowException(f"No window with handle {target_id}")
+        result = await self.connection.send("Target.attachToTarget", {"targetId": target_id, "flatten": True})
+        page = CdpPage(self.connection, target_id, result["sessionId"], self.record_network)
+        commands = [page.send("Page.enable")]
+        if self.record_network:
+            commands.append(page.send("Network.enable"))
+        await asyncio.gather(*commands)
+        self.pages[target_id] = page
+        return page
+
+    async def new_page(self, url="about:blank"):
+        result = await self.connection.send("Target.createTarget", {"url": "about:blank"})
+        self.targets.setdefault(result["targetId"], {"targetId": result["targetId"], "type": "page", "url": "about:blank"})
+        page = await self.attach(result["targetId"])
+        if url != "about:blank":
+            await page.navigate(url)
+        return page
+
+    async def close(self):
+        try:
+            await self.connection.send("Browser.close", timeout=5)
+        except Exception:
+            logger.debug("Browser.close failed, killing Chromium")
+        try:
+            await self.connection.close()
+        except Exception:
+            pass
+        try:
+            self.process.wait(5)
+        except subprocess.TimeoutExpired:
+            self.process.kill()
+        shutil.rmtree(self.profile_dir, ignore_errors=True)
+
+
+class _EventLoop:
+    """An asyncio loop on a background thread that the synchronous facade submits to"""
+
+    def __init__(self):
+        self.loop = asyncio.new_event_loop()
+        self.thread = threading.Thread(target=self.loop.run_forever, name="cdp", daemon=True)
+        self.thread.start()
+
+    def run(self, coroutine, timeout=None):
+        future = asyncio.run_coroutine_threadsafe(coroutine, self.loop)
+        try:
+            return future.result(timeout)
+        except CdpError as e:
+            raise _driver_error(e)
+
+    def stop(self):
+        self.loop.call_soon_threadsafe(self.loop.stop)
+
+
+class CdpElement:
+    """A DOM node in a page, addressed by its DevTools remote object id"""
+
+    def __init__(self, page, object_id):
+        self.page = page
+        self.object_id = object_id
+        self.driver = None
+
+    def _run(self, coroutine):
+        return self.driver._run(coroutine)
+
+    def _call(self, declaration, *args):
+        return self._run(self.page.call_on(self, declaration, args))
+
+    def click(self):
+        self._run(self.page.click(self))
+
+    def send_keys(self, *values):
+        self._run(self.page.type_text(self, "".join(str(value) for value in values)))
+
+    def clear(self):
+        self._call("function() { this.value = ''; this.dispatchEvent(new Event('input', {bubbles: true})); }")
+
+    def is_selected(self):
+        return bool(self._call("function() { return !!(this.checked || this.selected); }"))
+
+    def is_enabled(self):
+        return not self._call("function() { return !!this.disabled; }")
+
+    def is_displayed(self):
+        return bool(self._call(VISIBLE_SCRIPT))
+
+    def get_attribute(self, name):
+        return self._call("function(name) { const value = this[name]; return value === undefined || typeof value === 'object' ? this.getAttribute(name) : value; }", name)
+
+    @property
+    def text(self):
+        return self._call("function() { return this.innerText; }")
+
+    @property
+    def tag_name(self):
+        return self._call("function() { return this.tagName.toLowerCase(); }")
+
+    def find_elements(self, by=By.ID, value=None):
+        return self.driver._find(by, value, self)
+
+    def find_element(self, by=By.ID, value=None):
+        found = self.find_elements(by, value)
+        if not found:
+            raise NoSuchElementException(f"No element matching {value}")
+        return found[0]
+
+
+class _SwitchTo:
+    def __init__(self, driver):
+        self._driver = driver
+
+    def window(self, handle):
+        self._driver._page = self._driver._run(self._driver._browser.attach(handle))
+        self._driver._handle = handle
+
+
+class CdpDriver:
+    """The subset of Selenium's WebDriver used by the flow, over the DevTools Protocol"""
+
+    def __init__(self, browser, events, page, owns_browser=True):
+        self._browser = browser
+        self._events = events
+        self._page = page
+        self._handle = page.target_id
+        self._owns_browser = owns_browser
+        self.switch_to = _SwitchTo(self)
+        # metrics and the daemon sample the memory of this process tree
+        self.service = SimpleNamespace(process=browser.process)
+
+    def _run(self, coroutine, timeout=None):
+        if self._browser.connection.closed:
+            coroutine.close()
+            raise WebDriverException("Chromium is no longer running")
+        return self._events.run(coroutine, timeout)
+
+    def _with_driver(self, value):
+        if isinstance(value, CdpElement):
+            value.driver = self
+        elif isinstance(value, list):
+            for item in value:
+                self._with_driver(item)
+        elif isinstance(value, dict):
+            for item in value.values():
+                self._with_driver(item)
+        return value
+
+    def _find(self, by, value, root=None):
+        kind, selector = _locator(by, value)
+        args = (kind, selector, root) if root else (kind, selector)
+        return self._with_driver(self._run(self._page.call(FIND_SCRIPT, args)))
+
+    def get(self, url):
+        self._run(self._page.navigate(url))
+
+    @property
+    def current_url(self):
+        # Kept up to date by Target.targetInfoChanged events, so reading it costs no round trip
+        info = self._browser.targets.get(self._handle)
+        if info is None:
+            raise NoSuchWindowException("The current window has been closed")
+        if self._browser.connection.closed:
+            raise WebDriverException("Chromium is no longer running")
+        return info.get("url", "")
+
+    @property
+    def title(self):
+        return self.execute_script("return document.title;")
+
+    @property
+    def page_source(self):
+        return self.execute_script("return document.documentElement.outerHTML;")
+
+    @property
+    def window_handles(self):
+        return list(self._browser.targets)
+
+    @property
+    def current_window_handle(self):
+        return self._handle
+
+    def execute_script(self, script, *args):
+        return self._with_driver(self._run(self._page.call(script, args)))
+
+    def execute_async_script(self, script, *args):
+        return self._with_driver(self._run(self._page.call(script, args, awaiting=True)))
+
+    def execute_cdp_cmd(self, cmd, cmd_args):
+        return self._run(self._page.send(cmd, cmd_args))
+
+    def find_elements(self, by=By.ID, value=None):
+        return self._find(by, value)
+
+    def find_element(self, by=By.ID, value=None):
+        found = self._find(by, value)
+        if not found:
+            raise NoSuchElementException(f"No element matching {value}")
+        return found[0]
+
+    def get_log(self, log_type):
+        """Network events recorded since the last call, in chromedriver's performance log format"""
+        if log_type != "performance":
+            return []
+        entries = []
+        for page in self._browser.pages.values():
+            entries.extend(page.network_log)
+            page.network_log = []
+        return entries
+
+    def get_screenshot_as_png(self):
+        result = self._run(self._page.send("Page.captureScreenshot", {"format": "png"}))
+        return base64.b64decode(result["data"])
+
+    def save_screenshot(self, filename):
+        with open(filename, "wb") as f:
+            f.write(self.get_screenshot_as_png())
+        return True
+
+    def new_tab(self, url="about:blank"):
+        """Another tab in the same browser and session, driven independently"""
+        page = self._run(self._browser.new_page(url))
+        return CdpDriver(self._browser, self._events, page, owns_browser=False)
+
+    def evaluate_in_tabs(self, urls, script, *args, awaiting=False):
+        """Open every URL in its own tab at once, run ``script`` in each and return the results in order
+
+        A tab that fails yields its exception in place of a result. Tabs are
+        closed again before this returns; DOM nodes cannot be returned.
+        """
+        async def visit(url):
+            page = await self._browser.new_page(url)
+            try:
+                return await page.call(script, args, awaiting)
+            finally:
+                await page.close()
+
+        async def visit_all():
+            return await asyncio.gather(*(visit(url) for url in urls), return_exceptions=True)
+        return self._run(visit_all())
+
+    def close(self):
+        self._run(self._page.close())
+
+    def quit(self):
+        if not self._owns_browser:
+            self.close()
+            return
+        try:
+            self._events.run(self._browser.close(), timeout=15)
+        finally:
+            self._events.stop()
+
+
+def create_cdp_driver(binary, arguments, record_network=False):
+    """Start Chromium and return a CdpDriver on its first tab"""
+    events = _EventLoop()
+    try:
+        browser = events.run(CdpBrowser.start(binary, arguments, record_network), timeout=STARTUP_TIMEOUT + 10)
+        handles = list(browser.targets)
+        page = events.run(browser.attach(handles[0]) if handles else browser.new_page())
+    except Exception:
+        events.stop()
+        raise
+    return CdpDriver(browser, events, page)
@@ -0,0 +1,128 @@
+"""Checkpoints reached by a run, and in-process retries that resume from them
+
+The flow marks the good states it reaches: ``authenticated``, then per date
+``dashboard_loaded``, ``desk_selected`` and ``booked``. When a step fails it
+is retried inside the same process according to its ``RetryPolicy``: the
+caller's resume function gets the last checkpoint and puts the browser back in
+that state (e.g. reloads the booking page with the existing session), so a
+late failure costs seconds instead of a new pod, Chromium and SSO with MFA.
+
+Policies can be tuned per step with ``RETRY_<STEP>_ATTEMPTS`` and
+``RETRY_<STEP>_BACKOFF`` (seconds before the first retry, doubling after that).
+"""
+import os
+import time
+import logging
+
+from deskbird.active import Activatable, ActiveSlot
+from deskbird.metrics import note_retry
+
+logger = logging.getLogger(__name__)
+
+class RetryPolicy:
+    """How often a step is attempted and how long to back off between attempts"""
+
+    def __init__(self, attempts=1, backoff=1.0, factor=2.0, max_backoff=30.0):
+        self.attempts = attempts
+        self.backoff = backoff
+        self.factor = factor
+        self.max_backoff = max_backoff
+
+    def delay(self, retry):
+        """Seconds to wait before retry number ``retry`` (1-based)"""
+        return min(self.backoff * self.factor ** (retry - 1), self.max_backoff)
+
+
+DEFAULT_POLICIES = {
+    # A second SSO attempt in the same browser is still far cheaper than a pod restart
+    "sign_in": RetryPolicy(attempts=2, backoff=3),
+    "book_date": RetryPolicy(attempts=3, backoff=1, max_backoff=10),
+}
+
+
+def retry_policy(step):
+    """The policy for a step, with RETRY_<STEP>_ATTEMPTS / RETRY_<STEP>_BACKOFF applied"""
+    default = DEFAULT_POLICIES.get(step, RetryPolicy())
+    return RetryPolicy(
+        attempts=max(1, int(os.environ.get(f"RETRY_{step.upper()}_ATTEMPTS", default.attempts))),
+        backoff=float(os.environ.get(f"RETRY_{step.upper()}_BACKOFF", default.backoff)),
+        factor=default.factor,
+        max_backoff=default.max_backoff,
+    )
+
+
+class _NullCheckpoints:
+    """Outside a run no checkpoint is ever reached"""
+
+    def reach(self, name, scope=None, detail=None):
+        pass
+
+    def last(self, scope=None):
+        return None
+
+
+class Checkpoints(Activatable):
+    """Checkpoints reached in one run, in order"""
+
+    slot = ActiveSlot(_NullCheckpoints())
+
+    def __init__(self):
+        self.reached = []
+
+    def reach(self, name, scope=None, detail=None):
+        self.reached.append({"checkpoint": name, "scope": scope, "detail": detail, "time": time.time()})
+        logger.debug(f"Checkpoint: {name}" + (f" ({scope})" if scope else ""))
+
+    def last(self, scope=None):
+        """Name of the latest checkpoint, for a scope (e.g. a date) or run-wide ones"""
+        for entry in reversed(self.reached):
+            if entry["scope"] in (scope, None):
+                return entry["checkpoint"]
+        return None
+
+    def report(self):
+        return list(self.reached)
+
+
+def current_checkpoints():
+    return Checkpoints.slot.current()
+
+
+def reach(name, scope=None, detail=None):
+    """Record that the current run reached a checkpoint"""
+    current_checkpoints().reach(name, scope, detail)
+
+
+def with_retries(step, action, resume, scope=None, policy=None, give_up_on=()):
+    """Run ``action()``, resuming from the last checkpoint and retrying it when it fails
+
+    ``resume(checkpoint)`` restores the browser to the named checkpoint before
+    each retry; when it finds the failed attempt got through after all it
+    returns that result, which is used instead of retrying. Exceptions listed
+    in ``give_up_on`` are never retried.
+    """
+    policy = policy or retry_policy(step)
+    for attempt in range(1, policy.attempts + 1):
+        try:
+            return action()
+        except give_up_on:
+            raise
+        except Exception as e:
+            if attempt == policy.attempts:
+                raise
+            checkpoint = current_checkpoints().last(scope)
+            delay = policy.delay(attempt)
+            logger.warning(
+                f"{step} failed ({type(e).__name__}: {str(e)[:100]}), retrying from "
+                f"'{checkpoint or 'start'}' in {delay:.1f}s (attempt {attempt + 1}/{policy.attempts})"
+            )
+            note_retry(step)
+            time.sleep(delay)
+            try:
+                resumed = resume(checkpoint)
+            except Exception as resume_error:
+                logger.warning(f"Could not resume {step} from '{checkpoint or 'start'}': {str(resume_error)[:100]}")
+                continue
+            if resumed is not None:
+                logger.info(f"{step} completed before it failed, not retrying it")
+                return resumed
@@ -0,0 +1,150 @@
+"""Command-line entry point: ``python -m deskbird [validate-config | dry-run | book]``
+
+Only ``book`` imports selenium and starts a browser. ``validate-config`` and
+``dry-run`` read the environment and work out dates and URLs without any
+browser, credential or network calls, so they return almost immediately.
+Without a subcommand the default is ``book``, which is what the CronJob runs.
+"""
+import os
+import sys
+import json
+import logging
+import argparse
+
+from deskbird.config import BookingConfig
+from deskbird.credentials import credential_backend
+from deskbird.history import open_history, plan_desks
+from deskbird.network import network_profile
+from deskbird.schedule import booking_dates_from_env
+from deskbird.urls import booking_window, dashboard_url, booking_url
+
+logger = logging.getLogger(__name__)
+
+
+def configure_logging():
+    log_level = os.environ.get("LOG_LEVEL", "INFO").upper()
+    logging.basicConfig(
+        level=getattr(logging, log_level, logging.INFO),
+        format='%(asctime)s - %(levelname)s - %(message)s',
+        datefmt='%Y-%m-%d %H:%M:%S'
+    )
+
+
+def config_problems(config):
+    """Every configuration error that can be found without a browser or network, as messages"""
+    problems = []
+    checks = [
+        config.validate,
+        network_profile,
+        credential_backend,
+        booking_dates_from_env,
+    ]
+    for check in checks:
+        try:
+            check()
+        except ValueError as e:
+            problems.append(str(e))
+    return problems
+
+
+def booking_plan(config, booking_dates):
+    """What a booking run would do for each date"""
+    plan = []
+    history = open_history(config.history_path, create=False)
+    for booking_date in booking_dates:
+        start_time, end_time = booking_window(booking_date)
+        plan.append({
+            "date": booking_date.strftime("%Y-%m-%d"),
+            "weekday": booking_date.strftime("%a"),
+            "office_id": config.office_id,
+            "floor_id": config.floor_id,
+            "preferred_desk": config.preferred_desk,
+            "backend": config.booking_backend,
+            "race_release_at": config.race_release_at,
+            "window": [start_time, end_time],
+            "dashboard_url": dashboard_url(config.office_id),
+            "booking_url": booking_url(*config.location_list()[0], booking_date),
+            "locations": [f"{office_id}:{floor_id}" for office_id, floor_id in config.location_list()],
+            "desk_plan": plan_desks(history, config.location_list(), booking_date, config.preferred_desk) if history else [],
+        })
+    return plan
+
+
+def validate_config(args, config):
+    problems = config_problems(config)
+    for problem in problems:
+        logger.error(problem)
+    if problems:
+        return 1
+    logger.info("✓ Configuration is valid")
+    return 0
+
+
+def dry_run(args, config):
+    problems = config_problems(config)
+    if problems:
+        for problem in problems:
+            logger.error(problem)
+        return 1
+    plan = booking_plan(config, booking_dates_from_env())
+    if args.json:
+        print(json.dumps(plan, indent=2))
+    elif not plan:
+        logger.info("No dates to book in the configured range")
+    else:
+        logger.info(f"Would book {len(plan)} date(s) as {config.op_item_name} with the {config.booking_backend} backend:")
+        for entry in plan:
+            desk = entry["preferred_desk"] or "first available desk"
+            logger.info(f"  {entry['date']} ({entry['weekday']})  {desk}  {entry['booking_url']}")
+            if len(entry["locations"]) > 1:
+                logger.info(f"    scanning {', '.join(entry['locations'])}")
+            if entry["desk_plan"]:
+                logger.info("    desk plan: " + ", ".join(name if chance is None else f"{name} ({chance:.0%})" for name, chance in entry["desk_plan"][:5]))
+    return 0
+
+
+def book(args, config):
+    from deskbird.flow import run_bookings, log_outcomes  # Imported here so the other commands run without selenium
+    try:
+        config.validate()
+    except ValueError as e:
+        logger.error(str(e))
+        raise
+
+    if config.preferred_desk:
+        logger.info(f"Preferred desk: {config.preferred_desk}")
+
+    logger.info("Starting Deskbird booking automation")
+    # Defaults to this day next week; BOOKING_DATES / BOOKING_WEEKDAYS book several days in one session
+    booking_dates = booking_dates_from_env()
+    if not booking_dates:
+        logger.info("No dates to book in the configured range")
+        return 0
+
+    outcomes = run_bookings(config, booking_dates)
+    return 1 if log_outcomes(outcomes) else 0
+
+
+COMMANDS = {
+    "validate-config": validate_config,
+    "dry-run": dry_run,
+    "book": book,
+}
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog="deskbird", description="Book Deskbird desks, configured from environment variables")
+    commands = parser.add_subparsers(dest="command", metavar="{validate-config,dry-run,book}")
+    commands.add_parser("validate-config", help="Check the configuration without a browser or network calls")
+    dry = commands.add_parser("dry-run", help="Print the dates and URLs that would be booked")
+    dry.add_argument("--json", action="store_true", help="Print the plan as JSON on stdout")
+    commands.add_parser("book", help="Sign in and book (the default)")
+    return parser
+
+
+def main(argv=None):
+    """Run a subcommand and return its exit code"""
+    args = build_parser().parse_args(sys.argv[1:] if argv is None else argv)
+    configure_logging()
+    config = BookingConfig.from_env()
+    return COMMANDS[args.command or "book"](args, config)
@@ -0,0 +1,81 @@
+import os
+from dataclasses import dataclass, fields, replace
+
+from deskbird.race import release_time
+from deskbird.scan import parse_locations
+
+
+@dataclass
+class BookingConfig:
+    """Everything needed to book a desk for one user"""
+
+    # 1Password item name and vault
+    op_item_name: str = "Deskbird"
+    op_vault: str = "Private"
+    # Deskbird office and floor IDs
+    office_id: str = None
+    floor_id: str = None
+    preferred_desk: str = None  # Optional preferred desk name
+    # "browser" clicks through the dashboard, "http" books through the Deskbird API
+    booking_backend: str = "browser"
+    # Where screenshots and other debugging output are written
+    artifact_dir: str = "/tmp"
+    # Encrypted session cache location, None uses SESSION_STORE_PATH
+    session_store_path: str = None
+    # Booking ledger location, None uses LEDGER_PATH
+    ledger_path: str = None
+    # Availability history location, None uses HISTORY_PATH
+    history_path: str = None
+    # Release instant for race mode ("01:00:00" or an ISO datetime), None books immediately
+    race_release_at: str = None
+    # Ranked "office:floor, ..." pairs scanned together, None uses OFFICE_ID and FLOOR_ID
+    locations: str = None
+
+    def __post_init__(self):
+        # With only BOOKING_LOCATIONS set, the top-ranked location stands in for OFFICE_ID/FLOOR_ID
+        if self.locations and not (self.office_id and self.floor_id):
+            try:
+                self.office_id, self.floor_id = parse_locations(self.locations)[0]
+            except (ValueError, IndexError):
+                pass  # Reported by validate()
+
+    @classmethod
+    def from_env(cls):
+        """Read the single-user configuration from environment variables"""
+        return cls(
+            op_item_name=os.environ.get("OP_ITEM_NAME", "Deskbird"),
+            op_vault=os.environ.get("OP_VAULT", "Private"),
+            office_id=os.environ.get("OFFICE_ID"),
+            floor_id=os.environ.get("FLOOR_ID"),
+            preferred_desk=os.environ.get("PREFERRED_DESK", None),
+            booking_backend=os.environ.get("BOOKING_BACKEND", "browser").lower(),
+            race_release_at=os.environ.get("RACE_RELEASE_AT") or None,
+            locations=os.environ.get("BOOKING_LOCATIONS") or None,
+        )
+
+    def with_overrides(self, values):
+        """Return a copy with the given keys replaced, ignoring unknown or empty ones"""
+        known = {f.name for f in fields(self)}
+        unknown = set(values) - known - {"name"}
+        if unknown:
+            raise ValueError(f"Unknown configuration keys: {', '.join(sorted(unknown))}")
+        return replace(self, **{key: value for key, value in values.items() if key in known and value not in (None, "")})
+
+    def validate(self):
+        """Raise ValueError if required settings are missing or invalid"""
+        if self.locations and not parse_locations(self.locations):
+            raise ValueError("BOOKING_LOCATIONS does not list any office:floor pairs")
+        if not self.office_id or not self.floor_id:
+            raise ValueError("OFFICE_ID and FLOOR_ID environment variables must be set")
+        if self.booking_backend not in ("browser", "http"):
+            raise ValueError(f"BOOKING_BACKEND must be 'browser' or 'http', got '{self.booking_backend}'")
+        if self.race_release_at:
+            release_time(self.race_release_at)
+
+    def location_list(self):
+        """Ranked (office_id, floor_id) pairs to book from; usually just one"""
+        return parse_locations(self.locations, self.office_id, self.floor_id)
+
+    def at_location(self, office_id, floor_id):
+        """A copy of this configuration for one office floor"""
+        return replace(self, office_id=office_id, floor_id=floor_id, locations=None)
@@ -0,0 +1,312 @@
+"""Microsoft credentials for the SSO login, fetched once per run
+
+The item is read in a single call from one of several backends and every
+field (username, password, TOTP secret) is taken from that one payload:
+
+- ``op``: the 1Password CLI (``op item get --format json``), the default
+- ``connect``: a 1Password Connect server (``OP_CONNECT_HOST`` / ``OP_CONNECT_TOKEN``)
+- ``file``: a JSON file in the same format as ``op item get --format json`` (``CREDENTIALS_FILE``)
+- ``env``: ``DESKBIRD_EMAIL`` / ``DESKBIRD_PASSWORD`` / ``DESKBIRD_TOTP_SECRET``
+
+Pick one with ``CREDENTIALS_BACKEND``. MFA codes are generated locally from the
+TOTP secret (see ``deskbird.totp``); the backend is only asked for a code when
+the item has no usable secret.
+
+Fetched credentials are kept in memory for ``CREDENTIALS_CACHE_TTL_SECONDS``
+(default 900) and dropped as soon as a sign-in with them fails, so a long-lived
+process such as the scheduler daemon picks up a rotated password.
+"""
+import os
+import json
+import time
+import logging
+import threading
+import subprocess
+import urllib.request
+from urllib.parse import quote, urlparse, parse_qs
+
+from deskbird.metrics import record
+from deskbird.totp import fresh_code
+
+logger = logging.getLogger(__name__)
+
+_cache = {}
+_cache_lock = threading.Lock()
+
+
+class Credentials:
+    """Username, password and TOTP secret taken from one 1Password item"""
+
+    def __init__(self, email, password, totp_secret=None, otp_source=None):
+        self.email = email
+        self.password = password
+        self.totp_secret = totp_secret
+        self._otp_source = otp_source
+
+    def otp(self):
+        """One-time code for the MFA prompt, generated locally when the secret is known"""
+        if self.totp_secret:
+            try:
+                return fresh_code(self.totp_secret)
+            except ValueError as e:
+                if not self._otp_source:
+                    raise
+                logger.warning(f"Could not generate OTP locally ({e}), asking the backend instead")
+        if not self._otp_source:
+            raise ValueError("No one-time password configured for this item")
+        return self._otp_source()
+
+    def __repr__(self):
+        return f"Credentials(email={self.email!r}, password=***, totp={'yes' if self.totp_secret else 'no'})"
+
+
+def totp_secret_from_value(value):
+    """Accept either a bare base32 secret or an otpauth:// URI"""
+    if not value:
+        return None
+    if value.startswith("otpauth://"):
+        return parse_qs(urlparse(value).query).get("secret", [None])[0]
+    return value.replace(" ", "")
+
+
+def current_code_from_item(item):
+    """The one-time code 1Password includes alongside an OTP field, if any"""
+    for field in item.get("fields", []):
+        if field.get("type") == "OTP" and field.get("totp"):
+            return field["totp"]
+    raise ValueError("Item has no current one-time code")
+
+
+def parse_item(item, item_name):
+    """Pull the username, password and TOTP secret out of a 1Password item payload"""
+    email = password = totp_secret = None
+    for field in item.get("fields", []):
+        purpose = field.get("purpose")
+        # Find the field by purpose, or by id/label (which match the field name for standard fields)
+        if purpose == "USERNAME" or (email is None and "username" in (field.get("id"), field.get("label"))):
+            email = field.get("value", "")
+        elif purpose == "PASSWORD" or (password is None and "password" in (field.get("id"), field.get("label"))):
+            password = field.get("value", "")
+        elif field.get("type") == "OTP" and totp_secret is None:
+            totp_secret = totp_secret_from_value(field.get("value"))
+    for name, value in (("username", email), ("password", password)):
+        if not value:
+            logger.error(f"Field '{name}' not found in item '{item_name}'")
+            raise ValueError(f"Field '{name}' not found in item '{item_name}'")
+    return email, password, totp_secret
+
+
+class OpCliBackend:
+    """Reads the item with one ``op item get`` call"""
+
+    name = "op"
+
+    def fetch_item(self, item_name, vault):
+        logger.debug(f"Fetching item '{item_name}' from 1Password vault '{vault}' with the CLI")
+        try:
+            result = subprocess.run(
+                ["op", "item", "get", item_name, "--vault", vault, "--format", "json"],
+                capture_output=True,
+                text=True,
+                check=True
+            )
+        except subprocess.CalledProcessError as e:
+            logger.error(f"Failed to fetch item from 1Password: {e.stderr}")
+            raise ValueError(f"Failed to fetch item from 1Password: {e.stderr}")
+        return json.loads(result.stdout)
+
+    def otp_source(self, item_name, vault, totp_secret):
+        # Ask op for the current code only when MFA is actually shown
+        def fetch_otp():
+            logger.debug(f"Fetching OTP from 1Password item '{item_name}' in vault '{vault}'")
+            try:
+                result = subprocess.run(
+                    ["op", "item", "get", item_name, "--vault", vault, "--otp"],
+                    capture_output=True,
+                    text=True,
+                    check=True
+                )
+            except subprocess.CalledProcessError as e:
+                logger.error(f"Failed to fetch OTP from 1Password: {e.stderr}")
+                raise ValueError(f"Failed to fetch OTP from 1Password: {e.stderr}")
+            return result.stdout.strip()
+        return fetch_otp
+
+
+class ConnectBackend:
+    """Reads the item from a 1Password Connect server (or a local stand-in)"""
+
+    name = "connect"
+
+    def __init__(self, host=None, token=None, timeout=10):
+        self.host = (host or os.environ.get("OP_CONNECT_HOST", "")).rstrip("/")
+        self.token = token or os.environ.get("OP_CONNECT_TOKEN", "")
+        self.timeout = timeout
+        if not self.host or not self.token:
+            raise ValueError("OP_CONNECT_HOST and OP_CONNECT_TOKEN must be set for the connect backend")
+
+    def _get(self, path):
+        request = urllib.request.Request(f"{self.host}{path}", headers={"Authorization": f"Bearer {self.token}"})
+        with urllib.request.urlopen(request, timeout=self.timeout) as response:
+            return json.loads(response.read())
+
+    def fetch_item(self, item_name, vault):
+        logger.debug(f"Fetching item '{item_name}' from vault '{vault}' via 1Password Connect")
+        vaults = self._get(f"/v1/vaults?filter={_filter('name', vault)}")
+        if not vaults:
+            raise ValueError(f"Vault '{vault}' not found on {self.host}")
+        vault_id = vaults[0]["id"]
+        items = self._get(f"/v1/vaults/{vault_id}/items?filter={_filter('title', item_name)}")
+        if not items:
+            raise ValueError(f"Item '{item_name}' not found in vault '{vault}'")
+        return self._get(f"/v1/vaults/{vault_id}/items/{items[0]['id']}")
+
+    def otp_source(self, item_name, vault, totp_secret):
+        # Connect returns the current code with the item, so re-read it when MFA is shown
+        return lambda: current_code_from_item(self.fetch_item(item_name, vault))
+
+
+def _filter(attribute, value):
+    """URL-encoded SCIM filter as accepted by the Connect list endpoints"""
+    return quote(f'{attribute} eq "{value}"')
+
+
+class FileBackend:
+    """Reads the item from a JSON file, for offline runs and tests"""
+
+    name = "file"
+
+    def __init__(self, path=None):
+        self.path = path or os.environ.get("CREDENTIALS_FILE")
+        if not self.path:
+            raise ValueError("CREDENTIALS_FILE must be set for the file backend")
+
+    def fetch_item(self, item_name, vault):
+        logger.debug(f"Reading item '{item_name}' from {self.path}")
+        with open(self.path) as f:
+            data = json.load(f)
+        # Either a single item or a mapping of item name -> item
+        if "fields" in data:
+            return data
+        return data[item_name]
+
+    def otp_source(self, item_name, vault, totp_secret):
+        return lambda: current_code_from_item(self.fetch_item(item_name, vault))
+
+
+class EnvBackend:
+    """Builds the item from environment variables"""
+
+    name = "env"
+
+    def fetch_item(self, item_name, vault):
+        return {"fields": [
+            {"id": "username", "purpose": "USERNAME", "value": os.environ.get("DESKBIRD_EMAIL", "")},
+            {"id": "password", "purpose": "PASSWORD", "value": os.environ.get("DESKBIRD_PASSWORD", "")},
+            {"id": "totp", "type": "OTP", "value": os.environ.get("DESKBIRD_TOTP_SECRET", "")},
+        ]}
+
+    def otp_source(self, item_name, vault, totp_secret):
+        return None
+
+
+BACKENDS = {
+    "op": OpCliBackend,
+    "connect": ConnectBackend,
+    "file": FileBackend,
+    "env": EnvBackend,
+}
+
+
+def credential_backend(name=None):
+    """Instantiate the backend named by ``name`` or CREDENTIALS_BACKEND"""
+    name = (name or os.environ.get("CREDENTIALS_BACKEND", "op")).lower()
+    if name not in BACKENDS:
+        raise ValueError(f"CREDENTIALS_BACKEND must be one of {', '.join(BACKENDS)}, got '{name}'")
+    return BACKENDS[name]()
+
+
+def cache_ttl():
+    """Seconds fetched credentials are reused for, from CREDENTIALS_CACHE_TTL_SECONDS"""
+    return float(os.environ.get("CREDENTIALS_CACHE_TTL_SECONDS", "900"))
+
+
+def load_credentials(item_name, vault="Private", backend=None):
+    """Fetch an item and keep its credentials in memory for CREDENTIALS_CACHE_TTL_SECONDS"""
+    backend = backend or credential_backend()
+    key = (backend.name, item_name, vault)
+    with _cache_lock:
+        cached = _cache.get(key)
+        if cached and time.monotonic() - cached[1] < cache_ttl():
+            logger.debug(f"Using cached credentials for '{item_name}'")
+            return cached[0]
+        _cache.pop(key, None)
+    item = backend.fetch_item(item_name, vault)
+    email, password, totp_secret = parse_item(item, item_name)
+    credentials = Credentials(email, password, totp_secret, backend.otp_source(item_name, vault, totp_secret))
+    logger.debug(f"Loaded {credentials!r} from the {backend.name} backend")
+    with _cache_lock:
+        _cache[key] = (credentials, time.monotonic())
+    return credentials
+
+
+def forget_credentials(item_name, vault="Private"):
+    """Drop cached credentials for an item, e.g. after they failed to sign in"""
+    with _cache_lock:
+        stale = [key for key in _cache if key[1:] == (item_name, vault)]
+        for key in stale:
+            del _cache[key]
+    if stale:
+        logger.info(f"Forgot cached credentials for '{item_name}', they are fetched again next time")
+
+
+class PendingCredentials:
+    """Credentials still being fetched on a background thread
+
+    Reading any attribute (``.email``, ``.otp()``, ...) blocks until the fetch
+    has finished, so the browser can start while 1Password is being queried
+    and the login only waits at the point it actually types the email.
+    """
+
+    def __init__(self, item_name, vault="Private", backend=None, run=None):
+        self._done = threading.Event()
+        self._credentials = None
+        self._error = None
+        self._run = run
+        self._waited = False
+        threading.Thread(target=self._fetch, args=(item_name, vault, backend), name="credentials", daemon=True).start()
+
+    def _fetch(self, item_name, vault, backend):
+        started = time.monotonic()
+        try:
+            self._credentials = load_credentials(item_name, vault, backend)
+        except Exception as e:
+            self._error = e
+        finally:
+            if self._run:
+                self._run.record("credentials_fetch", time.monotonic() - started, self._error is None)
+            self._done.set()
+
+    def resolve(self):
+        """Block until the credentials are available and return them (or raise the fetch error)"""
+        if not self._waited:
+            self._waited = True
+            started = time.monotonic()
+            self._done.wait()
+            waited = time.monotonic() - started
+            record("credentials_wait", waited, self._error is None)
+            logger.debug(f"Waited {waited:.2f}s for credentials")
+        else:
+            self._done.wait()
+        if self._error:
+            raise self._error
+        return self._credentials
+
+    def __getattr__(self, name):
+        return getattr(self.resolve(), name)
+
+
+def prefetch_credentials(item_name, vault="Private", backend=None, run=None):
+    """Start fetching credentials in the background and return a PendingCredentials"""
+    logger.debug(f"Prefetching credentials for '{item_name}' in the background")
+    return PendingCredentials(item_name, vault, backend, run)
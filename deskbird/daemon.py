@@ -0,0 +1,273 @@
+"""Long-running scheduler that keeps a warm browser between bookings
+
+Run ``python -m deskbird.daemon``. Bookings are scheduled internally from a
+cron expression (``DAEMON_SCHEDULE``, default the CronJob's ``0 1 * * 1,4``),
+and the same signed-in Chromium is reused across jobs. It is recycled after
+``DAEMON_RECYCLE_JOBS`` jobs, when its memory passes ``DAEMON_RECYCLE_RSS_MB``,
+or after a failed job. ``GET /healthz`` and ``GET /status`` on
+``DAEMON_HEALTH_PORT`` report liveness and the last run results.
+"""
+import os
+import json
+import time
+import signal
+import logging
+import argparse
+import threading
+from datetime import datetime, timedelta
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from deskbird.config import BookingConfig
+from deskbird.metrics import tree_rss
+from deskbird.schedule import booking_dates_from_env
+
+logger = logging.getLogger(__name__)
+
+# (lowest, highest) value of each cron field
+CRON_FIELDS = [(0, 59), (0, 23), (1, 31), (1, 12), (0, 7)]
+
+
+def parse_cron_field(field, lowest, highest):
+    """Expand one cron field ('*', '1,4', '9-17', '*/15') into a set of values"""
+    values = set()
+    for part in field.split(","):
+        body, _, step = part.partition("/")
+        if body == "*":
+            start, end = lowest, highest
+        elif "-" in body:
+            start, end = (int(value) for value in body.split("-", 1))
+        else:
+            start = end = int(body)
+        if start < lowest or end > highest or start > end:
+            raise ValueError(f"Cron field '{field}' is outside {lowest}-{highest}")
+        values.update(range(start, end + 1, int(step) if step else 1))
+    return values
+
+
+class CronSchedule:
+    """A five-field cron expression (minute hour day-of-month month day-of-week)"""
+
+    def __init__(self, spec):
+        fields = spec.split()
+        if len(fields) != 5:
+            raise ValueError(f"DAEMON_SCHEDULE must have five fields, got '{spec}'")
+        self.spec = spec
+        self.minutes, self.hours, self.days, self.months, weekdays = (
+            parse_cron_field(field, lowest, highest) for field, (lowest, highest) in zip(fields, CRON_FIELDS)
+        )
+        # Cron counts Sunday as 0, Python's weekday() counts Monday as 0
+        self.weekdays = {(day - 1) % 7 for day in weekdays}
+        self.any_day, self.any_weekday = fields[2] == "*", fields[4] == "*"
+
+    def _day_matches(self, moment):
+        day, weekday = moment.day in self.days, moment.weekday() in self.weekdays
+        # As in cron, a restricted day-of-month and day-of-week match if either does
+        if not self.any_day and not self.any_weekday:
+            return day or weekday
+        return day and weekday
+
+    def next_after(self, moment):
+        """The first matching minute strictly after ``moment``"""
+        candidate = moment.replace(second=0, microsecond=0) + timedelta(minutes=1)
+        limit = candidate + timedelta(days=366 * 4)
+        while candidate < limit:
+            if candidate.month not in self.months or not self._day_matches(candidate):
+                candidate = candidate.replace(hour=0, minute=0) + timedelta(days=1)
+            elif candidate.hour not in self.hours:
+                candidate = candidate.replace(minute=0) + timedelta(hours=1)
+            elif candidate.minute not in self.minutes:
+                candidate += timedelta(minutes=1)
+            else:
+                return candidate
+        raise ValueError(f"Cron expression '{self.spec}' never matches")
+
+
+class WarmBrowser:
+    """One Chromium kept alive between jobs and recycled when it gets old or heavy"""
+
+    def __init__(self, max_jobs=20, max_rss_mb=700):
+        self.max_jobs = max_jobs
+        self.max_rss_mb = max_rss_mb
+        self.driver = None
+        self.jobs = 0
+        self.started_at = None
+
+    def get(self):
+        from deskbird.browser import create_driver  # Imported here so the scheduler starts without selenium
+        if self.driver and not self.alive():
+            logger.warning("Warm browser stopped responding, starting a new one")
+            self.close()
+        if not self.driver:
+            self.driver = create_driver()
+            self.jobs = 0
+            self.started_at = time.time()
+        return self.driver
+
+    def alive(self):
+        try:
+            self.driver.current_url
+            return True
+        except Exception:
+            return False
+
+    def rss_mb(self):
+        if not self.driver:
+            return 0
+        return tree_rss(self.driver.service.process.pid) / 2**20
+
+    def job_finished(self, healthy):
+        """Count a job and recycle the browser if it failed or has reached a limit"""
+        self.jobs += 1
+        rss = self.rss_mb()
+        if not healthy:
+            logger.info("Recycling browser after a failed job")
+        elif self.jobs >= self.max_jobs:
+            logger.info(f"Recycling browser after {self.jobs} jobs")
+        elif rss >= self.max_rss_mb:
+            logger.info(f"Recycling browser at {rss:.0f} MiB (limit {self.max_rss_mb} MiB)")
+        else:
+            return
+        self.close()
+
+    def close(self):
+        if self.driver:
+            try:
+                self.driver.quit()
+            except Exception:
+                logger.debug("Browser already closed")
+        self.driver = None
+
+    def status(self):
+        return {
+            "running": self.driver is not None,
+            "jobs": self.jobs,
+            "started_at": self.started_at,
+            "rss_mb": round(self.rss_mb(), 1),
+        }
+
+
+class Scheduler:
+    """Runs bookings on a cron schedule with a warm browser"""
+
+    def __init__(self, config, schedule, browser):
+        self.config = config
+        self.schedule = schedule
+        self.browser = browser
+        self.started_at = time.time()
+        self.next_run = None
+        self.last_run = None
+        self.runs = 0
+        self.failures = 0
+        self._stop = threading.Event()
+        self._lock = threading.Lock()
+
+    def run_job(self):
+        """Book the configured dates once with the warm browser"""
+        from deskbird.flow import run_bookings  # Imported here so the scheduler starts without selenium
+        started = time.time()
+        healthy = False
+        try:
+            booking_dates = booking_dates_from_env()
+            if not booking_dates:
+                logger.info("No dates to book in the configured range")
+                outcomes = []
+            else:
+                outcomes = run_bookings(self.config, booking_dates, driver=self.browser.get())
+            # "unavailable" is not the browser's fault, so only real failures recycle it
+            healthy = not any(outcome["status"] == "failed" for outcome in outcomes)
+            success = all(outcome["status"] in ("booked", "already_booked") for outcome in outcomes)
+            result = {"success": success, "outcomes": outcomes, "error": None}
+        except Exception as e:
+            logger.error(f"Scheduled booking failed: {type(e).__name__}: {str(e)[:200]}")
+            result = {"success": False, "outcomes": [], "error": f"{type(e).__name__}: {str(e)[:200]}"}
+        finally:
+            self.browser.job_finished(healthy)
+        result.update(started_at=started, seconds=round(time.time() - started, 1))
+        with self._lock:
+            self.last_run = result
+            self.runs += 1
+            self.failures += 0 if result["success"] else 1
+        return result
+
+    def serve_forever(self, run_now=False):
+        if run_now:
+            self.run_job()
+        while not self._stop.is_set():
+            self.next_run = self.schedule.next_after(datetime.now())
+            logger.info(f"Next booking run at {self.next_run.strftime('%Y-%m-%d %H:%M')}")
+            if self._stop.wait(max(0, (self.next_run - datetime.now()).total_seconds())):
+                break
+            self.run_job()
+        self.browser.close()
+        logger.info("Scheduler stopped")
+
+    def stop(self):
+        self._stop.set()
+
+    def status(self):
+        with self._lock:
+            return {
+                "schedule": self.schedule.spec,
+                "uptime_seconds": round(time.time() - self.started_at),
+                "next_run": self.next_run.isoformat() if self.next_run else None,
+                "runs": self.runs,
+                "failures": self.failures,
+                "last_run": self.last_run,
+                "browser": self.browser.status(),
+            }
+
+
+def start_health_server(scheduler, port, host="0.0.0.0"):
+    """Serve /healthz and /status in a background thread"""
+    class HealthHandler(BaseHTTPRequestHandler):
+        def log_message(self, format, *args):
+            logger.debug(f"health: {format % args}")
+
+        def do_GET(self):
+            if self.path == "/healthz":
+                status, payload = 200, {"status": "ok"}
+            elif self.path == "/status":
+                status, payload = 200, scheduler.status()
+            else:
+                status, payload = 404, {"message": "Not found"}
+            body = json.dumps(payload, default=str).encode()
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+    server = ThreadingHTTPServer((host, port), HealthHandler)
+    threading.Thread(target=server.serve_forever, name="health", daemon=True).start()
+    logger.info(f"Health endpoint listening on http://{host}:{port}/status")
+    return server
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Book Deskbird desks on a schedule with a warm browser")
+    parser.add_argument("--schedule", default=os.environ.get("DAEMON_SCHEDULE", "0 1 * * 1,4"), help="Cron expression (container time)")
+    parser.add_argument("--port", type=int, default=int(os.environ.get("DAEMON_HEALTH_PORT", "8080")), help="Health/status port, 0 to disable")
+    parser.add_argument("--recycle-jobs", type=int, default=int(os.environ.get("DAEMON_RECYCLE_JOBS", "20")))
+    parser.add_argument("--recycle-rss-mb", type=float, default=float(os.environ.get("DAEMON_RECYCLE_RSS_MB", "700")))
+    parser.add_argument("--run-now", action="store_true", help="Run one booking immediately on startup")
+    args = parser.parse_args()
+
+    log_level = os.environ.get("LOG_LEVEL", "INFO").upper()
+    logging.basicConfig(
+        level=getattr(logging, log_level, logging.INFO),
+        format='%(asctime)s - %(levelname)s - %(message)s',
+        datefmt='%Y-%m-%d %H:%M:%S'
+    )
+
+    config = BookingConfig.from_env()
+    config.validate()
+    scheduler = Scheduler(config, CronSchedule(args.schedule), WarmBrowser(args.recycle_jobs, args.recycle_rss_mb))
+    if args.port:
+        start_health_server(scheduler, args.port)
+    signal.signal(signal.SIGTERM, lambda signum, frame: scheduler.stop())
+    signal.signal(signal.SIGINT, lambda signum, frame: scheduler.stop())
+    scheduler.serve_forever(run_now=args.run_now)
+
+
+if __name__ == "__main__":
+    main()
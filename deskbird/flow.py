@@ -0,0 +1,837 @@
+import os
+import time
+import logging
+
+from selenium.webdriver.common.by import By
+from selenium.common.exceptions import TimeoutException, WebDriverException
+
+from deskbird.active import ActiveRun
+from deskbird.api import DeskbirdClient, DeskbirdApiError, capture_bearer_token, book_full_day
+from deskbird.browser import create_driver
+from deskbird.capture import DebugCapture, snapshot
+from deskbird.checkpoints import Checkpoints, reach, with_retries
+from deskbird.metrics import RunMetrics, phase, record, note_selector
+from deskbird.credentials import prefetch_credentials, forget_credentials
+from deskbird.history import open_history, observe, planned_preference
+from deskbird.inventory import read_inventory
+from deskbird.ledger import open_ledger, reconcile_with_api
+from deskbird.memory import MemoryWatchdog, MemoryBudgetExceeded, check_memory, relieve_memory, within_budget
+from deskbird.locators import resolve
+from deskbird.network import network_profile, install_filter
+from deskbird.urls import app_url, on_app, booking_window, dashboard_url, booking_url
+from deskbird.scan import scan_locations, scan_location_tabs, best_desk
+from deskbird.race import release_time, wait_for_instant, burst, prepare_api_booking, fire_api_booking
+from deskbird.session_store import open_session_store, capture_session, restore_session, forget_seed_script
+from deskbird.waits import wait_for_element, wait_for_any, wait_for_url, wait_for_window_count, wait_for_network_idle, settle
+
+logger = logging.getLogger(__name__)
+
+MS_EMAIL_SELECTOR = "input[type='email'], input[name='loginfmt']"
+OTP_INPUT_SELECTOR = "input[type='tel'], input[name='otc']"
+STAY_SIGNED_IN_XPATH = "//input[@type='submit' and @value='Yes']"
+
+
+def enter_microsoft_credentials(driver, config, credentials):
+    """Fill in the Microsoft email, password and OTP screens"""
+    # Step 3: Enter email in Microsoft login popup
+    phase("ms_email")
+    logger.info("Step 3: Entering email in Microsoft login")
+    
+    logger.debug("Waiting for Microsoft email input field")
+    ms_email_input = wait_for_element(driver, "ms_form", (By.CSS_SELECTOR, MS_EMAIL_SELECTOR))
+    ms_email_input.clear()
+    ms_email_input.send_keys(credentials.email)
+    logger.debug(f"Email entered in Microsoft login form")
+    
+    # Click Next button
+    next_button = wait_for_element(driver, "ms_form", (By.XPATH, "//input[@type='submit' and @value='Next']"), clickable=True)
+    next_button.click()
+    logger.debug("Next button clicked")
+    
+    # Step 4: Enter password
+    phase("ms_password")
+    logger.info("Step 4: Entering password")
+    logger.debug(f"Password length: {len(credentials.password)} characters")
+    logger.debug("Waiting for password input field")
+    ms_password_input = wait_for_element(driver, "ms_next_page", (By.CSS_SELECTOR, "input[type='password'], input[name='passwd']"), clickable=True)
+    # Just send keys directly without clearing
+    ms_password_input.send_keys(credentials.password)
+    logger.info("Password entered successfully")
+    snapshot(driver, "password_entered")
+    
+    # Click Sign in button
+    logger.debug("Clicking Sign in button")
+    signin_button = wait_for_element(driver, "ms_form", (By.XPATH, "//input[@type='submit' and @value='Sign in']"), clickable=True)
+    signin_button.click()
+    logger.debug("Sign in button clicked")
+    
+    # Step 5: Handle post-password page (OTP or Stay signed in)
+    logger.info("Step 5: Waiting for post-authentication page")
+    in_popup = len(driver.window_handles) > 1
+    try:
+        wait_for_any(
+            driver, "ms_next_page",
+            lambda d: d.find_elements(By.CSS_SELECTOR, OTP_INPUT_SELECTOR),
+            lambda d: d.find_elements(By.XPATH, STAY_SIGNED_IN_XPATH),
+            lambda d: in_popup and len(d.window_handles) == 1,
+            lambda d: not in_popup and on_app(d.current_url),
+        )
+    except TimeoutException:
+        logger.debug("No recognised page after password, continuing")
+    logger.debug(f"Current URL: {driver.current_url}")
+    snapshot(driver, "after_password")
+    
+    # Check if OTP is required
+    try:
+        otp_inputs = driver.find_elements(By.CSS_SELECTOR, OTP_INPUT_SELECTOR)
+    except WebDriverException:
+        otp_inputs = []  # The popup has already closed
+    if otp_inputs:
+        phase("otp")
+        otp_input = otp_inputs[0]
+        logger.info("OTP page detected, fetching one-time code")
+        otp_code = credentials.otp()
+        logger.debug(f"OTP code starts with: {otp_code[:3]}...")
+        otp_input.clear()
+        otp_input.send_keys(otp_code)
+        logger.debug("OTP code entered")
+        
+        # Click Verify button
+        verify_button = wait_for_element(driver, "ms_form", (By.XPATH, "//input[@type='submit' and @value='Verify']"), clickable=True)
+        verify_button.click()
+        logger.info("OTP submitted successfully")
+        
+        # After OTP, wait for either the "Stay signed in?" prompt or the popup closing
+        try:
+            wait_for_any(
+                driver, "stay_signed_in",
+                lambda d: d.find_elements(By.XPATH, STAY_SIGNED_IN_XPATH),
+                lambda d: in_popup and len(d.window_handles) == 1,
+                lambda d: not in_popup and on_app(d.current_url),
+            )
+        except TimeoutException:
+            logger.debug("No 'Stay signed in' prompt found after OTP")
+    else:
+        logger.debug("No OTP page found, checking for other prompts")
+    
+    # Check for "Stay signed in?" prompt
+    try:
+        yes_buttons = driver.find_elements(By.XPATH, STAY_SIGNED_IN_XPATH)
+        if yes_buttons:
+            logger.info("Found 'Stay signed in?' prompt, clicking Yes")
+            yes_buttons[0].click()
+        else:
+            logger.debug("No 'Stay signed in' prompt found")
+    except WebDriverException:
+        # The popup can close by itself between the lookup and the click
+        logger.debug("Popup closed before 'Stay signed in' could be answered")
+
+
+def sign_in_with_microsoft(driver, config, credentials):
+    """Log in through the Deskbird check-in page and the Microsoft SSO popup"""
+    # Step 1: Go to login page and enter email
+    phase("login")
+    logger.info("Step 1: Navigating to login page")
+    driver.get(app_url("/login/check-in"))
+    logger.debug("Login page loaded")
+    
+    logger.debug("Waiting for email input field")
+    email_input = wait_for_element(driver, "login_form", (By.NAME, "email"))
+    # Blocks here if the background credential fetch is still running
+    email = credentials.email
+    logger.info("Credentials retrieved successfully")
+    email_input.send_keys(email)
+    logger.info(f"Entered email: {credentials.email}")
+    snapshot(driver, "after_email")
+    
+    # Step 2: Click "Sign in" button
+    logger.info("Step 2: Clicking 'Sign in' button")
+    signin_button = wait_for_element(driver, "login_form", (By.XPATH, "//button[contains(., 'Sign in')]"), clickable=True)
+    signin_button.click()
+    logger.debug("Sign in button clicked")
+    
+    # Step 2b: Click "Sign in with Microsoft" button once it appears
+    logger.info("Step 2b: Clicking 'Sign in with Microsoft' button")
+    microsoft_button = wait_for_element(driver, "sso_button", (By.XPATH, "//button[contains(., 'Sign in with Microsoft')]"), clickable=True)
+    logger.debug(f"Current URL: {driver.current_url}")
+    microsoft_button.click()
+    logger.debug("Microsoft SSO button clicked")
+    
+    # Wait for the popup window (or a same-window redirect to Microsoft) and switch to it
+    try:
+        wait_for_any(
+            driver, "sso_popup",
+            lambda d: len(d.window_handles) > 1,
+            lambda d: "microsoftonline.com" in d.current_url,
+        )
+    except TimeoutException:
+        logger.warning("Microsoft sign-in did not open, continuing")
+    logger.debug(f"Number of windows: {len(driver.window_handles)}")
+    if len(driver.window_handles) > 1:
+        logger.info("Switching to Microsoft SSO popup window")
+        driver.switch_to.window(driver.window_handles[-1])
+        # The popup is a separate target, so it needs its own copy of the request filter
+        install_filter(driver, network_profile())
+    
+    logger.debug(f"Current URL after popup: {driver.current_url}")
+    snapshot(driver, "ms_popup")
+    popup_opened = len(driver.window_handles) > 1
+    
+    # A remembered Microsoft session closes the popup without showing any form
+    wait_for_any(
+        driver, "ms_form",
+        lambda d: popup_opened and len(d.window_handles) == 1,
+        lambda d: d.find_elements(By.CSS_SELECTOR, MS_EMAIL_SELECTOR),
+    )
+    if popup_opened and len(driver.window_handles) == 1:
+        logger.info("Microsoft session still valid, skipping credential entry")
+    else:
+        enter_microsoft_credentials(driver, config, credentials)
+    
+    # Wait for authentication to complete - popup should close automatically
+    phase("popup_close")
+    logger.info("Waiting for authentication to complete")
+    wait_for_window_count(driver, "auth_complete", 1)
+    logger.debug("Popup closed, switching to main window")
+    
+    # Switch back to main window
+    driver.switch_to.window(driver.window_handles[0])
+    
+    # Wait for redirect to complete on main window
+    wait_for_url(driver, "auth_complete", lambda url: "login" not in url and on_app(url))
+    logger.info(f"Authentication successful! Current URL: {driver.current_url}")
+
+
+def session_is_accepted(driver):
+    """Wait for the dashboard to either render or bounce to the login page"""
+    try:
+        wait_for_any(
+            driver, "dashboard",
+            lambda d: "login" in d.current_url,
+            lambda d: d.find_elements(By.XPATH, "//db-my-spaces"),
+        )
+    except TimeoutException:
+        logger.debug(f"Dashboard did not settle in time, current URL: {driver.current_url}")
+        return False
+    return "login" not in driver.current_url
+
+
+def book_desk(driver, config, booking_date, start_time, end_time, dashboard_loaded=False):
+    """Open the dashboard for the booking window and click through a booking (Steps 6a-8)"""
+    dashboard_page = dashboard_url(config.office_id)
+    phase("dashboard_load")
+    
+    # First navigate to the main booking dashboard to ensure sidebar loads
+    # (skipped when a restored session or an earlier date already loaded it)
+    if not dashboard_loaded:
+        logger.info("Step 6a: Navigating to main booking dashboard")
+        logger.debug(f"Office ID: {config.office_id}")
+        driver.get(dashboard_page)
+        settle(driver, "dashboard")
+        logger.debug("Main dashboard loaded")
+    
+    # Now navigate to the specific date
+    url = booking_url(config.office_id, config.floor_id, booking_date)
+    
+    logger.info(f"Step 6b: Navigating to booking page for {booking_date.strftime('%Y-%m-%d')}")
+    logger.debug(f"Floor ID: {config.floor_id}")
+    logger.debug(f"Booking URL: {url}")
+    driver.get(url)
+    
+    # Wait for My Spaces widget to load (contains the Quick book button)
+    logger.info("Waiting for desk availability to load")
+    try:
+        wait_for_element(driver, "desk_cards", (By.XPATH, "//db-my-spaces"))
+        logger.debug("My Spaces widget loaded")
+    except TimeoutException:
+        logger.warning("My Spaces widget may not be loaded")
+    
+    # Then for Angular to finish fetching and rendering the availability
+    if settle(driver, "desk_cards"):
+        logger.debug("Page content loaded")
+    else:
+        logger.warning("Page may not be fully loaded")
+    
+    snapshot(driver, "booking_page")
+    reach("dashboard_loaded", booking_date.strftime("%Y-%m-%d"))
+    
+    # Step 6c: Check if already booked
+    phase("desk_scan")
+    logger.info("Step 6c: Checking if already booked for this date")
+    try:
+        # Look for specific booking indicator - check if "No bookings" message exists
+        no_bookings = driver.find_element(By.XPATH, "//div[contains(text(), 'No bookings for the selected day')]")
+        logger.debug("Found 'No bookings' message, proceeding with booking attempt")
+    except:
+        # If "No bookings" message doesn't exist, there might be an existing booking
+        try:
+            # Look for actual booking cards/items in My bookings section
+            existing_booking = driver.find_element(By.XPATH, "//div[contains(@class, 'booking-card') or contains(@class, 'booked-desk')]")
+            if existing_booking:
+                logger.info("✓ Desk already booked for this date - no action needed")
+                return {"status": "already_booked", "desk": None}
+        except:
+            logger.debug("Could not determine booking status clearly, proceeding with booking attempt")
+    
+    # Step 7: Click the first available "Quick book" button
+    logger.info("Step 7: Looking for booking button")
+    
+    # Scroll down to make sure all desk cards are visible (especially bottom ones)
+    logger.debug("Scrolling to reveal all desk cards")
+    driver.execute_script("window.scrollTo(0, document.body.scrollHeight);")
+    # Cards further down may be lazy loaded once they scroll into view
+    try:
+        wait_for_network_idle(driver, "lazy_cards")
+    except TimeoutException:
+        logger.debug("Network still busy after scrolling, continuing")
+    snapshot(driver, "after_scroll")
+    logger.debug("Screenshot after scroll saved")
+    
+    button_found = False
+    booked_desk = None
+    
+    # One round trip for every desk card instead of a lookup per button, also kept in the availability history
+    try:
+        inventory = read_inventory(driver)
+        observe(config.office_id, config.floor_id, booking_date, [(desk.id, desk.available) for desk in inventory.desks])
+    except Exception as e:
+        logger.debug(f"Could not read the desk inventory: {str(e)[:100]}")
+        inventory = None
+    
+    # If preferred desks are specified (or planned from the history), try them first, in order
+    if config.preferred_desk:
+        logger.info(f"Looking for preferred desk: {config.preferred_desk}")
+        try:
+            inventory = inventory or read_inventory(driver)
+            logger.info(f"Found {len(inventory)} desks, {len(inventory.available())} available")
+            desk = inventory.pick(config.preferred_desk)
+            if desk:
+                logger.info(f"Found preferred entry: {desk.id}" + (f" ({desk.zone})" if desk.zone else ""))
+                driver.execute_script("arguments[0].scrollIntoView({block: 'center'});", desk.button)
+                snapshot(driver, "preferred_desk_view")
+                desk.button.click()
+                note_selector("desk_scan", "desk inventory")
+                logger.info(f"✓ Successfully booked preferred desk: {desk.id}")
+                booked_desk = desk.id
+                button_found = True
+            else:
+                logger.warning(f"Preferred desk '{config.preferred_desk}' not available, will book any other desk")
+        except Exception as e:
+            logger.warning(f"Could not find preferred desk: {str(e)[:100]}")
+    
+    # If preferred desk wasn't booked, try to book any available desk
+    if not button_found:
+        phase("click")
+        logger.info("Looking for any available desk")
+        # Try different selectors in order of preference
+        selectors = [
+            (By.CSS_SELECTOR, "a[data-testid='common--user-spaces-cards-quick-book']"),
+            (By.XPATH, "//a[@data-testid='common--user-spaces-cards-quick-book']"),
+            (By.XPATH, "//a[contains(text(), 'Quick book')]"),
+            (By.XPATH, "//a[contains(., 'Quick book')]"),
+            (By.XPATH, "//button[contains(text(), 'Book')]"),
+            (By.XPATH, "//button[contains(., 'Book')]"),
+            (By.XPATH, "//a[contains(@class, 'book-cta')]"),
+            (By.CSS_SELECTOR, "button[class*='book']"),
+            (By.CSS_SELECTOR, "a[class*='book']"),
+        ]
+        
+        # All selectors race in one wait, so a miss costs one timeout instead of one per selector
+        quick_book_button, locator = resolve(driver, "quick_book", selectors, clickable=True)
+        if quick_book_button:
+            logger.info(f"Found button with {locator[0]} selector")
+            quick_book_button.click()
+            logger.info("✓ Clicked 'Quick book' button - booked any available desk")
+            button_found = True
+    
+    if not button_found:
+        logger.error("Could not find booking button with any selector")
+        page_source = None
+        try:
+            # Serialize the DOM once; the caller's error handling puts this copy in the debug bundle
+            page_source = driver.page_source
+            logger.error(f"Current URL: {driver.current_url}")
+            logger.error(f"Page source length: {len(page_source)} characters")
+            
+            # Search for "book" in page source
+            page_lower = page_source.lower()
+            if "book" in page_lower:
+                logger.info("Found 'book' in page source. Contexts:")
+                import re
+                matches = re.finditer(r'.{0,100}book.{0,100}', page_lower, re.IGNORECASE)
+                for i, match in enumerate(matches):
+                    if i < 10:  # Show first 10 matches
+                        logger.info(f"  Match {i+1}: ...{match.group()}...")
+            else:
+                logger.error("'book' not found anywhere in page source")
+            
+            logger.info("Page source (first 5000 chars):")
+            logger.info(page_source[:5000])
+        except Exception as e:
+            logger.error(f"Could not get debug info (driver may have crashed): {str(e)[:100]}")
+        raise QuickBookNotFound("Could not find Quick book button", page_source)
+    
+    reach("desk_selected", booking_date.strftime("%Y-%m-%d"), booked_desk)
+    
+    # Step 8: Enable "Full day" toggle if it exists and is disabled
+    phase("full_day_toggle")
+    logger.info("Step 8: Checking for 'Full day' toggle")
+    settle(driver, "booking_modal")  # Wait for booking modal/dialog to appear
+    snapshot(driver, "booking_modal")
+    
+    try:
+        # Look for the Full day toggle switch
+        # Try different possible selectors for the toggle
+        toggle_selectors = [
+            (By.XPATH, "//label[contains(text(), 'Full day')]/..//input[@type='checkbox']"),
+            (By.XPATH, "//label[contains(., 'Full day')]/..//input[@type='checkbox']"),
+            (By.XPATH, "//input[@type='checkbox' and contains(@id, 'fullday')]"),
+            (By.XPATH, "//input[@type='checkbox' and contains(@id, 'fullDay')]"),
+            (By.XPATH, "//input[@type='checkbox' and contains(@name, 'fullday')]"),
+            (By.XPATH, "//input[@type='checkbox' and contains(@name, 'fullDay')]"),
+            (By.CSS_SELECTOR, "input[type='checkbox'][id*='fullday'], input[type='checkbox'][id*='full-day']"),
+            (By.CSS_SELECTOR, "input[type='checkbox'][name*='fullday'], input[type='checkbox'][name*='full-day']"),
+        ]
+        
+        full_day_toggle, locator = resolve(driver, "full_day_toggle", toggle_selectors)
+        toggle_found = full_day_toggle is not None
+        if toggle_found:
+            # Check if the toggle is already enabled
+            is_checked = full_day_toggle.is_selected()
+            logger.info(f"Full day toggle found! Currently {'enabled' if is_checked else 'disabled'}")
+            
+            if not is_checked:
+                logger.info("Enabling 'Full day' toggle")
+                # Click the toggle to enable it
+                full_day_toggle.click()
+                settle(driver, "booking_modal")
+                logger.info("'Full day' toggle enabled")
+                snapshot(driver, "fullday_enabled")
+            else:
+                logger.debug("'Full day' toggle is already enabled")
+        
+        if not toggle_found:
+            logger.warning("Could not find 'Full day' toggle - it may already be enabled by URL parameter or not present")
+    except Exception as e:
+        logger.warning(f"Error while looking for Full day toggle: {str(e)[:200]}")
+        logger.info("Continuing with booking...")
+    
+    # Wait for the booking request to finish before closing the browser
+    phase("booking_confirm")
+    settle(driver, "booking_confirmed")
+    snapshot(driver, "after_booking")
+    reach("booked", booking_date.strftime("%Y-%m-%d"), booked_desk)
+    logger.info("✓ Booking completed successfully!")
+    return {"status": "booked", "desk": booked_desk}
+
+
+class BookingError(Exception):
+    """Raised when a date could not be booked"""
+
+
+class QuickBookNotFound(Exception):
+    """No booking button on the dashboard, carrying the page source already read while diagnosing it"""
+
+    def __init__(self, message, page_source=None):
+        super().__init__(message)
+        self.page_source = page_source
+
+
+def race_date(driver, config, booking_date, client=None, dashboard_loaded=False):
+    """Prepare a booking ahead of RACE_RELEASE_AT and submit it the instant the window opens"""
+    release = release_time(config.race_release_at)
+    start_time, end_time = booking_window(booking_date)
+    
+    # Get everything that does not depend on the window being open out of the way
+    phase("race_prepare")
+    if client:
+        try:
+            existing = client.list_bookings(start_time, end_time)
+        except DeskbirdApiError as e:
+            logger.warning(f"API unavailable, racing through the dashboard instead: {str(e)[:200]}")
+            return race_date(driver, config, booking_date, None, dashboard_loaded)
+        if existing:
+            logger.info(f"✓ Desk already booked for this date (booking {existing[0].get('id')}) - no action needed")
+            return {"status": "already_booked", "booking_id": existing[0].get("id"), "desk": existing[0].get("zoneItemName")}
+        candidates = prepare_api_booking(client, config.office_id, config.floor_id, start_time, end_time, config.preferred_desk)
+        attempt = lambda: fire_api_booking(client, config.office_id, config.floor_id, start_time, end_time, candidates, config.preferred_desk)
+    else:
+        if not dashboard_loaded:
+            logger.info("Preloading the booking dashboard")
+            driver.get(dashboard_url(config.office_id))
+            settle(driver, "dashboard")
+        attempt = lambda: book_desk(driver, config, booking_date, start_time, end_time, dashboard_loaded=True)
+    
+    phase("race_wait")
+    wait_seconds = release.timestamp() - time.time()
+    if wait_seconds > 0:
+        logger.info(f"Race mode: ready, waiting {wait_seconds:.1f}s for the booking window to open at {release.strftime('%H:%M:%S.%f')[:-3]}")
+    lateness = wait_for_instant(release.timestamp())
+    logger.debug(f"Woke {lateness * 1000:.2f} ms after the release instant")
+    
+    phase("race_fire")
+    outcome, latency, attempts = burst(attempt, release.timestamp())
+    record("race_latency", latency, outcome["status"] in ("booked", "already_booked"))
+    logger.info(f"Window open to confirmed booking: {latency * 1000:.0f} ms ({attempts} attempt(s))")
+    if outcome["status"] == "unavailable":
+        raise BookingError("No desks available when the booking window opened")
+    return outcome
+
+
+def book_best_location(driver, config, booking_date, locations, client=None, dashboard_loaded=False):
+    """Scan every ranked office floor at once and book the best desk across them"""
+    if config.race_release_at:
+        logger.info(f"Race mode books on the top-ranked location {locations[0][0]}:{locations[0][1]}")
+        return book_date(driver, config.at_location(*locations[0]), booking_date, client, dashboard_loaded)
+    start_time, end_time = booking_window(booking_date)
+    
+    phase("location_scan")
+    try:
+        scanner = client or DeskbirdClient(capture_bearer_token(driver))
+        existing = scanner.list_bookings(start_time, end_time)
+    except DeskbirdApiError as e:
+        if not hasattr(driver, "evaluate_in_tabs"):
+            logger.warning(f"Cannot scan through the API, trying the locations one at a time: {str(e)[:200]}")
+            return book_locations_in_turn(driver, config, booking_date, locations, dashboard_loaded)
+        # book_desk still spots an existing booking on the dashboard, so only the API's check is skipped
+        logger.warning(f"Cannot scan through the API, reading the locations in parallel tabs: {str(e)[:200]}")
+        scanner = existing = None
+    if existing:
+        logger.info(f"✓ Desk already booked for this date (booking {existing[0].get('id')}) - no action needed")
+        return {"status": "already_booked", "booking_id": existing[0].get("id"), "desk": existing[0].get("zoneItemName")}
+    logger.info(f"Scanning {len(locations)} locations in parallel")
+    if scanner:
+        results = scan_locations(scanner, locations, start_time, end_time)
+    else:
+        results = scan_location_tabs(driver, locations, booking_date)
+        if all(result.error for result in results):
+            logger.warning("No location could be read in a tab, trying them one at a time")
+            return book_locations_in_turn(driver, config, booking_date, locations, dashboard_loaded)
+    for result in results:
+        if not result.error:
+            observe(result.office_id, result.floor_id, booking_date, [(desk.get("name"), desk.get("isAvailable")) for desk in result.desks])
+    location, desk = best_desk(results, config.preferred_desk)
+    if not desk:
+        raise BookingError(f"No desks available on any of the {len(locations)} scanned floors")
+    logger.info(f"Best desk: {desk.get('name')} on {location}")
+    placed = {"office_id": location.office_id, "floor_id": location.floor_id}
+    
+    if client:
+        phase("api_booking")
+        try:
+            booking = client.create_booking(location.office_id, desk, start_time, end_time)
+            reach("booked", booking_date.strftime("%Y-%m-%d"), desk.get("name"))
+            logger.info(f"✓ Booked desk {desk.get('name')} (booking {booking.get('id')})")
+            return dict(placed, status="booked", booking_id=booking.get("id"), desk=desk.get("name"))
+        except DeskbirdApiError as e:
+            logger.warning(f"API booking failed, falling back to the dashboard: {str(e)[:200]}")
+    
+    # Book that desk on its own floor's dashboard (any desk there if it was taken meanwhile)
+    target = config.at_location(location.office_id, location.floor_id).with_overrides({"preferred_desk": desk.get("name")})
+    same_office = location.office_id == config.office_id
+    return dict(placed, **book_desk(driver, target, booking_date, start_time, end_time, dashboard_loaded and same_office))
+
+
+def book_locations_in_turn(driver, config, booking_date, locations, dashboard_loaded=False):
+    """Without API access, try the dashboard of each location in rank order"""
+    start_time, end_time = booking_window(booking_date)
+    for office_id, floor_id in locations:
+        logger.info(f"Trying {office_id}:{floor_id}")
+        try:
+            outcome = book_desk(driver, config.at_location(office_id, floor_id), booking_date, start_time, end_time, dashboard_loaded and office_id == config.office_id)
+            return dict(outcome, office_id=office_id, floor_id=floor_id)
+        except Exception as e:
+            logger.warning(f"Could not book on {office_id}:{floor_id}: {str(e)[:200]}")
+    raise BookingError(f"Could not book on any of the {len(locations)} locations")
+
+
+def book_date(driver, config, booking_date, client=None, dashboard_loaded=False):
+    """Book one date with an already authenticated driver (or API client)"""
+    logger.info(f"Step 6: Booking for date: {booking_date.strftime('%Y-%m-%d %A')}")
+    locations = config.location_list()
+    if len(locations) > 1:
+        return book_best_location(driver, config, booking_date, locations, client, dashboard_loaded)
+    if config.race_release_at:
+        return race_date(driver, config, booking_date, client, dashboard_loaded)
+    start_time, end_time = booking_window(booking_date)
+    
+    # Book through the API with the browser's token, keeping the dashboard as a fallback
+    if client:
+        phase("api_booking")
+        logger.info("Step 7: Booking through the Deskbird API")
+        try:
+            result = book_full_day(client, config.office_id, config.floor_id, start_time, end_time, config.preferred_desk)
+            if result["status"] == "unavailable":
+                raise BookingError("No desks available for this date")
+            reach("booked", booking_date.strftime("%Y-%m-%d"), result.get("desk"))
+            logger.info("✓ Booking completed successfully!")
+            return result
+        except DeskbirdApiError as e:
+            logger.warning(f"API booking failed, falling back to the dashboard: {str(e)[:200]}")
+    
+    return book_desk(driver, config, booking_date, start_time, end_time, dashboard_loaded)
+
+
+def close_stray_windows(driver):
+    """Close everything but the main window, e.g. an SSO popup left open by a failure"""
+    handles = driver.window_handles
+    for handle in handles[1:]:
+        driver.switch_to.window(handle)
+        driver.close()
+    driver.switch_to.window(handles[0])
+
+
+def resume_booking(driver, config, credentials, checkpoint, booking_date=None, client=None):
+    """Put the browser back in a good state before a failed date is retried
+
+    Past ``desk_selected`` the failed attempt may have booked the desk, so the
+    API is asked first and the booking found there is returned as the outcome.
+    """
+    close_stray_windows(driver)
+    if not (on_app(driver.current_url) and "login" not in driver.current_url):
+        driver.get(dashboard_url(config.office_id))
+        if not session_is_accepted(driver):
+            logger.info("Session lost, signing in again in the same browser")
+            sign_in_with_microsoft(driver, config, credentials)
+            reach("authenticated")
+    # Still signed in: book_desk reloads the booking page with the existing session
+    if checkpoint in ("desk_selected", "booked") and booking_date:
+        return committed_outcome(driver, client, booking_date)
+    return None
+
+
+def committed_outcome(driver, client, booking_date):
+    """The outcome for a booking a failed attempt made after all, or None when the API shows none"""
+    try:
+        client = client or DeskbirdClient(capture_bearer_token(driver))
+        existing = client.list_bookings(*booking_window(booking_date))
+    except Exception as e:
+        logger.warning(f"Could not check for a booking made by the failed attempt, the retry checks the page instead: {str(e)[:100]}")
+        return None
+    if not existing:
+        logger.info("The failed attempt did not book a desk, retrying")
+        return None
+    logger.info(f"✓ The failed attempt booked the desk after all (booking {existing[0].get('id')}), not booking again")
+    return {"status": "booked", "booking_id": existing[0].get("id"), "desk": existing[0].get("zoneItemName")}
+
+
+def settle_from_ledger(ledger, config, booking_dates):
+    """Outcomes for dates the ledger already settles; claims every other date for this run"""
+    dates = [d.strftime("%Y-%m-%d") for d in booking_dates]
+    settled = {}
+    for date, entry in ledger.booked(config.op_item_name, config.office_id, dates).items():
+        logger.info(f"✓ {date} is already booked according to the ledger (desk {entry['desk'] or 'unknown'})")
+        settled[date] = {"status": "already_booked", "desk": entry["desk"], "booking_id": entry["booking_id"], "source": "ledger"}
+    held = ledger.claim(config.op_item_name, config.office_id, [date for date in dates if date not in settled])
+    for date, owner in held.items():
+        logger.info(f"{date} is being booked by another run ({owner}), skipping it")
+        settled[date] = {"status": "in_progress", "desk": None, "error": f"Claimed by {owner}", "source": "ledger"}
+    return settled
+
+
+def reconcile_ledger(ledger, config, driver, client, dates):
+    """Sync the ledger with the live bookings, borrowing the browser's token when there is no API client"""
+    try:
+        client = client or DeskbirdClient(capture_bearer_token(driver))
+        reconcile_with_api(ledger, client, config.op_item_name, config.office_id, dates)
+    except Exception as e:
+        logger.debug(f"Could not reconcile the booking ledger: {str(e)[:200]}")
+
+
+def run_bookings(config, booking_dates, driver=None):
+    """Sign in once and book every date, returning one outcome per date
+
+    A warm ``driver`` (e.g. from the scheduler daemon) is reused, and left
+    running, instead of starting and quitting a browser for this run.
+    """
+    active = ActiveRun()
+    metrics = active.add(RunMetrics(config.op_item_name))
+    capture = active.add(DebugCapture(config.artifact_dir))
+    checkpoints = active.add(Checkpoints())
+    success = False
+    owns_driver = driver is None
+    ledger = open_ledger(config.ledger_path)
+    history = open_history(config.history_path)
+    claimed = []
+    heartbeat = None
+    watchdog = None
+    try:
+        logger.info(f"Booking {len(booking_dates)} date(s): {', '.join(d.strftime('%Y-%m-%d') for d in booking_dates)}")
+        os.makedirs(config.artifact_dir, exist_ok=True)
+        
+        # Dates the ledger knows are booked, or that another run is booking, need no browser or credentials
+        settled = {}
+        if ledger:
+            phase("ledger_check")
+            settled = settle_from_ledger(ledger, config, booking_dates)
+            claimed = [d.strftime("%Y-%m-%d") for d in booking_dates if d.strftime("%Y-%m-%d") not in settled]
+            if claimed:
+                heartbeat = ledger.keep_claims(config.op_item_name, config.office_id, claimed)
+        pending = [d for d in booking_dates if d.strftime("%Y-%m-%d") not in settled]
+        if not pending:
+            logger.info("✓ Every date is already booked or being booked according to the ledger, nothing to do")
+            success = all(outcome["status"] == "already_booked" for outcome in settled.values())
+            return [dict(settled[d.strftime("%Y-%m-%d")], date=d.strftime("%Y-%m-%d")) for d in booking_dates]
+        
+        # Rank desks by how often earlier runs found them free, so each date goes straight to its likeliest desk
+        plans = {}
+        if history:
+            active.add(history)
+            phase("desk_plan")
+            plans = {d.strftime("%Y-%m-%d"): planned_preference(history, config, d) for d in pending}
+        
+        # Fetch credentials while Chromium cold-starts; the login only blocks on them when it types the email
+        logger.info(f"Fetching credentials from 1Password item: {config.op_item_name} in vault: {config.op_vault}")
+        credentials = prefetch_credentials(config.op_item_name, config.op_vault, run=metrics)
+        
+        dashboard_page = dashboard_url(config.office_id)
+        session_restored = False
+        if owns_driver:
+            phase("browser_start")
+            driver = create_driver()
+            if network_profile() != "off":
+                metrics.watch_network(driver)
+        else:
+            # A warm browser is usually still signed in from the previous job
+            if network_profile() != "off":
+                metrics.watch_network(driver)
+            phase("session_check")
+            driver.get(dashboard_page)
+            session_restored = session_is_accepted(driver)
+            if session_restored:
+                logger.info("✓ Warm browser session still valid, skipping sign-in")
+        # With MEMORY_BUDGET_MB set the sampler also trims and, as a last resort, stops the browser
+        watchdog = active.add(MemoryWatchdog.from_env(driver.service.process.pid, run=metrics))
+        metrics.watch_process(driver.service.process.pid, sampler=watchdog)
+        
+        # Restore a cached session so the Microsoft SSO flow only runs when it is rejected
+        session_store = open_session_store(config.session_store_path)
+        cached_session = session_store.load() if session_store and not session_restored else None
+        if cached_session:
+            phase("session_restore")
+            logger.info("Restoring cached Deskbird session")
+            seed_script = restore_session(driver, cached_session)
+            driver.get(dashboard_page)
+            session_restored = session_is_accepted(driver)
+            forget_seed_script(driver, seed_script)
+            if session_restored:
+                logger.info("✓ Cached session accepted, skipping Microsoft sign-in")
+            else:
+                logger.info("Cached session rejected, falling back to Microsoft sign-in")
+                session_store.clear()
+        
+        if not session_restored:
+            try:
+                with_retries(
+                    "sign_in",
+                    within_budget(lambda: sign_in_with_microsoft(driver, config, credentials)),
+                    lambda checkpoint: close_stray_windows(driver),
+                    give_up_on=(MemoryBudgetExceeded,),
+                )
+            except Exception:
+                # The password or TOTP secret may have been rotated, so the next run fetches them again
+                forget_credentials(config.op_item_name, config.op_vault)
+                raise
+            if session_store:
+                try:
+                    session_store.save(*capture_session(driver))
+                except Exception as e:
+                    logger.warning(f"Could not cache session: {str(e)[:100]}")
+        
+        reach("authenticated")
+        
+        client = None
+        if config.booking_backend == "http":
+            try:
+                client = DeskbirdClient(capture_bearer_token(driver))
+            except DeskbirdApiError as e:
+                logger.warning(f"Could not set up API booking, using the dashboard: {str(e)[:200]}")
+        
+        # The session is open anyway, so bring the ledger in line with what Deskbird has
+        if ledger:
+            reconcile_ledger(ledger, config, driver, client, claimed)
+        
+        # One failed date should not cost the login for the remaining ones
+        outcomes = []
+        dashboard_loaded = session_restored
+        for booking_date in booking_dates:
+            if booking_date.strftime("%Y-%m-%d") in settled:
+                outcomes.append(dict(settled[booking_date.strftime("%Y-%m-%d")], date=booking_date.strftime("%Y-%m-%d")))
+                continue
+            relieve_memory(driver, close_stray_windows)
+            date_config = config.with_overrides({"preferred_desk": plans.get(booking_date.strftime("%Y-%m-%d"))})
+            try:
+                # A failure late in the flow reloads the booking page in this session instead of starting over
+                outcome = with_retries(
+                    "book_date",
+                    within_budget(lambda: book_date(driver, date_config, booking_date, client, dashboard_loaded)),
+                    lambda checkpoint: resume_booking(driver, config, credentials, checkpoint, booking_date, client),
+                    scope=booking_date.strftime("%Y-%m-%d"),
+                    give_up_on=(BookingError, MemoryBudgetExceeded),
+                )
+                dashboard_loaded = True
+            except MemoryBudgetExceeded:
+                # The browser is gone, so the remaining dates cannot be booked in this run either
+                raise
+            except Exception as e:
+                metrics.fail_phase()
+                logger.error(f"Booking {booking_date.strftime('%Y-%m-%d')} failed: {str(e)}")
+                logger.error(f"Error type: {type(e).__name__}")
+                capture.dump(driver, f"error_{booking_date.strftime('%Y%m%d')}", e, page_source=getattr(e, "page_source", None))
+                outcome = {"status": "failed", "desk": None, "error": f"{type(e).__name__}: {str(e)[:200]}"}
+            outcome["date"] = booking_date.strftime("%Y-%m-%d")
+            outcomes.append(outcome)
+            if ledger and outcome["status"] in ("booked", "already_booked"):
+                ledger.record(config.op_item_name, config.office_id, outcome["date"], outcome.get("floor_id", config.floor_id), outcome.get("desk"), outcome.get("booking_id"))
+        success = all(outcome["status"] in ("booked", "already_booked") for outcome in outcomes)
+        return outcomes
+    except Exception as e:
+        logger.error(f"Error occurred: {str(e)}")
+        logger.error(f"Error type: {type(e).__name__}")
+        # Write the step history, and a screenshot if the driver is still active
+        capture.dump(driver, "error", e, page_source=getattr(e, "page_source", None))
+        check_memory(e)
+        raise
+    finally:
+        # Stop the clock (and take a last memory sample) before the browser goes away
+        metrics.finish(success)
+        if driver and owns_driver:
+            try:
+                logger.info("Closing browser")
+                driver.quit()
+                logger.info("Browser closed")
+            except:
+                logger.debug("Browser already closed")
+        if heartbeat:
+            heartbeat.stop()
+        if ledger and claimed:
+            ledger.release(config.op_item_name, config.office_id, claimed)
+        metrics.checkpoints = checkpoints.report()
+        if watchdog:
+            metrics.memory = watchdog.report()
+        active.close()
+        metrics.log_summary()
+        metrics.export(config.artifact_dir)
+
+
+def run_booking(config, booking_date):
+    """Sign in and book a single date, raising BookingError if it fails"""
+    outcome = run_bookings(config, [booking_date])[0]
+    if outcome["status"] == "failed":
+        raise BookingError(outcome["error"])
+    return outcome
+
+
+def log_outcomes(outcomes):
+    """Log a per-date summary and return the number of dates that were not booked
+
+    A date another run is still booking (``in_progress``) counts as not booked,
+    so the exit code makes the scheduler look at it again.
+    """
+    logger.info("Booking summary:")
+    for outcome in outcomes:
+        detail = outcome.get("desk") or outcome.get("error") or ""
+        logger.info(f"  {outcome['date']}  {outcome['status']:<15} {detail}")
+    failed = [outcome for outcome in outcomes if outcome["status"] not in ("booked", "already_booked")]
+    logger.info(f"{len(outcomes) - len(failed)} of {len(outcomes)} dates booked or already booked")
+    return len(failed)
@@ -0,0 +1,251 @@
+"""Desk availability history and the desk plan computed from it
+
+Every time a run sees a floor's desks (the dashboard's desk cards, the API
+desk list or a parallel location scan) it appends one snapshot to a JSON Lines
+file (``HISTORY_PATH``, default ``/var/lib/deskbird/availability.jsonl``)::
+
+    {"t": 1760000000, "o": "office", "f": "floor", "d": "2026-10-24", "w": 4,
+     "desks": ["5.08 B", "5.09 D"], "free": [1], "taken": {"5.08 B": 1759999000}}
+
+``free`` indexes ``desks``; ``taken`` holds desks that were free in the
+previous snapshot of the same floor and date, with the time they were first
+seen taken. Appends and compaction hold a lock file next to the history, so
+batch workers and concurrent runs can share it. Once the file passes
+``max_bytes`` it is rewritten without snapshots older than the retention
+period and, if still too big, without the oldest ones. Before a run starts, ``plan_desks`` turns the history into a
+ranked list of desks by how likely each is to be free at booking time (same
+weekday, same lead time and recent runs count more), which is then used as
+the run's preference list so the booking goes straight to the best desk.
+"""
+import os
+import json
+import time
+import fcntl
+import logging
+import threading
+from datetime import datetime
+from contextlib import contextmanager
+
+from deskbird.active import Activatable, ActiveSlot
+from deskbird.api import normalize_desk_name
+from deskbird.inventory import Desk, parse_preferences
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_HISTORY_PATH = "/var/lib/deskbird/availability.jsonl"
+DAY = 86400
+
+
+class _NullHistory:
+    """Drops observations when no history is open"""
+
+    def observe(self, office_id, floor_id, date, desks, now=None):
+        return None
+
+
+class AvailabilityHistory(Activatable):
+    """Append-only availability snapshots per office floor and date"""
+
+    slot = ActiveSlot(_NullHistory())
+
+    def __init__(self, path, retention_days=180, max_bytes=4 * 2**20):
+        self.path = path
+        self.retention_days = retention_days
+        self.max_bytes = max_bytes
+        self._snapshots = None
+        self._loaded = None
+        self._lock = threading.Lock()
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+    @contextmanager
+    def _file_lock(self):
+        """Exclusive lock shared with every other process and instance using this history"""
+        with self._lock, open(f"{self.path}.lock", "a") as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock, fcntl.LOCK_UN)
+
+    def _signature(self):
+        try:
+            stat = os.stat(self.path)
+            return stat.st_ino, stat.st_size
+        except FileNotFoundError:
+            return None
+
+    def snapshots(self):
+        """Every stored snapshot, oldest first; unreadable lines are skipped
+
+        The file is read again when another instance has appended to or
+        compacted it since the last read.
+        """
+        signature = self._signature()
+        if self._snapshots is None or signature != self._loaded:
+            self._snapshots = []
+            try:
+                with open(self.path) as f:
+                    for line in f:
+                        try:
+                            self._snapshots.append(json.loads(line))
+                        except ValueError:
+                            continue
+            except FileNotFoundError:
+                pass
+            self._loaded = signature
+        return self._snapshots
+
+    def observe(self, office_id, floor_id, date, desks, now=None):
+        """Append a snapshot of ``desks``, (name, free) pairs, for a floor and date (YYYY-MM-DD)"""
+        if not desks:
+            return None
+        now = int(now or time.time())
+        names = [name for name, _ in desks]
+        free = {name for name, available in desks if available}
+        with self._file_lock():
+            snapshots = self.snapshots()
+            previous = next((s for s in reversed(snapshots) if (s["o"], s["f"], s["d"]) == (office_id, floor_id, date)), None)
+            taken = {}
+            if previous:
+                was_free = {previous["desks"][index] for index in previous["free"] if index < len(previous["desks"])}
+                taken = {name: now for name in names if name in was_free and name not in free}
+                # Keep the time a desk was first seen taken for this date
+                taken.update({name: at for name, at in previous.get("taken", {}).items() if name not in free})
+            snapshot = {
+                "t": now,
+                "o": office_id,
+                "f": floor_id,
+                "d": date,
+                "w": datetime.strptime(date, "%Y-%m-%d").weekday(),
+                "desks": names,
+                "free": [index for index, name in enumerate(names) if name in free],
+            }
+            if taken:
+                snapshot["taken"] = taken
+            with open(self.path, "a") as f:
+                f.write(json.dumps(snapshot, separators=(",", ":")) + "\n")
+            # Extend the list read under this lock; reading it again would pick up the new line as well
+            snapshots.append(snapshot)
+            self._loaded = self._signature()
+            if os.path.getsize(self.path) > self.max_bytes:
+                self._compact(now)
+        logger.debug(f"Recorded availability of {office_id}:{floor_id} on {date}: {len(free)} of {len(names)} free")
+        return snapshot
+
+    def compact(self, now=None):
+        """Drop expired snapshots, then the oldest ones until the file fits in ``max_bytes``"""
+        with self._file_lock():
+            self._compact(now)
+
+    def _compact(self, now=None):
+        cutoff = (now or time.time()) - self.retention_days * DAY
+        snapshots = self.snapshots()
+        lines = [json.dumps(s, separators=(",", ":")) + "\n" for s in snapshots if s["t"] >= cutoff]
+        # Shrink to three quarters of the cap so the next appends do not compact again straight away
+        target, size, first = self.max_bytes * 3 // 4, sum(len(line.encode()) for line in lines), 0
+        while size > target and first < len(lines):
+            size -= len(lines[first].encode())
+            first += 1
+        kept = lines[first:]
+        temporary = f"{self.path}.tmp"
+        with open(temporary, "w") as f:
+            f.writelines(kept)
+        os.replace(temporary, self.path)
+        logger.info(f"Compacted availability history: kept {len(kept)} of {len(snapshots)} snapshots ({size / 2**20:.1f} MiB)")
+        self._snapshots = None
+
+
+def open_history(path=None, create=True):
+    """Open the history named by ``path`` or HISTORY_PATH, or None if it is disabled or unusable
+
+    With ``create=False`` a history that does not exist yet is not created,
+    for read-only callers such as ``dry-run``.
+    """
+    path = path or os.environ.get("HISTORY_PATH", DEFAULT_HISTORY_PATH)
+    if path.lower() == "off":
+        logger.debug("HISTORY_PATH=off, availability history disabled")
+        return None
+    if not create and not os.path.exists(path):
+        return None
+    try:
+        return AvailabilityHistory(path, int(os.environ.get("HISTORY_RETENTION_DAYS", "180")))
+    except OSError as e:
+        logger.warning(f"Availability history unavailable at {path}, continuing without it: {e}")
+        return None
+
+
+def observe(office_id, floor_id, booking_date, desks):
+    """Record (name, free) pairs for a floor and date in the current run's history"""
+    try:
+        AvailabilityHistory.slot.current().observe(office_id, floor_id, booking_date.strftime("%Y-%m-%d"), desks)
+    except Exception as e:
+        logger.debug(f"Could not record availability: {str(e)[:100]}")
+
+
+def likelihoods(snapshots, booking_date, now=None, half_life_days=28):
+    """{normalized desk name: (display name, chance it is free, snapshots seen in)} for a date
+
+    Each snapshot is a weighted vote on every desk it lists. Votes halve in
+    weight every ``half_life_days``, and count half for another weekday or a
+    lead time more than a day away from this run's, so the history of the
+    same slot dominates once there is some. Estimates start from an even
+    chance (one free and one taken pseudo-vote).
+    """
+    now = now or time.time()
+    day = datetime.strptime(booking_date.strftime("%Y-%m-%d"), "%Y-%m-%d")
+    lead = (day.timestamp() - now) / DAY
+    votes = {}
+    for snapshot in snapshots:
+        weight = 0.5 ** (max(0, now - snapshot["t"]) / DAY / half_life_days)
+        if snapshot["w"] != booking_date.weekday():
+            weight *= 0.5
+        if abs((datetime.strptime(snapshot["d"], "%Y-%m-%d").timestamp() - snapshot["t"]) / DAY - lead) > 1:
+            weight *= 0.5
+        free = set(snapshot["free"])
+        for index, name in enumerate(snapshot["desks"]):
+            key = normalize_desk_name(name)
+            _, free_votes, all_votes, seen = votes.get(key, (name, 0.0, 0.0, 0))
+            votes[key] = (name, free_votes + weight * (index in free), all_votes + weight, seen + 1)
+    return {key: (name, (free_votes + 1) / (all_votes + 2), seen) for key, (name, free_votes, all_votes, seen) in votes.items()}
+
+
+def _matches(name, number, label):
+    parsed = parse_preferences(name)
+    return bool(parsed) and Desk(parsed[0][1], parsed[0][0]).matches(number, label)
+
+
+def plan_desks(history, locations, booking_date, preferred_desk=None, now=None, limit=10):
+    """Desks to try for a date, best first, as [(name, chance)]; empty without history
+
+    ``PREFERRED_DESK`` keeps its order, but an entry that matches several desks
+    (such as a bare label) is expanded into those desks, likeliest first. An
+    entry that was never observed stays in place with a chance of None. The
+    rest of the floor follows by likelihood, replacing "first Quick book button".
+    """
+    snapshots = [s for s in history.snapshots() if (s["o"], s["f"]) in set(locations)]
+    if not snapshots:
+        return []
+    chances = sorted(likelihoods(snapshots, booking_date, now).values(), key=lambda entry: (-entry[1], -entry[2]))
+    plan, planned = [], set()
+    for entry in (preferred_desk or "").split(","):
+        preferences = parse_preferences(entry)
+        if not preferences:
+            continue
+        matching = [(name, chance) for name, chance, _ in chances if _matches(name, *preferences[0])]
+        plan += [(name, chance) for name, chance in matching if name not in planned] or [(entry.strip(), None)]
+        planned.update(name for name, _ in plan)
+    preferred = len(plan)
+    plan += [(name, chance) for name, chance, _ in chances if name not in planned]
+    return plan[:max(limit, preferred)]
+
+
+def planned_preference(history, config, booking_date, now=None):
+    """The PREFERRED_DESK value to book a date with, or None to keep the configured one"""
+    plan = plan_desks(history, config.location_list(), booking_date, config.preferred_desk, now)
+    if not plan:
+        return None
+    logger.info(f"Desk plan for {booking_date.strftime('%Y-%m-%d')}: " + ", ".join(
+        f"{name} ({chance:.0%})" if chance is not None else f"{name} (not seen yet)" for name, chance in plan[:5]))
+    return ", ".join(name for name, _ in plan)
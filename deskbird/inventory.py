@@ -0,0 +1,163 @@
+"""Desk cards on the booking dashboard, read in a single WebDriver round trip
+
+``read_inventory(driver)`` runs one ``execute_script`` that walks every desk
+card in the "My spaces" widget and returns its label, desk number, zone,
+availability, favourite flag and the card's "Quick book" element. The
+resulting ``DeskInventory`` can be queried by exact desk id ("5.09 D") or with
+a ranked preference list such as ``PREFERRED_DESK="5.09 D, 5.08 B, D"``.
+"""
+import logging
+
+from deskbird.api import normalize_desk_name
+
+logger = logging.getLogger(__name__)
+
+# Returns one entry per desk card. Cards are found from their Quick book
+# buttons (available desks) and from card elements that mention a desk number
+# but have no button (desks someone else has booked).
+INVENTORY_SCRIPT = """
+const root = document.querySelector("db-my-spaces") || document.body;
+const CARD = "ion-card, [class*='card'], [class*='space']";
+const DESK = /Desk\\s+([\\w.]+)/;
+const isBookButton = el => el.matches("[data-testid='common--user-spaces-cards-quick-book']") || /quick book/i.test(el.textContent);
+const cardOf = el => {
+    let card = el.closest(CARD);
+    while (card && !DESK.test(card.innerText) && card.parentElement) {
+        card = card.parentElement.closest(CARD);
+    }
+    return card;
+};
+const cards = [];
+const known = el => cards.some(c => c === el || c.contains(el) || el.contains(c));
+root.querySelectorAll("a, button").forEach(el => {
+    if (!isBookButton(el)) return;
+    const card = cardOf(el);
+    if (card && !known(card)) cards.push(card);
+});
+root.querySelectorAll(CARD).forEach(el => {
+    if (!el.querySelector(CARD) && DESK.test(el.innerText) && !known(el)) cards.push(el);
+});
+return cards.map(card => {
+    const text = card.innerText;
+    const lines = text.split("\\n").map(l => l.trim()).filter(Boolean);
+    const button = Array.from(card.querySelectorAll("a, button")).find(isBookButton) || null;
+    const label = lines.length ? lines[0].replace("♥", "").trim().split(/\\s+/)[0] : "";
+    const zone = lines.slice(1).find(l => !DESK.test(l) && !/quick book/i.test(l) && l !== "♥") || null;
+    return {
+        label: label,
+        number: (text.match(DESK) || [])[1] || null,
+        zone: zone,
+        available: !!button && !button.disabled && button.getAttribute("aria-disabled") !== "true",
+        favourite: text.includes("♥") || !!card.querySelector("[class*='favorite'], [class*='favourite'], [data-testid*='favorite']"),
+        button: button,
+    };
+});
+"""
+
+
+def _digits(number):
+    """'5.09' and '509' both become '509' so either spelling matches"""
+    return (number or "").replace(".", "")
+
+
+class Desk:
+    """One desk card on the dashboard"""
+
+    def __init__(self, label, number, zone=None, available=False, favourite=False, button=None):
+        self.label = label
+        self.number = number
+        self.zone = zone
+        self.available = available
+        self.favourite = favourite
+        self.button = button
+
+    @property
+    def id(self):
+        return " ".join(part for part in (self.number, self.label) if part)
+
+    def matches(self, number=None, label=None):
+        if number and _digits(number) != _digits(self.number):
+            return False
+        if label and label.upper() != (self.label or "").upper():
+            return False
+        return True
+
+    def __repr__(self):
+        flags = ("available" if self.available else "taken") + (", favourite" if self.favourite else "")
+        return f"Desk({self.id!r}, {flags})"
+
+
+def parse_preferences(value):
+    """Turn '5.09 D, 5.08 B, D' into [(number, label), ...] in order of preference
+
+    An entry can be a full desk ("5.09 D" or "Desk 5.09 D"), a desk number
+    ("5.09" or "509") or just a label ("D", matching that label on any desk).
+    """
+    preferences = []
+    for entry in (value or "").split(","):
+        number = label = None
+        for part in entry.replace("Desk", " ").split():
+            if any(char.isdigit() for char in part):
+                number = part
+            elif part.isalpha():
+                label = part
+        if number or label:
+            preferences.append((number, label))
+    return preferences
+
+
+def preferred_matches(desks, preferences, name=lambda desk: desk.get("name", "")):
+    """Desks (API dicts by default) matching a preference list, in order of preference"""
+    if isinstance(preferences, str):
+        preferences = parse_preferences(preferences)
+    ranked = []
+    for number, label in preferences:
+        for desk in desks:
+            parsed = parse_preferences(name(desk))
+            if parsed and Desk(parsed[0][1], parsed[0][0]).matches(number, label) and desk not in ranked:
+                ranked.append(desk)
+    return ranked
+
+
+class DeskInventory:
+    """Desk cards indexed by desk id"""
+
+    def __init__(self, desks):
+        self.desks = desks
+        self.by_id = {normalize_desk_name(desk.id): desk for desk in desks}
+
+    def __len__(self):
+        return len(self.desks)
+
+    def get(self, desk_id):
+        """The desk with exactly this id ('5.09 D'), or None"""
+        return self.by_id.get(normalize_desk_name(desk_id))
+
+    def available(self):
+        """Available desks, favourites first"""
+        return sorted((desk for desk in self.desks if desk.available), key=lambda desk: not desk.favourite)
+
+    def ranked(self, preferences):
+        """Available desks matching a preference list, best match first"""
+        if isinstance(preferences, str):
+            preferences = parse_preferences(preferences)
+        ranked = []
+        for number, label in preferences:
+            for desk in self.available():
+                if desk.matches(number, label) and desk not in ranked:
+                    ranked.append(desk)
+        return ranked
+
+    def pick(self, preferences):
+        """The best available desk for a preference list, or None"""
+        ranked = self.ranked(preferences)
+        return ranked[0] if ranked else None
+
+
+def read_inventory(driver):
+    """Read every desk card on the current dashboard page with one execute_script call"""
+    cards = driver.execute_script(INVENTORY_SCRIPT) or []
+    desks = [Desk(c.get("label"), c.get("number"), c.get("zone"), c.get("available"), c.get("favourite"), c.get("button"))
+             for c in cards]
+    logger.debug(f"Desk inventory: {len(desks)} desks, {sum(d.available for d in desks)} available")
+    return DeskInventory(desks)
@@ -0,0 +1,262 @@
+"""Local record of confirmed bookings and in-flight attempts
+
+A small SQLite database on the state volume (``LEDGER_PATH``, default
+``/var/lib/deskbird/ledger.sqlite3``) remembers every date a user is known to
+have a desk for, and which run is currently booking which date. A run checks
+it before starting Chromium or fetching credentials: dates that are already
+booked, or that another live run has claimed, are settled without a browser.
+A run keeps its claims fresh with a heartbeat, so a claim that has not been
+refreshed for ``LEDGER_CLAIM_TTL_SECONDS`` belongs to a run that is gone (e.g.
+on a pod that crashed) and is taken over.
+Whenever a session is open anyway the ledger is reconciled with the user's
+bookings in Deskbird, so bookings cancelled in the app are forgotten.
+"""
+import os
+import time
+import socket
+import sqlite3
+import logging
+import threading
+from datetime import datetime, timedelta
+from contextlib import contextmanager
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_LEDGER_PATH = "/var/lib/deskbird/ledger.sqlite3"
+DEFAULT_CLAIM_TTL = 120
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS bookings (
+    user TEXT NOT NULL,
+    office_id TEXT NOT NULL,
+    date TEXT NOT NULL,
+    floor_id TEXT,
+    desk TEXT,
+    booking_id TEXT,
+    recorded_at REAL NOT NULL,
+    PRIMARY KEY (user, office_id, date)
+);
+CREATE TABLE IF NOT EXISTS claims (
+    user TEXT NOT NULL,
+    office_id TEXT NOT NULL,
+    date TEXT NOT NULL,
+    owner TEXT NOT NULL,
+    claimed_at REAL NOT NULL,
+    PRIMARY KEY (user, office_id, date)
+);
+"""
+
+
+def run_owner():
+    """Identifies this process as hostname:pid"""
+    return f"{socket.gethostname()}:{os.getpid()}"
+
+
+def owner_alive(owner):
+    """Whether the run that made a claim may still be running
+
+    Only processes on this host can be checked; a claim from another host is
+    trusted only while its heartbeat keeps it younger than the claim TTL. A
+    claim by this very process id is from an earlier run that was restarted
+    in the same container.
+    """
+    host, _, pid = owner.rpartition(":")
+    if host != socket.gethostname():
+        return True
+    if int(pid) == os.getpid():
+        return False
+    try:
+        os.kill(int(pid), 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+class BookingLedger:
+    """Confirmed bookings and claims per (user, office, date)"""
+
+    def __init__(self, path, claim_ttl=DEFAULT_CLAIM_TTL):
+        self.path = path
+        self.claim_ttl = claim_ttl
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with self._connect() as db:
+            db.executescript(SCHEMA)
+
+    @contextmanager
+    def _connect(self):
+        # A short-lived connection per call keeps the ledger safe to use from batch worker threads
+        db = sqlite3.connect(self.path, timeout=10, isolation_level=None)
+        try:
+            yield db
+        finally:
+            db.close()
+
+    @contextmanager
+    def _transaction(self):
+        """A connection holding the write lock (BEGIN IMMEDIATE) until the block ends"""
+        with self._connect() as db:
+            db.execute("BEGIN IMMEDIATE")
+            try:
+                yield db
+            except Exception:
+                db.execute("ROLLBACK")
+                raise
+            db.execute("COMMIT")
+
+    def booked(self, user, office_id, dates):
+        """The recorded booking for each of ``dates`` (YYYY-MM-DD) that has one"""
+        with self._connect() as db:
+            rows = db.execute(
+                f"SELECT date, floor_id, desk, booking_id FROM bookings WHERE user = ? AND office_id = ? AND date IN ({','.join('?' * len(dates))})",
+                [user, office_id, *dates],
+            ).fetchall()
+        return {date: {"floor_id": floor_id, "desk": desk, "booking_id": booking_id} for date, floor_id, desk, booking_id in rows}
+
+    def claim(self, user, office_id, dates):
+        """Claim the dates for this run; returns {date: owner} for those held by another live run"""
+        owner = run_owner()
+        held = {}
+        # Checking and claiming under one write lock, so two runs cannot claim the same date
+        with self._transaction() as db:
+            for date in dates:
+                row = db.execute(
+                    "SELECT owner, claimed_at FROM claims WHERE user = ? AND office_id = ? AND date = ?",
+                    (user, office_id, date),
+                ).fetchone()
+                if row and row[0] != owner and time.time() - row[1] < self.claim_ttl and owner_alive(row[0]):
+                    held[date] = row[0]
+                    continue
+                if row:
+                    logger.debug(f"Taking over stale claim on {date} from {row[0]}")
+                db.execute(
+                    "INSERT OR REPLACE INTO claims (user, office_id, date, owner, claimed_at) VALUES (?, ?, ?, ?, ?)",
+                    (user, office_id, date, owner, time.time()),
+                )
+        return held
+
+    def release(self, user, office_id, dates):
+        """Drop this run's claims on the dates"""
+        with self._connect() as db:
+            db.executemany(
+                "DELETE FROM claims WHERE user = ? AND office_id = ? AND date = ? AND owner = ?",
+                [(user, office_id, date, run_owner()) for date in dates],
+            )
+
+    def refresh(self, user, office_id, dates):
+        """Mark this run's claims on the dates as still alive"""
+        with self._connect() as db:
+            db.executemany(
+                "UPDATE claims SET claimed_at = ? WHERE user = ? AND office_id = ? AND date = ? AND owner = ?",
+                [(time.time(), user, office_id, date, run_owner()) for date in dates],
+            )
+
+    def keep_claims(self, user, office_id, dates):
+        """Refresh the claims in the background until the returned heartbeat is stopped"""
+        return ClaimHeartbeat(self, user, office_id, dates).start()
+
+    def record(self, user, office_id, date, floor_id=None, desk=None, booking_id=None):
+        """Remember a confirmed booking"""
+        with self._connect() as db:
+            db.execute(
+                "INSERT OR REPLACE INTO bookings (user, office_id, date, floor_id, desk, booking_id, recorded_at) VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (user, office_id, date, floor_id, desk, booking_id, time.time()),
+            )
+
+    def upcoming(self, user, office_id, since):
+        """Recorded booking dates on or after ``since`` (YYYY-MM-DD)"""
+        with self._connect() as db:
+            rows = db.execute(
+                "SELECT date FROM bookings WHERE user = ? AND office_id = ? AND date >= ? ORDER BY date",
+                (user, office_id, since),
+            ).fetchall()
+        return [row[0] for row in rows]
+
+    def reconcile(self, user, office_id, first, last, bookings):
+        """Make the ledger match the user's live bookings between two dates (inclusive)
+
+        ``bookings`` are Deskbird booking dicts as returned by
+        ``DeskbirdClient.list_bookings``. Returns (added, removed) date counts.
+        """
+        live = {}
+        for booking in bookings:
+            date = datetime.fromtimestamp(booking.get("bookingStartTime", 0) / 1000).strftime("%Y-%m-%d")
+            live[date] = booking
+        with self._transaction() as db:
+            recorded = {row[0] for row in db.execute(
+                "SELECT date FROM bookings WHERE user = ? AND office_id = ? AND date BETWEEN ? AND ?",
+                (user, office_id, first, last),
+            )}
+            removed = sorted(recorded - set(live))
+            added = sorted(date for date in live if date not in recorded and first <= date <= last)
+            db.executemany(
+                "DELETE FROM bookings WHERE user = ? AND office_id = ? AND date = ?",
+                [(user, office_id, date) for date in removed],
+            )
+            db.executemany(
+                "INSERT INTO bookings (user, office_id, date, floor_id, desk, booking_id, recorded_at) VALUES (?, ?, ?, ?, ?, ?, ?)",
+                [(user, office_id, date, None, live[date].get("zoneItemName"), live[date].get("id"), time.time()) for date in added],
+            )
+        return len(added), len(removed)
+
+
+class ClaimHeartbeat(threading.Thread):
+    """Refreshes a run's claims a few times per claim TTL while the run is alive"""
+
+    def __init__(self, ledger, user, office_id, dates):
+        super().__init__(name="ledger-heartbeat", daemon=True)
+        self.ledger = ledger
+        self.user = user
+        self.office_id = office_id
+        self.dates = list(dates)
+        self.interval = max(1.0, ledger.claim_ttl / 4)
+        self._stop_event = threading.Event()
+
+    def start(self):
+        super().start()
+        return self
+
+    def run(self):
+        while not self._stop_event.wait(self.interval):
+            try:
+                self.ledger.refresh(self.user, self.office_id, self.dates)
+            except sqlite3.Error as e:
+                logger.warning(f"Could not refresh the ledger claims: {e}")
+
+    def stop(self):
+        self._stop_event.set()
+        self.join(timeout=5)
+
+
+def open_ledger(path=None):
+    """Open the ledger named by ``path`` or LEDGER_PATH, or None if it is disabled or unusable"""
+    path = path or os.environ.get("LEDGER_PATH", DEFAULT_LEDGER_PATH)
+    if path.lower() == "off":
+        logger.debug("LEDGER_PATH=off, booking ledger disabled")
+        return None
+    try:
+        return BookingLedger(path, int(os.environ.get("LEDGER_CLAIM_TTL_SECONDS", str(DEFAULT_CLAIM_TTL))))
+    except (OSError, sqlite3.Error) as e:
+        logger.warning(f"Booking ledger unavailable at {path}, continuing without it: {e}")
+        return None
+
+
+def reconcile_with_api(ledger, client, user, office_id, dates=()):
+    """Sync the ledger with the user's live bookings from today to the last recorded or requested date"""
+    first = datetime.now().strftime("%Y-%m-%d")
+    last = max(ledger.upcoming(user, office_id, first) + [date for date in dates if date >= first], default=None)
+    if not last:
+        return 0, 0
+    start = datetime.strptime(first, "%Y-%m-%d")
+    end = datetime.strptime(last, "%Y-%m-%d") + timedelta(days=1)
+    bookings = [
+        booking for booking in client.list_bookings(int(start.timestamp() * 1000), int(end.timestamp() * 1000))
+        if booking.get("workspaceId") in (None, office_id)
+    ]
+    added, removed = ledger.reconcile(user, office_id, first, last, bookings)
+    if added or removed:
+        logger.info(f"Ledger reconciled with Deskbird: {added} booking(s) added, {removed} no longer booked")
+    return added, removed
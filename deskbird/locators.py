@@ -0,0 +1,128 @@
+"""Resolve a step's candidate locators together instead of one after another
+
+All candidates for a step are checked in a single in-page script per poll, so
+finding an element (or deciding it is absent) costs at most one step timeout
+rather than the sum of one timeout per locator. The locator that matched is
+remembered per step in a small JSON cache (``SELECTOR_CACHE_PATH``) and tried
+first on the next run.
+"""
+import os
+import json
+import logging
+import threading
+
+from selenium.webdriver.common.by import By
+from selenium.common.exceptions import TimeoutException
+
+from deskbird.metrics import note_selector
+from deskbird.waits import wait_until
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_CACHE_PATH = "/var/lib/deskbird/selector_cache.json"
+
+# Returns [index, element] for the first candidate with a (clickable) match, or null
+RESOLVE_SCRIPT = """
+const candidates = arguments[0];
+const clickable = arguments[1];
+const visible = el => !!(el.offsetWidth || el.offsetHeight || el.getClientRects().length);
+for (let i = 0; i < candidates.length; i++) {
+    const kind = candidates[i][0];
+    const selector = candidates[i][1];
+    let found = [];
+    try {
+        if (kind === "xpath") {
+            const result = document.evaluate(selector, document, null, XPathResult.ORDERED_NODE_SNAPSHOT_TYPE, null);
+            for (let j = 0; j < result.snapshotLength; j++) {
+                found.push(result.snapshotItem(j));
+            }
+        } else {
+            found = Array.from(document.querySelectorAll(selector));
+        }
+    } catch (e) {
+        continue;
+    }
+    const match = found.find(el => !clickable || (visible(el) && !el.disabled));
+    if (match) {
+        return [i, match];
+    }
+}
+return null;
+"""
+
+_KINDS = {By.XPATH: "xpath", By.CSS_SELECTOR: "css"}
+
+
+class SelectorCache:
+    """Last winning selector per step, persisted between runs"""
+
+    def __init__(self, path=None):
+        self.path = path or os.environ.get("SELECTOR_CACHE_PATH", DEFAULT_CACHE_PATH)
+        self._lock = threading.Lock()
+        self._winners = None
+
+    def _load(self):
+        if self._winners is None:
+            try:
+                with open(self.path) as f:
+                    self._winners = json.load(f)
+            except (OSError, ValueError):
+                self._winners = {}
+        return self._winners
+
+    def winner(self, step):
+        with self._lock:
+            return self._load().get(step)
+
+    def remember(self, step, selector):
+        """Record the winning selector, writing the cache only when it changed"""
+        with self._lock:
+            winners = self._load()
+            if winners.get(step) == selector:
+                return
+            winners[step] = selector
+            try:
+                directory = os.path.dirname(self.path)
+                if directory:
+                    os.makedirs(directory, exist_ok=True)
+                tmp_path = f"{self.path}.{os.getpid()}.{threading.get_ident()}.tmp"
+                with open(tmp_path, "w") as f:
+                    json.dump(winners, f, indent=2)
+                os.replace(tmp_path, self.path)
+            except OSError as e:
+                logger.debug(f"Could not write selector cache {self.path}: {e}")
+
+
+_default_cache = None
+
+
+def default_cache():
+    global _default_cache
+    if _default_cache is None:
+        _default_cache = SelectorCache()
+    return _default_cache
+
+
+def resolve(driver, step, candidates, clickable=False, timeout=None, cache=None):
+    """Wait for the first of ``candidates`` to match and return (element, locator), or (None, None) if absent"""
+    cache = cache or default_cache()
+    candidates = list(candidates)
+    winner = cache.winner(step)
+    # Try last run's winner first; the rest keep their order of preference
+    candidates.sort(key=lambda locator: locator[1] != winner)
+    payload = [[_KINDS.get(by, "css"), selector] for by, selector in candidates]
+    logger.debug(f"{step}: racing {len(candidates)} selectors" + (" (cached winner first)" if winner else ""))
+    try:
+        index, element = wait_until(
+            driver, step,
+            lambda d: d.execute_script(RESOLVE_SCRIPT, payload, clickable),
+            timeout=timeout,
+        )
+    except TimeoutException:
+        logger.debug(f"{step}: no selector matched")
+        return None, None
+    locator = candidates[index]
+    logger.debug(f"{step}: matched {locator[1][:80]}")
+    note_selector(step, locator[1])
+    cache.remember(step, locator[1])
+    return element, locator
@@ -0,0 +1,231 @@
+"""Memory budget for the browser: a low-memory Chromium profile and an RSS watchdog
+
+Enabled by ``MEMORY_BUDGET_MB``, the most the Chromium process tree
+(chromedriver, browser, renderers, GPU and utility processes) may use. Chromium
+is then started with a low-memory profile: few renderer processes, no
+background networking or extensions and a small disk cache. Site isolation
+stays on unless ``MEMORY_DISABLE_SITE_ISOLATION`` is also set, since sharing
+renderers across sites saves memory at the cost of Chromium's protection
+against cross-site data leaks. The watchdog samples the tree's RSS in the
+background:
+
+- Above ``MEMORY_TRIM_RATIO`` of the budget (default 0.8) the flow closes stray
+  windows such as a lingering SSO popup and asks Chromium to drop its caches
+  at the next safe point
+- Still over the budget and not going down for ``MEMORY_ABORT_SAMPLES``
+  samples in a row (default 3), the browser is killed before the kernel OOM
+  kills the whole pod, and the run fails with ``MemoryBudgetExceeded`` and a
+  breakdown of which processes held the memory
+"""
+import os
+import signal
+import logging
+
+from deskbird.active import Activatable, ActiveSlot
+from deskbird.metrics import RssSampler, process_tree, read_process_rss
+
+logger = logging.getLogger(__name__)
+
+LOW_MEMORY_ARGUMENTS = [
+    "--disable-background-networking",
+    "--disable-component-extensions-with-background-pages",
+    "--disable-default-apps",
+    "--disable-extensions",
+    "--disable-sync",
+    "--disk-cache-size=16777216",
+    "--media-cache-size=1",
+    "--js-flags=--max-old-space-size=256",
+]
+
+LOW_MEMORY_DISABLED_FEATURES = ["Translate", "MediaRouter", "OptimizationHints", "BackForwardCache"]
+
+# Only with MEMORY_DISABLE_SITE_ISOLATION: lets pages from different sites share renderer processes
+NO_SITE_ISOLATION_ARGUMENTS = ["--disable-site-isolation-trials", "--process-per-site"]
+NO_SITE_ISOLATION_FEATURES = ["site-per-process", "IsolateOrigins"]
+
+
+def memory_budget():
+    """The MEMORY_BUDGET_MB budget in bytes, or None when budget mode is off"""
+    value = float(os.environ.get("MEMORY_BUDGET_MB", "0") or 0)
+    return int(value * 2**20) if value > 0 else None
+
+
+def low_memory_options(options):
+    """Add the low-memory launch profile to Chrome options when a budget is set"""
+    if not memory_budget():
+        return options
+    options.add_argument(f"--renderer-process-limit={int(os.environ.get('MEMORY_RENDERER_LIMIT', '2'))}")
+    arguments, features = list(LOW_MEMORY_ARGUMENTS), list(LOW_MEMORY_DISABLED_FEATURES)
+    if os.environ.get("MEMORY_DISABLE_SITE_ISOLATION", "false").lower() in ("1", "true", "yes"):
+        logger.warning("Site isolation is disabled to save memory, pages from different sites may share a renderer")
+        arguments += NO_SITE_ISOLATION_ARGUMENTS
+        features += NO_SITE_ISOLATION_FEATURES
+    # Chromium only honours the last --disable-features switch, so the features go in one
+    arguments.append(f"--disable-features={','.join(features)}")
+    for argument in arguments:
+        options.add_argument(argument)
+    return options
+
+
+class MemoryBudgetExceeded(Exception):
+    """The browser outgrew MEMORY_BUDGET_MB and was stopped by the watchdog"""
+
+
+def process_kind(pid):
+    """'renderer', 'gpu-process', 'utility', 'browser' or the executable name of a Chromium tree process"""
+    try:
+        with open(f"/proc/{pid}/cmdline", "rb") as f:
+            argv = f.read().decode(errors="replace").split("\0")
+    except OSError:
+        return "gone"
+    for argument in argv:
+        if argument.startswith("--type="):
+            return argument.split("=", 1)[1]
+    name = os.path.basename(argv[0]) if argv and argv[0] else "unknown"
+    return "browser" if "chrom" in name and "driver" not in name else name
+
+
+class _NullWatchdog:
+    """Never trips and never trims, for runs without a memory budget"""
+
+    tripped = False
+
+    def check(self, error=None):
+        pass
+
+    def relieve(self, driver, close_windows):
+        pass
+
+
+class MemoryWatchdog(Activatable, RssSampler):
+    """RssSampler that asks for trimming near the budget and kills the browser past it"""
+
+    slot = ActiveSlot(_NullWatchdog())
+
+    def __init__(self, root_pid, budget, interval=1.0, trim_ratio=0.8, abort_samples=3, run=None):
+        super().__init__(root_pid, interval)
+        self.budget = budget
+        self.trim_limit = int(budget * trim_ratio)
+        self.abort_samples = abort_samples
+        self.run_metrics = run
+        self.pressure = False
+        self.trims = 0
+        self.diagnosis = None
+        self._over = 0
+        self._previous = 0
+
+    @classmethod
+    def from_env(cls, root_pid, run=None):
+        """A watchdog configured from MEMORY_*, or None when MEMORY_BUDGET_MB is unset"""
+        budget = memory_budget()
+        if not budget:
+            return None
+        return cls(
+            root_pid,
+            budget,
+            interval=float(os.environ.get("METRICS_RSS_INTERVAL", "1.0")),
+            trim_ratio=float(os.environ.get("MEMORY_TRIM_RATIO", "0.8")),
+            abort_samples=int(os.environ.get("MEMORY_ABORT_SAMPLES", "3")),
+            run=run,
+        )
+
+    @property
+    def tripped(self):
+        return self.diagnosis is not None
+
+    def sample(self):
+        rss = super().sample()
+        if self.tripped:
+            return rss
+        if rss >= self.trim_limit and not self.pressure:
+            logger.info(f"Browser at {rss / 2**20:.0f} MiB of a {self.budget / 2**20:.0f} MiB budget, trimming at the next step")
+            self.pressure = True
+        # Over the budget and not going down: trimming did not help, so stop before the OOM killer does
+        self._over = self._over + 1 if rss >= self.budget and rss >= self._previous else 0
+        self._previous = rss
+        if self._over >= self.abort_samples:
+            self.abort(rss)
+        return rss
+
+    def breakdown(self):
+        """RSS in MiB per kind of process in the tree, largest first"""
+        kinds = {}
+        for pid in process_tree(self.root_pid):
+            kind = process_kind(pid)
+            count, size = kinds.get(kind, (0, 0))
+            kinds[kind] = (count + 1, size + read_process_rss(pid))
+        return sorted(((kind, count, size / 2**20) for kind, (count, size) in kinds.items()), key=lambda entry: -entry[2])
+
+    def abort(self, rss):
+        """Record why the browser is over budget and kill its process tree"""
+        parts = ", ".join(f"{count} {kind} {size:.0f} MiB" for kind, count, size in self.breakdown())
+        step = self.run_metrics.current if self.run_metrics else None
+        self.diagnosis = (
+            f"Browser used {rss / 2**20:.0f} MiB, over the {self.budget / 2**20:.0f} MiB budget for "
+            f"{self._over} samples after {self.trims} trim(s)" + (f" during '{step}'" if step else "") + f": {parts}"
+        )
+        logger.error(f"Memory budget exceeded, stopping the browser. {self.diagnosis}")
+        # Children first, so the browser cannot respawn a renderer while it is being stopped
+        for pid in reversed(process_tree(self.root_pid)):
+            try:
+                os.kill(pid, signal.SIGKILL)
+            except OSError:
+                pass
+
+    def check(self, error=None):
+        """Raise MemoryBudgetExceeded (from ``error``) if the watchdog stopped the browser"""
+        if self.tripped:
+            raise MemoryBudgetExceeded(self.diagnosis) from error
+
+    def relieve(self, driver, close_windows):
+        """Close stray windows and drop Chromium's caches if the tree is near the budget"""
+        self.check()
+        if not self.pressure:
+            return
+        before = self.last
+        try:
+            close_windows(driver)
+        except Exception as e:
+            logger.debug(f"Could not close stray windows: {str(e)[:100]}")
+        for command, params in (
+            ("Network.clearBrowserCache", {}),
+            ("HeapProfiler.collectGarbage", {}),
+            ("Memory.simulatePressureNotification", {"level": "critical"}),
+        ):
+            try:
+                driver.execute_cdp_cmd(command, params)
+            except Exception as e:
+                logger.debug(f"{command} failed: {str(e)[:100]}")
+        self.trims += 1
+        self.pressure = False
+        logger.info(f"Trimmed browser memory: {before / 2**20:.0f} MiB -> {self.sample() / 2**20:.0f} MiB")
+
+    def report(self):
+        return {"budget_bytes": self.budget, "trims": self.trims, "aborted": self.tripped, "diagnosis": self.diagnosis}
+
+
+def current_watchdog():
+    return MemoryWatchdog.slot.current()
+
+
+def check_memory(error=None):
+    """Raise MemoryBudgetExceeded if the current run's browser was stopped for exceeding its budget"""
+    current_watchdog().check(error)
+
+
+def within_budget(action):
+    """Wrap ``action`` so a failure caused by the watchdog stopping the browser surfaces as MemoryBudgetExceeded"""
+    def run():
+        try:
+            return action()
+        except MemoryBudgetExceeded:
+            raise
+        except Exception as e:
+            check_memory(e)
+            raise
+    return run
+
+
+def relieve_memory(driver, close_windows):
+    """Trim the browser at a safe point if the current run's watchdog asked for it"""
+    current_watchdog().relieve(driver, close_windows)
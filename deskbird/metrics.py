@@ -0,0 +1,325 @@
+"""Per-step timing and browser memory metrics for a booking run
+
+A run is split into named phases (``phase("ms_password")`` closes the
+previous phase and opens the next). At the end the durations, retry counts,
+winning selectors and sampled Chromium/chromedriver RSS are written as a JSON
+run report and, if ``METRICS_TEXTFILE_DIR`` is set, as a Prometheus textfile
+for the node_exporter textfile collector. ``METRICS_PUSHGATEWAY_URL`` pushes the
+same payload to a Pushgateway.
+"""
+import os
+import re
+import json
+import time
+import logging
+import threading
+import urllib.request
+
+from deskbird.active import Activatable, ActiveSlot
+from deskbird.network import NetworkStats
+
+logger = logging.getLogger(__name__)
+
+def read_process_rss(pid):
+    """Resident set size of one process in bytes, or 0 if it has gone away"""
+    try:
+        with open(f"/proc/{pid}/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, IndexError, ValueError):
+        return 0
+
+
+def process_tree(root_pid):
+    """The root pid plus every descendant, found by walking /proc"""
+    children = {}
+    for entry in os.listdir("/proc"):
+        if not entry.isdigit():
+            continue
+        try:
+            with open(f"/proc/{entry}/stat") as f:
+                # The command name can contain spaces, so split after its closing paren
+                parent = int(f.read().rsplit(")", 1)[1].split()[1])
+        except (OSError, IndexError, ValueError):
+            continue
+        children.setdefault(parent, []).append(int(entry))
+    tree, pending = [], [root_pid]
+    while pending:
+        pid = pending.pop()
+        tree.append(pid)
+        pending.extend(children.get(pid, []))
+    return tree
+
+
+def tree_rss(root_pid):
+    """Combined RSS of a process and all of its descendants in bytes"""
+    return sum(read_process_rss(pid) for pid in process_tree(root_pid))
+
+
+class RssSampler(threading.Thread):
+    """Background thread sampling the RSS of the chromedriver/Chromium process tree"""
+
+    def __init__(self, root_pid, interval=1.0):
+        super().__init__(name="rss-sampler", daemon=True)
+        self.root_pid = root_pid
+        self.interval = interval
+        self.peak = 0
+        self.last = 0
+        self.samples = 0
+        self._stop_event = threading.Event()
+
+    def sample(self):
+        self.last = tree_rss(self.root_pid)
+        self.peak = max(self.peak, self.last)
+        self.samples += 1
+        return self.last
+
+    def run(self):
+        while not self._stop_event.is_set():
+            self.sample()
+            self._stop_event.wait(self.interval)
+
+    def stop(self):
+        self._stop_event.set()
+
+
+class _NullRun:
+    """Records nothing outside a run"""
+
+    def phase(self, name):
+        pass
+
+    def record(self, step, seconds, success=True):
+        pass
+
+    def note_retry(self, step=None):
+        pass
+
+    def note_selector(self, step, selector):
+        pass
+
+
+class RunMetrics(Activatable):
+    """Timings, retries and memory samples for one user's run"""
+
+    slot = ActiveSlot(_NullRun())
+
+    def __init__(self, user):
+        self.user = user
+        self.started_at = time.time()
+        self._started = time.monotonic()
+        self.steps = {}
+        self.selectors = {}
+        self.current = None
+        self._phase_started = None
+        self.sampler = None
+        self.success = None
+        self.finished_at = None
+        self.duration = None
+        self.network = None
+        self._network_stats = None
+        self._network_driver = None
+        self.checkpoints = None
+        self.memory = None
+
+    def phase(self, name):
+        """Close the current phase as successful and start timing ``name``"""
+        self._close_phase(success=True)
+        self.drain_network()
+        self.current = name
+        self._phase_started = time.monotonic()
+        self.steps.setdefault(name, {"seconds": 0.0, "success": None, "retries": 0})
+
+    def _close_phase(self, success):
+        if self.current is None:
+            return
+        step = self.steps[self.current]
+        step["seconds"] = round(step["seconds"] + time.monotonic() - self._phase_started, 3)
+        step["success"] = success
+        self.current = None
+
+    def fail_phase(self):
+        """Close the current phase as failed"""
+        self._close_phase(success=False)
+
+    def record(self, step, seconds, success=True):
+        """Record a step timed elsewhere, e.g. on a background thread, without touching the current phase"""
+        entry = self.steps.setdefault(step, {"seconds": 0.0, "success": None, "retries": 0})
+        entry["seconds"] = round(entry["seconds"] + seconds, 3)
+        entry["success"] = success
+
+    def note_retry(self, step=None):
+        step = step or self.current
+        self.steps.setdefault(step, {"seconds": 0.0, "success": None, "retries": 0})["retries"] += 1
+
+    def note_selector(self, step, selector):
+        self.selectors[step] = selector
+
+    def watch_process(self, root_pid, interval=None, sampler=None):
+        """Start sampling the RSS of ``root_pid`` and its children, with ``sampler`` if given"""
+        interval = interval or float(os.environ.get("METRICS_RSS_INTERVAL", "1.0"))
+        self.sampler = sampler or RssSampler(root_pid, interval)
+        self.sampler.start()
+
+    def watch_network(self, driver):
+        """Count the browser's network requests from here on, draining its performance log at every phase"""
+        # Whatever a warm browser logged before this run is not part of it
+        NetworkStats().consume(driver)
+        self._network_stats = NetworkStats()
+        self._network_driver = driver
+
+    def drain_network(self):
+        """Fold the network events logged since the last phase change into the counters"""
+        if self._network_driver:
+            self.network = self._network_stats.consume(self._network_driver).report()
+
+    def finish(self, success):
+        """Close the open phase and stop sampling"""
+        self._close_phase(success=success)
+        self.drain_network()
+        self._network_driver = None
+        self.success = success
+        self.finished_at = time.time()
+        self.duration = round(time.monotonic() - self._started, 3)
+        if self.sampler:
+            self.sampler.sample()
+            self.sampler.stop()
+        self.deactivate()
+
+    def report(self):
+        """The run as a JSON-serialisable dict"""
+        return {
+            "user": self.user,
+            "started_at": self.started_at,
+            "finished_at": self.finished_at,
+            "duration_seconds": self.duration,
+            "success": self.success,
+            "steps": self.steps,
+            "selectors": self.selectors,
+            "browser_rss_bytes": {
+                "peak": self.sampler.peak if self.sampler else None,
+                "last": self.sampler.last if self.sampler else None,
+                "samples": self.sampler.samples if self.sampler else 0,
+            },
+            "network": self.network,
+            "checkpoints": self.checkpoints,
+            "memory": self.memory,
+        }
+
+    def openmetrics(self):
+        """The run in Prometheus text exposition format"""
+        user = _label(self.user)
+        lines = [
+            "# HELP deskbird_run_duration_seconds Wall-clock duration of the last booking run",
+            "# TYPE deskbird_run_duration_seconds gauge",
+            f'deskbird_run_duration_seconds{{user="{user}"}} {self.duration or 0}',
+            "# HELP deskbird_run_success Whether the last booking run succeeded",
+            "# TYPE deskbird_run_success gauge",
+            f'deskbird_run_success{{user="{user}"}} {int(bool(self.success))}',
+            "# HELP deskbird_run_timestamp_seconds When the last booking run finished",
+            "# TYPE deskbird_run_timestamp_seconds gauge",
+            f'deskbird_run_timestamp_seconds{{user="{user}"}} {self.finished_at or time.time():.0f}',
+            "# HELP deskbird_step_duration_seconds Duration of each step in the last run",
+            "# TYPE deskbird_step_duration_seconds gauge",
+        ]
+        lines += [f'deskbird_step_duration_seconds{{user="{user}",step="{_label(name)}"}} {step["seconds"]}'
+                  for name, step in self.steps.items()]
+        lines += [
+            "# HELP deskbird_step_success Whether each step of the last run completed",
+            "# TYPE deskbird_step_success gauge",
+        ]
+        lines += [f'deskbird_step_success{{user="{user}",step="{_label(name)}"}} {int(bool(step["success"]))}'
+                  for name, step in self.steps.items()]
+        lines += [
+            "# HELP deskbird_step_retries Retries (failed selectors or attempts) per step in the last run",
+            "# TYPE deskbird_step_retries gauge",
+        ]
+        lines += [f'deskbird_step_retries{{user="{user}",step="{_label(name)}"}} {step["retries"]}'
+                  for name, step in self.steps.items()]
+        lines += [
+            "# HELP deskbird_step_selector_info Selector that matched for each step in the last run",
+            "# TYPE deskbird_step_selector_info gauge",
+        ]
+        lines += [f'deskbird_step_selector_info{{user="{user}",step="{_label(name)}",selector="{_label(selector)}"}} 1'
+                  for name, selector in self.selectors.items()]
+        if self.sampler:
+            lines += [
+                "# HELP deskbird_browser_rss_bytes Resident memory of chromedriver and Chromium during the last run",
+                "# TYPE deskbird_browser_rss_bytes gauge",
+                f'deskbird_browser_rss_bytes{{user="{user}",stat="peak"}} {self.sampler.peak}',
+                f'deskbird_browser_rss_bytes{{user="{user}",stat="last"}} {self.sampler.last}',
+            ]
+        if self.network:
+            lines += [
+                "# HELP deskbird_network_requests Browser requests in the last run by outcome",
+                "# TYPE deskbird_network_requests gauge",
+                f'deskbird_network_requests{{user="{user}",outcome="sent"}} {self.network["requests"]}',
+                f'deskbird_network_requests{{user="{user}",outcome="blocked"}} {self.network["blocked"]}',
+                "# HELP deskbird_network_transferred_bytes Bytes the browser downloaded in the last run",
+                "# TYPE deskbird_network_transferred_bytes gauge",
+                f'deskbird_network_transferred_bytes{{user="{user}"}} {self.network["transferred_bytes"]}',
+            ]
+        return "\n".join(lines) + "\n"
+
+    def export(self, report_dir):
+        """Write the JSON report and any configured Prometheus outputs, never raising"""
+        slug = re.sub(r"[^A-Za-z0-9_.-]+", "-", self.user).strip("-").lower()
+        try:
+            _write_atomic(os.path.join(report_dir, "deskbird_run_report.json"), json.dumps(self.report(), indent=2))
+            textfile_dir = os.environ.get("METRICS_TEXTFILE_DIR")
+            if textfile_dir:
+                _write_atomic(os.path.join(textfile_dir, f"deskbird_{slug}.prom"), self.openmetrics())
+            pushgateway = os.environ.get("METRICS_PUSHGATEWAY_URL")
+            if pushgateway:
+                url = f"{pushgateway.rstrip('/')}/metrics/job/deskbird_booking/user/{slug}"
+                request = urllib.request.Request(url, data=self.openmetrics().encode(), method="PUT")
+                urllib.request.urlopen(request, timeout=5).close()
+        except Exception as e:
+            logger.warning(f"Could not export run metrics: {str(e)[:100]}")
+
+    def log_summary(self):
+        timings = ", ".join(f"{name}={step['seconds']:.1f}s" for name, step in self.steps.items())
+        logger.info(f"Step timings: {timings}")
+        fetch, wait = self.steps.get("credentials_fetch"), self.steps.get("credentials_wait")
+        if fetch and wait:
+            logger.info(f"Credential fetch overlapped browser startup, saving {fetch['seconds'] - wait['seconds']:.1f}s")
+        if self.sampler:
+            logger.info(f"Browser memory: peak {self.sampler.peak / 2**20:.0f} MiB over {self.sampler.samples} samples")
+        if self.network:
+            logger.info(f"Network: {self.network['requests']} requests, {self.network['blocked']} blocked, "
+                        f"{self.network['transferred_bytes'] / 2**20:.1f} MiB transferred")
+
+
+def current_run():
+    return RunMetrics.slot.current()
+
+
+def phase(name):
+    """Start timing a named step of the current run"""
+    current_run().phase(name)
+
+
+def record(step, seconds, success=True):
+    """Add a separately timed step to the current run"""
+    current_run().record(step, seconds, success)
+
+
+def note_retry(step=None):
+    current_run().note_retry(step)
+
+
+def note_selector(step, selector):
+    current_run().note_selector(step, selector)
+
+
+def _label(value):
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _write_atomic(path, content):
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w") as f:
+        f.write(content)
+    os.replace(tmp_path, path)
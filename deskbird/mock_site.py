@@ -0,0 +1,375 @@
+"""Offline stand-in for the Deskbird web app and the Microsoft sign-in popup
+
+Serves just enough of both sites for the booking flow to run end to end
+without the network: the check-in login page, the "Sign in with Microsoft"
+popup with its email, password, OTP and "Stay signed in?" screens, and the
+booking dashboard with ``db-my-spaces``, Quick book cards and the Full day
+toggle. Desk availability and bookings come from the same in-memory state
+as ``deskbird.stub_server``, whose API is also served under ``/v1.1`` so the
+HTTP backend works against it too.
+
+Run ``python -m deskbird.mock_site --port 8100`` and point the flow at it with
+``DESKBIRD_APP_URL=http://127.0.0.1:8100``. Latency, desk counts and failure
+injection are configurable; see ``--help``.
+"""
+import json
+import time
+import random
+import logging
+import argparse
+import threading
+from http.server import ThreadingHTTPServer
+from urllib.parse import urlparse
+
+from deskbird.stub_server import API_PREFIX, STUB_TOKEN, StubHandler, StubState
+
+logger = logging.getLogger(__name__)
+
+SESSION_COOKIE = "mock_session"
+
+PAGE = """<!DOCTYPE html>
+<html><head><meta charset="utf-8"><title>%(title)s</title>
+<style>
+body { font-family: sans-serif; margin: 2em; }
+.space-card { border: 1px solid #ccc; border-radius: 6px; padding: 8px; margin: 6px; width: 180px; display: inline-block; }
+.modal { position: fixed; top: 20%%; left: 30%%; background: #fff; border: 1px solid #333; padding: 1em; }
+</style></head>
+<body>%(body)s
+<script>const CONFIG = %(config)s;</script>
+<script>%(script)s</script>
+</body></html>
+"""
+
+LOGIN_BODY = """
+<div id="login">
+  <input name="email" type="email" placeholder="Email">
+  <button id="sign-in" type="button">Sign in</button>
+  <div id="sso"></div>
+</div>
+"""
+
+LOGIN_SCRIPT = """
+document.getElementById("sign-in").addEventListener("click", () => {
+    setTimeout(() => {
+        document.getElementById("sso").innerHTML = '<button id="microsoft" type="button">Sign in with Microsoft</button>';
+        document.getElementById("microsoft").addEventListener("click", () => {
+            window.open("/ms/login", "microsoft", "width=500,height=600");
+        });
+    }, CONFIG.renderMs);
+});
+window.addEventListener("message", event => {
+    if (event.data === "signed-in") {
+        location.href = "/office/" + CONFIG.officeId + "/bookings/dashboard";
+    }
+});
+"""
+
+MICROSOFT_BODY = """<div id="ms"></div>"""
+
+MICROSOFT_SCRIPT = """
+const ms = document.getElementById("ms");
+function show(html, onSubmit) {
+    setTimeout(() => {
+        ms.innerHTML = html;
+        ms.querySelectorAll("input[type='submit']").forEach(submit => {
+            submit.addEventListener("click", event => { event.preventDefault(); onSubmit(submit); });
+        });
+    }, CONFIG.renderMs);
+}
+function finish() {
+    document.cookie = CONFIG.cookie + "=1; path=/";
+    // Like Firebase, the signed-in user is kept in IndexedDB, not in localStorage
+    const request = indexedDB.open("firebaseLocalStorageDb", 1);
+    request.onupgradeneeded = () => request.result.createObjectStore("firebaseLocalStorage", {keyPath: "fbase_key"});
+    request.onsuccess = () => {
+        const transaction = request.result.transaction("firebaseLocalStorage", "readwrite");
+        transaction.objectStore("firebaseLocalStorage").put({
+            fbase_key: "firebase:authUser:mock:[DEFAULT]",
+            value: {stsTokenManager: {accessToken: CONFIG.token}},
+        });
+        transaction.oncomplete = () => {
+            if (window.opener) {
+                window.opener.postMessage("signed-in", "*");
+                window.close();
+            } else {
+                location.href = "/office/" + CONFIG.officeId + "/bookings/dashboard";
+            }
+        };
+    };
+}
+function staySignedIn() {
+    if (!CONFIG.staySignedIn) {
+        finish();
+        return;
+    }
+    show('<div>Stay signed in?</div><input type="submit" value="No"> <input type="submit" value="Yes">', finish);
+}
+function otp() {
+    if (!CONFIG.otp) {
+        staySignedIn();
+        return;
+    }
+    show('<div>Enter code</div><input name="otc" type="tel"><input type="submit" value="Verify">', () => {
+        const code = ms.querySelector("input[name='otc']").value;
+        if (/^[0-9]{6}$/.test(code)) {
+            staySignedIn();
+        }
+    });
+}
+show('<input name="loginfmt" type="email"><input type="submit" value="Next">', () => {
+    show('<input name="passwd" type="password"><input type="submit" value="Sign in">', otp);
+});
+"""
+
+DASHBOARD_BODY = """
+<h1>Bookings</h1>
+<div id="my-bookings"></div>
+<db-my-spaces><div>My spaces</div><div id="spaces"></div></db-my-spaces>
+<div id="modal"></div>
+"""
+
+DASHBOARD_SCRIPT = """
+const params = new URLSearchParams(location.search);
+const startTime = Number(params.get("startTime") || 0);
+const endTime = Number(params.get("endTime") || 0);
+const headers = {"Authorization": "Bearer " + CONFIG.token, "Content-Type": "application/json"};
+const api = CONFIG.apiPrefix;
+
+// The session cookie alone is not enough: without the Firebase user in IndexedDB the app signs out
+function authUser() {
+    return new Promise(resolve => {
+        const request = indexedDB.open("firebaseLocalStorageDb");
+        request.onupgradeneeded = () => request.transaction.abort();
+        request.onerror = () => resolve(null);
+        request.onsuccess = () => {
+            const db = request.result;
+            if (!db.objectStoreNames.contains("firebaseLocalStorage")) {
+                resolve(null);
+                return;
+            }
+            const rows = db.transaction("firebaseLocalStorage", "readonly").objectStore("firebaseLocalStorage").getAll();
+            rows.onsuccess = () => resolve(rows.result.find(row => row.value && row.value.stsTokenManager) || null);
+            rows.onerror = () => resolve(null);
+        };
+    });
+}
+
+async function load() {
+    if (!await authUser()) {
+        location.href = "/login/check-in";
+        return;
+    }
+    if (!params.get("floorId")) {
+        return;
+    }
+    const mine = await fetch(api + "/user/bookings?startTime=" + startTime + "&endTime=" + endTime, {headers});
+    const bookings = (await mine.json()).results || [];
+    document.getElementById("my-bookings").innerHTML = bookings.length
+        ? '<div class="booking-card">Desk booked</div>'
+        : "<div>No bookings for the selected day</div>";
+    const response = await fetch(api + "/internalWorkspaces/" + CONFIG.officeId + "/zones/availability?floorId="
+        + params.get("floorId") + "&startTime=" + startTime + "&endTime=" + endTime, {headers});
+    if (!response.ok) {
+        document.getElementById("spaces").innerText = "Could not load spaces";
+        return;
+    }
+    const desks = (await response.json()).results;
+    setTimeout(() => render(desks), CONFIG.renderMs);
+}
+
+function render(desks) {
+    const spaces = document.getElementById("spaces");
+    for (const desk of desks) {
+        const [number, label] = desk.name.split(" ");
+        const card = document.createElement("div");
+        card.className = "space-card";
+        const favourite = CONFIG.favourites.includes(desk.name) ? " ♥" : "";
+        card.innerHTML = "<div>" + label + favourite + "</div><div>Desk " + number + "</div><div>" + desk.zoneId + "</div>"
+            + (desk.isAvailable ? '<a href="#" data-testid="common--user-spaces-cards-quick-book">Quick book</a>' : "<div>Booked</div>");
+        const button = card.querySelector("a");
+        if (button) {
+            button.addEventListener("click", event => { event.preventDefault(); book(desk); });
+        }
+        spaces.appendChild(card);
+    }
+}
+
+async function book(desk) {
+    const modal = document.getElementById("modal");
+    modal.innerHTML = '<div class="modal"><label for="fullday">Full day</label><input type="checkbox" id="fullday"><div id="status">Booking...</div></div>';
+    const response = await fetch(api + "/bookings", {method: "POST", headers, body: JSON.stringify({bookings: [{
+        workspaceId: CONFIG.officeId, resourceId: desk.zoneId, zoneItemId: desk.id,
+        bookingStartTime: startTime, bookingEndTime: endTime, isAnonymous: false, isDayPass: true,
+    }]})});
+    document.getElementById("status").innerText = response.ok ? "Booking confirmed" : "Booking failed";
+}
+
+load();
+"""
+
+
+class MockSiteState(StubState):
+    """Desks and bookings plus the knobs that shape the mock site's behaviour"""
+
+    def __init__(self, latency_ms=0, jitter_ms=0, render_ms=50, otp=True, stay_signed_in=True,
+                 failures=None, favourites=(), seed=None, **stub_options):
+        super().__init__(**stub_options)
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.render_ms = render_ms
+        self.otp = otp
+        self.stay_signed_in = stay_signed_in
+        # Probability of answering 503 per injection point: login, desks, book
+        self.failures = failures or {}
+        self.favourites = list(favourites)
+        self.random = random.Random(seed)
+
+
+class MockSiteHandler(StubHandler):
+    """Serves the app and login pages, and delegates /v1.1 to the API stub"""
+
+    def _delay(self):
+        latency = self.state.latency_ms + self.state.random.uniform(0, self.state.jitter_ms)
+        if latency:
+            time.sleep(latency / 1000)
+
+    def _inject_failure(self, path):
+        if path.startswith("/ms/"):
+            point = "login"
+        elif "/zones/availability" in path:
+            point = "desks"
+        elif path == f"{API_PREFIX}/bookings" and self.command == "POST":
+            point = "book"
+        else:
+            return False
+        with self.state.lock:
+            failed = self.state.random.random() < self.state.failures.get(point, 0)
+        if failed:
+            logger.debug(f"mock: injecting failure at {point}")
+            self._send(503, {"message": f"Injected {point} failure"})
+        return failed
+
+    def _page(self, title, body, script):
+        config = {
+            "officeId": self.state.office_id,
+            "token": self.token,
+            "apiPrefix": API_PREFIX,
+            "cookie": SESSION_COOKIE,
+            "renderMs": self.state.render_ms,
+            "otp": self.state.otp,
+            "staySignedIn": self.state.stay_signed_in,
+            "favourites": self.state.favourites,
+        }
+        html = PAGE % {"title": title, "body": body, "config": json.dumps(config), "script": script}
+        payload = html.encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "text/html; charset=utf-8")
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def _redirect(self, location):
+        self.send_response(302)
+        self.send_header("Location", location)
+        self.send_header("Content-Length", "0")
+        self.end_headers()
+
+    def _signed_in(self):
+        return f"{SESSION_COOKIE}=1" in self.headers.get("Cookie", "")
+
+    def do_GET(self):
+        path = urlparse(self.path).path
+        self._delay()
+        if self._inject_failure(path):
+            return
+        if path.startswith(API_PREFIX) or path.startswith("/v1/vaults"):
+            super().do_GET()
+        elif path in ("/", "/login", "/login/check-in"):
+            self._page("Deskbird", LOGIN_BODY, LOGIN_SCRIPT)
+        elif path == "/ms/login":
+            self._page("Sign in to your account", MICROSOFT_BODY, MICROSOFT_SCRIPT)
+        elif path.startswith("/office/"):
+            if not self._signed_in():
+                self._redirect("/login/check-in")
+            else:
+                self._page("Deskbird", DASHBOARD_BODY, DASHBOARD_SCRIPT)
+        else:
+            self._send(404, {"message": f"No mock page for {path}"})
+
+    def do_POST(self):
+        self._delay()
+        if self._inject_failure(urlparse(self.path).path):
+            return
+        super().do_POST()
+
+
+def start_mock_site(state=None, host="127.0.0.1", port=0):
+    """Start the mock site in a background thread and return (server, base_url)"""
+    handler = type("BoundMockSiteHandler", (MockSiteHandler,), {"state": state or MockSiteState()})
+    server = ThreadingHTTPServer((host, port), handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    base_url = f"http://{host}:{server.server_address[1]}"
+    logger.info(f"Mock Deskbird site listening on {base_url}")
+    return server, base_url
+
+
+def parse_failures(values):
+    """Turn ['desks=0.1', 'book=0.05'] into {'desks': 0.1, 'book': 0.05}"""
+    failures = {}
+    for value in values:
+        point, _, rate = value.partition("=")
+        if point not in ("login", "desks", "book") or not rate:
+            raise ValueError(f"Failure injection must look like login=0.1, desks=0.1 or book=0.1, got '{value}'")
+        failures[point] = float(rate)
+    return failures
+
+
+def add_site_arguments(parser):
+    """Options shared by the mock site and the benchmark harness"""
+    parser.add_argument("--office-id", default="office-1")
+    parser.add_argument("--floor-id", default="floor-1")
+    parser.add_argument("--desks", type=int, default=40)
+    parser.add_argument("--taken", action="append", default=[], help="Desk name to mark as booked by someone else")
+    parser.add_argument("--favourite", action="append", default=[], help="Desk name to show as a favourite")
+    parser.add_argument("--latency-ms", type=float, default=0, help="Delay added to every response")
+    parser.add_argument("--jitter-ms", type=float, default=0, help="Random extra delay of up to this much")
+    parser.add_argument("--render-ms", type=float, default=50, help="Client-side delay before each screen renders")
+    parser.add_argument("--no-otp", action="store_true", help="Skip the one-time code screen")
+    parser.add_argument("--no-stay-signed-in", action="store_true", help="Skip the 'Stay signed in?' screen")
+    parser.add_argument("--fail", action="append", default=[], help="Failure injection, e.g. desks=0.1 (login, desks, book)")
+    parser.add_argument("--seed", type=int, help="Random seed for latency jitter and failure injection")
+
+
+def state_from_arguments(args):
+    return MockSiteState(
+        latency_ms=args.latency_ms,
+        jitter_ms=args.jitter_ms,
+        render_ms=args.render_ms,
+        otp=not args.no_otp,
+        stay_signed_in=not args.no_stay_signed_in,
+        failures=parse_failures(args.fail),
+        favourites=args.favourite,
+        seed=args.seed,
+        office_id=args.office_id,
+        floor_id=args.floor_id,
+        desk_count=args.desks,
+        taken=args.taken,
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run an offline Deskbird and Microsoft sign-in stand-in")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8100)
+    add_site_arguments(parser)
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    handler = type("BoundMockSiteHandler", (MockSiteHandler,), {"state": state_from_arguments(args)})
+    server = ThreadingHTTPServer((args.host, args.port), handler)
+    logger.info(f"Mock Deskbird site listening on http://{args.host}:{args.port} (token: {STUB_TOKEN})")
+    server.serve_forever()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,150 @@
+"""Block resources the booking flow never needs
+
+Requests are blocked through the DevTools ``Network.setBlockedURLs`` command,
+driven by a profile chosen with ``NETWORK_FILTER``:
+
+- ``safe`` (default): analytics and tracking beacons, media and web fonts
+- ``strict``: everything in ``safe`` plus images and third-party chat/support widgets
+- ``off``: load everything, useful when debugging a page
+
+Extra URL patterns (``*`` wildcards) can be added with ``NETWORK_BLOCK_PATTERNS``.
+Requests, blocked requests and transferred bytes are counted per resource type
+from the DevTools Network events in Chromium's performance log, which is drained
+at every phase change so it never holds more than one step's events, and added
+to the run report.
+"""
+import os
+import json
+import logging
+
+logger = logging.getLogger(__name__)
+
+TRACKERS = [
+    "*google-analytics.com*",
+    "*googletagmanager.com*",
+    "*doubleclick.net*",
+    "*segment.io*",
+    "*segment.com/v1*",
+    "*cdn.segment.com*",
+    "*hotjar.com*",
+    "*fullstory.com*",
+    "*mixpanel.com*",
+    "*amplitude.com*",
+    "*clarity.ms*",
+    "*browser-intake-datadoghq*",
+    "*bat.bing.com*",
+    "*facebook.net*",
+]
+MEDIA = ["*.mp4*", "*.webm*", "*.mp3*", "*.ogg*"]
+FONTS = ["*.woff2*", "*.woff*", "*.ttf*", "*.otf*", "*fonts.googleapis.com*", "*fonts.gstatic.com*"]
+IMAGES = ["*.png*", "*.jpg*", "*.jpeg*", "*.gif*", "*.webp*", "*.ico*", "*.avif*"]
+WIDGETS = ["*intercom.io*", "*intercomcdn.com*", "*widget.usersnap.com*", "*zdassets.com*", "*hubspot.com*"]
+
+PROFILES = {
+    "off": [],
+    "safe": TRACKERS + MEDIA + FONTS,
+    "strict": TRACKERS + MEDIA + FONTS + IMAGES + WIDGETS,
+}
+
+
+def network_profile(name=None):
+    """The profile named by ``name`` or NETWORK_FILTER"""
+    name = (name or os.environ.get("NETWORK_FILTER", "safe")).lower()
+    if name not in PROFILES:
+        raise ValueError(f"NETWORK_FILTER must be one of {', '.join(PROFILES)}, got '{name}'")
+    return name
+
+
+def blocked_patterns(profile):
+    """URL patterns blocked by a profile, plus any from NETWORK_BLOCK_PATTERNS"""
+    if profile == "off":
+        return []
+    extra = [p.strip() for p in os.environ.get("NETWORK_BLOCK_PATTERNS", "").split(",") if p.strip()]
+    return PROFILES[profile] + extra
+
+
+def configure_options(options, profile):
+    """Chrome options that go with a profile: the performance log for counting, no image decoding when strict"""
+    if profile == "off":
+        return options
+    options.set_capability("goog:loggingPrefs", {"performance": "ALL"})
+    options.add_experimental_option("perfLoggingPrefs", {"enableNetwork": True, "enablePage": False})
+    if profile == "strict":
+        options.add_argument("--blink-settings=imagesEnabled=false")
+    return options
+
+
+def install_filter(driver, profile):
+    """Block the profile's URL patterns in the current window"""
+    patterns = blocked_patterns(profile)
+    if not patterns:
+        return
+    try:
+        driver.execute_cdp_cmd("Network.enable", {})
+        driver.execute_cdp_cmd("Network.setBlockedURLs", {"urls": patterns})
+        logger.debug(f"Blocking {len(patterns)} URL patterns ({profile} profile)")
+    except Exception as e:
+        logger.warning(f"Could not install network filter: {str(e)[:100]}")
+
+
+class NetworkStats:
+    """Requests seen, blocked and bytes transferred per resource type, tallied from Network events"""
+
+    def __init__(self):
+        self.requests = 0
+        self.blocked = 0
+        self.transferred_bytes = 0
+        self.requests_by_type = {}
+        self.blocked_by_type = {}
+        self.bytes_by_type = {}
+        self.available = True
+        # Resource type of each request still in flight, dropped once it finishes or fails
+        self._types = {}
+
+    def consume(self, driver):
+        """Drain the performance log collected since the last call into the counters"""
+        if not self.available:
+            return self
+        try:
+            entries = driver.get_log("performance")
+        except Exception as e:
+            logger.debug(f"Performance log unavailable, not counting network requests: {str(e)[:100]}")
+            self.available = False
+            return self
+        for entry in entries:
+            try:
+                message = json.loads(entry["message"])["message"]
+            except (KeyError, ValueError):
+                continue
+            self.count(message.get("method"), message.get("params", {}))
+        return self
+
+    def count(self, method, params):
+        """Tally one DevTools Network event, by the resource type Chromium reports for the request"""
+        request_id = params.get("requestId")
+        if method == "Network.requestWillBeSent":
+            kind = params.get("type", "Other")
+            self._types[request_id] = kind
+            self.requests += 1
+            self.requests_by_type[kind] = self.requests_by_type.get(kind, 0) + 1
+        elif method == "Network.loadingFinished":
+            kind = self._types.pop(request_id, "Other")
+            size = int(params.get("encodedDataLength", 0))
+            self.transferred_bytes += size
+            self.bytes_by_type[kind] = self.bytes_by_type.get(kind, 0) + size
+        elif method == "Network.loadingFailed":
+            kind = params.get("type") or self._types.get(request_id, "Other")
+            self._types.pop(request_id, None)
+            if params.get("blockedReason"):
+                self.blocked += 1
+                self.blocked_by_type[kind] = self.blocked_by_type.get(kind, 0) + 1
+
+    def report(self):
+        return {
+            "requests": self.requests,
+            "blocked": self.blocked,
+            "transferred_bytes": self.transferred_bytes,
+            "requests_by_type": self.requests_by_type,
+            "blocked_by_type": self.blocked_by_type,
+            "bytes_by_type": self.bytes_by_type,
+        }
@@ -0,0 +1,117 @@
+"""Race mode: be signed in and ready before the booking window opens
+
+With ``RACE_RELEASE_AT`` set, the run authenticates and prepares the booking
+ahead of time, sleeps until the release instant on a high-resolution clock
+and then submits, retrying every ``RACE_RETRY_INTERVAL`` seconds for up to
+``RACE_BURST_SECONDS``.
+"""
+import os
+import time
+import logging
+from datetime import datetime
+
+from deskbird.api import DeskbirdApiError, book_full_day
+from deskbird.inventory import preferred_matches
+from deskbird.metrics import note_retry
+
+logger = logging.getLogger(__name__)
+
+# How long before the deadline to stop sleeping and spin on the clock
+SPIN_SECONDS = 0.02
+
+
+def release_time(value, now=None):
+    """Parse '01:00', '01:00:00.250' (today) or a full ISO datetime into a datetime"""
+    now = now or datetime.now()
+    try:
+        return datetime.fromisoformat(value)
+    except ValueError:
+        pass
+    for fmt in ("%H:%M:%S.%f", "%H:%M:%S", "%H:%M"):
+        try:
+            return datetime.combine(now.date(), datetime.strptime(value, fmt).time())
+        except ValueError:
+            continue
+    raise ValueError(f"RACE_RELEASE_AT must be HH:MM[:SS[.fff]] or an ISO datetime, got '{value}'")
+
+
+def wait_for_instant(target):
+    """Sleep until ``target`` (epoch seconds), spinning for the last few milliseconds; return how late we woke"""
+    # Coarse sleeps against the wall clock, so NTP adjustments during a long wait are honoured
+    while target - time.time() > SPIN_SECONDS * 5:
+        time.sleep(min(target - time.time() - SPIN_SECONDS * 5, 1.0))
+    # Then hand over to the monotonic high-resolution counter for the final stretch
+    deadline = time.perf_counter() + (target - time.time())
+    while True:
+        remaining = deadline - time.perf_counter()
+        if remaining <= 0:
+            break
+        time.sleep(remaining - SPIN_SECONDS if remaining > SPIN_SECONDS else 0)
+    return time.perf_counter() - deadline
+
+
+def burst(attempt, opened_at, seconds=None, interval=None):
+    """Call attempt() until it books (or finds a booking) or the burst runs out
+
+    Returns ``(outcome, latency_seconds, attempts)`` where the latency is
+    measured from ``opened_at`` (epoch seconds) to the confirmed booking.
+    """
+    seconds = seconds if seconds is not None else float(os.environ.get("RACE_BURST_SECONDS", "5"))
+    interval = interval if interval is not None else float(os.environ.get("RACE_RETRY_INTERVAL", "0.1"))
+    deadline = time.monotonic() + seconds
+    attempts = 0
+    outcome, error = None, None
+    while True:
+        attempts += 1
+        try:
+            outcome, error = attempt(), None
+            if outcome["status"] in ("booked", "already_booked"):
+                return outcome, time.time() - opened_at, attempts
+            logger.debug(f"Attempt {attempts}: {outcome['status']}")
+        except Exception as e:
+            error = e
+            logger.debug(f"Attempt {attempts} failed: {str(e)[:100]}")
+        if time.monotonic() >= deadline:
+            break
+        note_retry()
+        time.sleep(interval)
+    logger.warning(f"Booking window burst ended after {attempts} attempts")
+    if error:
+        raise error
+    return outcome, time.time() - opened_at, attempts
+
+
+def candidate_desks(desks, preferred_desk=None):
+    """The available desks of an API desk list, preferred desks first"""
+    # A POST for a desk that is already taken would waste the first, most valuable attempt
+    available = [desk for desk in desks if desk.get("isAvailable")]
+    ranked = preferred_matches(available, preferred_desk or "")
+    return ranked + [desk for desk in available if desk not in ranked]
+
+
+def prepare_api_booking(client, office_id, floor_id, start_time, end_time, preferred_desk=None):
+    """Look up the floor's desks before the window opens so the release only costs one POST"""
+    try:
+        desks = client.list_desks(office_id, floor_id, start_time, end_time)
+    except DeskbirdApiError as e:
+        logger.info(f"Desk list not available before the window opens, will look it up at release: {str(e)[:100]}")
+        return []
+    candidates = candidate_desks(desks, preferred_desk)
+    if candidates:
+        logger.info(f"Prepared booking request for desk {candidates[0].get('name')}")
+    else:
+        logger.info("No desk is shown as available before the window opens, will look them up at release")
+    return candidates
+
+
+def fire_api_booking(client, office_id, floor_id, start_time, end_time, candidates, preferred_desk=None):
+    """Submit the prepared booking, falling back to a fresh availability lookup if it is rejected"""
+    if candidates:
+        desk = candidates[0]
+        try:
+            booking = client.create_booking(office_id, desk, start_time, end_time)
+            logger.info(f"✓ Booked desk {desk.get('name')} (booking {booking.get('id')})")
+            return {"status": "booked", "booking_id": booking.get("id"), "desk": desk.get("name")}
+        except DeskbirdApiError as e:
+            logger.debug(f"Prepared desk {desk.get('name')} rejected: {str(e)[:100]}")
+    return book_full_day(client, office_id, floor_id, start_time, end_time, preferred_desk)
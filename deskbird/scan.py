@@ -0,0 +1,142 @@
+"""Scan several offices and floors at once and pick the best desk across them
+
+``BOOKING_LOCATIONS`` is a ranked, comma-separated list of ``office:floor``
+pairs (or ``FLOOR_ID`` a ranked list of floors in ``OFFICE_ID``). The
+availability of every location is fetched in parallel through the Deskbird
+API with the signed-in session's token, so scanning five floors takes about
+as long as scanning one. The results are merged into one view and a desk is
+chosen by ``PREFERRED_DESK`` first, then by location rank.
+
+Without an API token, a driver that can drive several tabs at once (the
+DevTools backend's ``evaluate_in_tabs``) reads every location's desk cards
+from its own dashboard tab instead, still concurrently.
+"""
+import os
+import time
+import logging
+from concurrent.futures import ThreadPoolExecutor
+
+from deskbird.api import DeskbirdApiError
+from deskbird.inventory import INVENTORY_SCRIPT, Desk, preferred_matches
+from deskbird.urls import booking_url
+
+logger = logging.getLogger(__name__)
+
+# Waits up to arguments[0] ms for the desk cards to render and stop changing,
+# then returns [label, number, available] for each card
+TAB_SCAN_SCRIPT = """
+const done = arguments[arguments.length - 1];
+const deadline = Date.now() + arguments[0];
+const read = () => {%s};
+let previous = -1;
+const poll = () => {
+    const cards = read();
+    if ((cards.length && cards.length === previous) || Date.now() > deadline) {
+        done(cards.map(card => [card.label, card.number, card.available]));
+        return;
+    }
+    previous = cards.length;
+    setTimeout(poll, 250);
+};
+poll();
+""" % INVENTORY_SCRIPT
+
+
+def parse_locations(value, office_id=None, floor_id=None):
+    """Ranked (office_id, floor_id) pairs from 'office:floor, ...', else from OFFICE_ID and a FLOOR_ID list"""
+    if value:
+        locations = []
+        for part in value.split(","):
+            if not part.strip():
+                continue
+            office, sep, floor = part.strip().partition(":")
+            if not sep or not office or not floor:
+                raise ValueError(f"BOOKING_LOCATIONS entries must look like office:floor, got '{part.strip()}'")
+            locations.append((office.strip(), floor.strip()))
+        return locations
+    floors = [floor.strip() for floor in (floor_id or "").split(",") if floor.strip()]
+    return [(office_id, floor) for floor in floors]
+
+
+class LocationScan:
+    """Availability of one office floor"""
+
+    def __init__(self, rank, office_id, floor_id, desks=None, error=None, seconds=0.0):
+        self.rank = rank
+        self.office_id = office_id
+        self.floor_id = floor_id
+        self.desks = desks or []
+        self.error = error
+        self.seconds = seconds
+
+    @property
+    def available(self):
+        return [desk for desk in self.desks if desk.get("isAvailable")]
+
+    def __repr__(self):
+        return f"{self.office_id}:{self.floor_id}"
+
+
+def scan_locations(client, locations, start_time, end_time, workers=None):
+    """Fetch every location's desks concurrently and return one LocationScan per location, in rank order"""
+    workers = workers or int(os.environ.get("SCAN_WORKERS", "8"))
+
+    def scan(rank, office_id, floor_id):
+        started = time.monotonic()
+        try:
+            desks = client.list_desks(office_id, floor_id, start_time, end_time)
+            return LocationScan(rank, office_id, floor_id, desks, seconds=time.monotonic() - started)
+        except DeskbirdApiError as e:
+            return LocationScan(rank, office_id, floor_id, error=str(e)[:200], seconds=time.monotonic() - started)
+
+    with ThreadPoolExecutor(max_workers=max(1, min(workers, len(locations)))) as pool:
+        futures = [pool.submit(scan, rank, office_id, floor_id) for rank, (office_id, floor_id) in enumerate(locations)]
+        results = [future.result() for future in futures]
+    log_scan(results)
+    return results
+
+
+def scan_location_tabs(driver, locations, booking_date, timeout=None):
+    """Read every location's dashboard in its own browser tab at once, for drivers with ``evaluate_in_tabs``
+
+    Returns one LocationScan per location, in rank order, with desks shaped
+    like the API's (``name``, ``isAvailable``) so ``best_desk`` takes either.
+    """
+    timeout = timeout or float(os.environ.get("SCAN_TAB_TIMEOUT", "15"))
+    started = time.monotonic()
+    urls = [booking_url(office_id, floor_id, booking_date) for office_id, floor_id in locations]
+    pages = driver.evaluate_in_tabs(urls, TAB_SCAN_SCRIPT, int(timeout * 1000), awaiting=True)
+    seconds = time.monotonic() - started
+    results = []
+    for rank, ((office_id, floor_id), cards) in enumerate(zip(locations, pages)):
+        if isinstance(cards, Exception):
+            results.append(LocationScan(rank, office_id, floor_id, error=str(cards)[:200], seconds=seconds))
+            continue
+        desks = [{"name": Desk(label, number).id, "isAvailable": bool(available)} for label, number, available in cards or []]
+        if not desks:
+            results.append(LocationScan(rank, office_id, floor_id, error="No desk cards rendered", seconds=seconds))
+            continue
+        results.append(LocationScan(rank, office_id, floor_id, desks, seconds=seconds))
+    log_scan(results)
+    return results
+
+
+def log_scan(results):
+    for result in results:
+        if result.error:
+            logger.warning(f"Could not scan {result}: {result.error}")
+        else:
+            logger.info(f"  {result}: {len(result.available)} of {len(result.desks)} desks available ({result.seconds * 1000:.0f} ms)")
+
+
+def best_desk(results, preferred_desk=None):
+    """The (LocationScan, desk) to book: preferred desks first, then the highest-ranked location with space"""
+    merged = [(result, desk) for result in results for desk in result.available]
+    if not merged:
+        return None, None
+    if preferred_desk:
+        matches = preferred_matches(merged, preferred_desk, name=lambda entry: entry[1].get("name", ""))
+        if matches:
+            return matches[0]
+        logger.warning(f"Preferred desk '{preferred_desk}' not available on any scanned floor, will book any other desk")
+    return merged[0]
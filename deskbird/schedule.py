@@ -0,0 +1,71 @@
+import os
+import logging
+from datetime import datetime, timedelta
+
+logger = logging.getLogger(__name__)
+
+WEEKDAYS = ["mon", "tue", "wed", "thu", "fri", "sat", "sun"]
+
+
+def parse_weekdays(pattern):
+    """Turn 'Mon,Tue,Thu' (or 'mon-wed,fri') into a set of weekday numbers"""
+    days = set()
+    for part in pattern.lower().replace(" ", "").split(","):
+        if not part:
+            continue
+        first, _, last = part.partition("-")
+        try:
+            start = WEEKDAYS.index(first[:3])
+            end = WEEKDAYS.index(last[:3]) if last else start
+        except ValueError:
+            raise ValueError(f"Unknown weekday in '{pattern}', expected names like Mon,Tue,Thu")
+        days.update(range(start, end + 1) if start <= end else list(range(start, 7)) + list(range(0, end + 1)))
+    if not days:
+        raise ValueError(f"No weekdays found in '{pattern}'")
+    return days
+
+
+def parse_date_range(value):
+    """Turn '2026-01-19..2026-01-23' or '2026-01-19,2026-01-22' into a list of dates"""
+    if ".." in value:
+        first, last = (datetime.strptime(part.strip(), "%Y-%m-%d") for part in value.split("..", 1))
+        if last < first:
+            raise ValueError(f"Date range '{value}' ends before it starts")
+        return [first + timedelta(days=i) for i in range((last - first).days + 1)]
+    return sorted(datetime.strptime(part.strip(), "%Y-%m-%d") for part in value.split(",") if part.strip())
+
+
+def booking_dates(today, dates=None, weekdays=None, horizon_days=14, days_ahead=7):
+    """Work out which days to book
+
+    An explicit date list or range is used as given, and a weekday pattern
+    books every matching day from tomorrow up to ``horizon_days`` ahead (or
+    filters the explicit dates). With neither, the single day ``days_ahead``
+    from today is booked.
+    """
+    today = today.replace(hour=0, minute=0, second=0, microsecond=0)
+    if dates:
+        selected = [date for date in parse_date_range(dates) if date >= today]
+    elif weekdays:
+        selected = [today + timedelta(days=i) for i in range(1, horizon_days + 1)]
+    else:
+        return [today + timedelta(days=days_ahead)]
+    if weekdays:
+        wanted = parse_weekdays(weekdays)
+        selected = [date for date in selected if date.weekday() in wanted]
+    return selected
+
+
+def booking_dates_from_env(today=None, dates=None, weekdays=None):
+    """Read BOOKING_DATES / BOOKING_WEEKDAYS / BOOKING_HORIZON_DAYS from the environment
+
+    ``dates`` and ``weekdays`` take the place of BOOKING_DATES and
+    BOOKING_WEEKDAYS when given, e.g. from a batch roster entry.
+    """
+    return booking_dates(
+        today or datetime.now(),
+        dates=dates or os.environ.get("BOOKING_DATES"),
+        weekdays=weekdays or os.environ.get("BOOKING_WEEKDAYS"),
+        horizon_days=int(os.environ.get("BOOKING_HORIZON_DAYS", "14")),
+        days_ahead=int(os.environ.get("BOOKING_DAYS_AHEAD", "7")),
+    )
@@ -0,0 +1,200 @@
+import os
+import json
+import time
+import logging
+from urllib.parse import urlparse
+
+from deskbird.urls import app_origin
+
+logger = logging.getLogger(__name__)
+
+# Cookie domains worth keeping between runs: the Deskbird app itself and the
+# Microsoft login cookies that back the "Stay signed in?" prompt
+SESSION_COOKIE_DOMAINS = (
+    "deskbird.com",
+    "login.microsoftonline.com",
+    "login.live.com",
+    "microsoft.com",
+)
+
+# Fields accepted by the DevTools Network.setCookies command
+COOKIE_PARAM_KEYS = ("name", "value", "domain", "path", "secure", "httpOnly", "sameSite", "expires")
+
+# The Firebase SDK behind the Deskbird app keeps the signed-in user, with its
+# ID and refresh tokens, in this IndexedDB store rather than in localStorage
+FIREBASE_DB = "firebaseLocalStorageDb"
+FIREBASE_STORE = "firebaseLocalStorage"
+
+# Returns every row of the Firebase auth store, or [] without creating the database
+INDEXED_DB_CAPTURE_SCRIPT = """
+const done = arguments[arguments.length - 1];
+const request = window.indexedDB.open(%(db)s);
+request.onupgradeneeded = () => request.transaction.abort();
+request.onerror = () => done([]);
+request.onsuccess = () => {
+    const db = request.result;
+    if (!db.objectStoreNames.contains(%(store)s)) {
+        db.close();
+        done([]);
+        return;
+    }
+    const rows = db.transaction(%(store)s, "readonly").objectStore(%(store)s).getAll();
+    rows.onerror = () => { db.close(); done([]); };
+    rows.onsuccess = () => { db.close(); done(rows.result); };
+};
+""" % {"db": json.dumps(FIREBASE_DB), "store": json.dumps(FIREBASE_STORE)}
+
+# Seeds localStorage and the Firebase auth store on the Deskbird origin before
+# the Angular app boots. The database is opened before any page script runs,
+# so the app's own open request waits until the rows are written.
+SESSION_SEED_SCRIPT = """
+if (window.location.origin === %(origin)s) {
+    const items = %(items)s;
+    for (const key in items) {
+        window.localStorage.setItem(key, items[key]);
+    }
+    const rows = %(rows)s;
+    if (rows.length) {
+        const request = window.indexedDB.open(%(db)s, 1);
+        request.onupgradeneeded = () => request.result.createObjectStore(%(store)s, {keyPath: "fbase_key"});
+        request.onsuccess = () => {
+            const db = request.result;
+            const store = db.transaction(%(store)s, "readwrite").objectStore(%(store)s);
+            rows.forEach(row => store.put(row));
+            db.close();
+        };
+    }
+}
+"""
+
+
+class SessionStore:
+    """Encrypted file holding cookies, local storage and Firebase auth rows from a logged-in browser"""
+
+    def __init__(self, path, key, ttl_seconds):
+        from cryptography.fernet import Fernet
+        self.path = path
+        self.ttl_seconds = ttl_seconds
+        self._fernet = Fernet(key)
+
+    def load(self):
+        """Return the cached session, or None if it is missing, unreadable or expired"""
+        from cryptography.fernet import InvalidToken
+        if not os.path.exists(self.path):
+            logger.debug(f"No cached session at {self.path}")
+            return None
+        try:
+            with open(self.path, "rb") as f:
+                session = json.loads(self._fernet.decrypt(f.read()))
+        except (InvalidToken, ValueError, OSError) as e:
+            logger.warning(f"Could not read cached session, ignoring it: {type(e).__name__}")
+            return None
+
+        remaining = session.get("expires_at", 0) - time.time()
+        if remaining <= 0:
+            logger.info("Cached session has expired")
+            self.clear()
+            return None
+        logger.debug(f"Cached session valid for another {remaining / 3600:.1f} hours")
+        return session
+
+    def save(self, cookies, local_storage, indexed_db=None):
+        """Encrypt and write the session, replacing any previous one atomically"""
+        session = {
+            "saved_at": time.time(),
+            "expires_at": time.time() + self.ttl_seconds,
+            "cookies": cookies,
+            "local_storage": local_storage,
+            "indexed_db": indexed_db or [],
+        }
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        tmp_path = f"{self.path}.tmp"
+        # Create the file owner-readable only before any secret is written to it
+        fd = os.open(tmp_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+        with os.fdopen(fd, "wb") as f:
+            f.write(self._fernet.encrypt(json.dumps(session).encode()))
+        os.replace(tmp_path, self.path)
+        logger.info(f"Saved session with {len(cookies)} cookies to {self.path}")
+
+    def clear(self):
+        """Remove the cached session"""
+        try:
+            os.remove(self.path)
+            logger.debug(f"Removed cached session at {self.path}")
+        except FileNotFoundError:
+            pass
+
+
+def open_session_store(path=None):
+    """Build a SessionStore from the environment, or None if caching is disabled"""
+    key = os.environ.get("SESSION_STORE_KEY")
+    if not key:
+        logger.debug("SESSION_STORE_KEY not set, session caching disabled")
+        return None
+    path = path or os.environ.get("SESSION_STORE_PATH", "/var/lib/deskbird/session.enc")
+    ttl_hours = float(os.environ.get("SESSION_TTL_HOURS", "72"))
+    try:
+        return SessionStore(path, key.encode(), int(ttl_hours * 3600))
+    except ImportError:
+        logger.warning("cryptography package not installed, session caching disabled")
+    except ValueError:
+        logger.error("SESSION_STORE_KEY is not a valid Fernet key, session caching disabled")
+    return None
+
+
+def capture_session(driver):
+    """Collect the cookies, local storage and Firebase auth rows from an authenticated driver"""
+    origin = app_origin()
+    # A stand-in app (e.g. the mock site on localhost) keeps its own host's cookies too
+    domains = SESSION_COOKIE_DOMAINS + (urlparse(origin).hostname,)
+    all_cookies = driver.execute_cdp_cmd("Network.getAllCookies", {}).get("cookies", [])
+    cookies = []
+    for cookie in all_cookies:
+        domain = cookie.get("domain", "").lstrip(".")
+        if not any(domain == d or domain.endswith(f".{d}") for d in domains):
+            continue
+        param = {key: cookie[key] for key in COOKIE_PARAM_KEYS if key in cookie}
+        # Session cookies report expires=-1, which setCookies would reject
+        if cookie.get("session") or param.get("expires", 0) < 0:
+            param.pop("expires", None)
+        cookies.append(param)
+
+    local_storage, indexed_db = {}, []
+    if driver.current_url.startswith(origin):
+        local_storage = driver.execute_script("return Object.assign({}, window.localStorage);") or {}
+        indexed_db = driver.execute_async_script(INDEXED_DB_CAPTURE_SCRIPT) or []
+    else:
+        logger.warning(f"Not on {origin}, local storage will not be cached")
+    if not indexed_db:
+        logger.warning("No Firebase auth user found in IndexedDB, the cached session may be rejected")
+    logger.debug(f"Captured {len(cookies)} cookies, {len(local_storage)} local storage keys and {len(indexed_db)} IndexedDB rows")
+    return cookies, local_storage, indexed_db
+
+
+def restore_session(driver, session):
+    """Load a cached session into the driver before the first Deskbird page is opened
+
+    Returns the identifier of the storage seed script so the caller can
+    remove it once the app has booted.
+    """
+    cookies = session.get("cookies", [])
+    if cookies:
+        driver.execute_cdp_cmd("Network.setCookies", {"cookies": cookies})
+    script = SESSION_SEED_SCRIPT % {
+        "origin": json.dumps(app_origin()),
+        "items": json.dumps(session.get("local_storage", {})),
+        "rows": json.dumps(session.get("indexed_db", [])),
+        "db": json.dumps(FIREBASE_DB),
+        "store": json.dumps(FIREBASE_STORE),
+    }
+    result = driver.execute_cdp_cmd("Page.addScriptToEvaluateOnNewDocument", {"source": script})
+    logger.debug(f"Restored {len(cookies)} cookies, {len(session.get('local_storage', {}))} local storage keys and {len(session.get('indexed_db', []))} IndexedDB rows")
+    return result.get("identifier")
+
+
+def forget_seed_script(driver, identifier):
+    """Stop seeding browser storage on later navigations"""
+    if identifier:
+        driver.execute_cdp_cmd("Page.removeScriptToEvaluateOnNewDocument", {"identifier": identifier})
@@ -0,0 +1,181 @@
+"""Offline stand-in for the Deskbird booking API and 1Password Connect
+
+Run ``python -m deskbird.stub_server`` and point the client at it with
+``DESKBIRD_API_URL=http://127.0.0.1:8099/v1.1`` to exercise the HTTP booking
+backend without touching the real service. With ``--connect-items items.json``
+the same server also answers the 1Password Connect item lookups used by
+``CREDENTIALS_BACKEND=connect`` (``OP_CONNECT_HOST=http://127.0.0.1:8099``).
+"""
+import re
+import json
+import logging
+import argparse
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse, parse_qs
+
+from deskbird.api import ENDPOINTS
+
+logger = logging.getLogger(__name__)
+
+API_PREFIX = "/v1.1"
+STUB_TOKEN = "stub-token"
+
+
+class StubState:
+    """In-memory desks and bookings shared by all request handlers"""
+
+    def __init__(self, office_id="office-1", floor_id="floor-1", desk_count=20, taken=(), items=None, vault="Private"):
+        self.office_id = office_id
+        self.floor_id = floor_id
+        self.lock = threading.Lock()
+        self.desks = [
+            {"id": f"desk-{i}", "zoneId": "zone-1", "name": f"5.{i // 4 + 1:02d} {'ABCD'[i % 4]}"}
+            for i in range(desk_count)
+        ]
+        # 1Password items served through the Connect endpoints, keyed by title
+        self.items = items or {}
+        self.vault = vault
+        self.bookings = []
+        # Bookings to commit and then answer with a 502, like a gateway timing out after the write
+        self.fail_after_commit = 0
+        for name in taken:
+            desk = next(d for d in self.desks if d["name"] == name)
+            self.bookings.append({"id": f"other-{desk['id']}", "zoneItemId": desk["id"], "owner": "someone-else",
+                                  "bookingStartTime": 0, "bookingEndTime": 2 ** 53})
+
+    def overlapping(self, start_time, end_time):
+        return [b for b in self.bookings if b["bookingStartTime"] < end_time and b["bookingEndTime"] > start_time]
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    # Keep-alive, like the real API, so pooled client connections are reused
+    protocol_version = "HTTP/1.1"
+    disable_nagle_algorithm = True
+    state = None
+    token = STUB_TOKEN
+
+    def log_message(self, format, *args):
+        logger.debug(f"stub: {format % args}")
+
+    def _send(self, status, payload):
+        body = json.dumps(payload).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _authorized(self):
+        if self.headers.get("Authorization") != f"Bearer {self.token}":
+            self._send(401, {"message": "Unauthorized"})
+            return False
+        return True
+
+    def _connect(self, url):
+        """Answer the three 1Password Connect lookups: vault, item by title, item by id"""
+        query = parse_qs(url.query).get("filter", [""])[0]
+        parts = url.path.strip("/").split("/")
+        if parts == ["v1", "vaults"]:
+            vaults = [{"id": "vault-1", "name": self.state.vault}]
+            self._send(200, [v for v in vaults if not query or f'"{v["name"]}"' in query])
+        elif len(parts) == 4 and parts[3] == "items":
+            # Opaque ids like Connect's, since titles can contain spaces
+            items = [{"id": f"item-{index}", "title": title} for index, title in enumerate(self.state.items)]
+            self._send(200, [i for i in items if not query or f'"{i["title"]}"' in query])
+        elif len(parts) == 5 and parts[4].startswith("item-") and parts[4][5:].isdigit() and int(parts[4][5:]) < len(self.state.items):
+            title = list(self.state.items)[int(parts[4][5:])]
+            self._send(200, dict(self.state.items[title], id=parts[4], title=title))
+        else:
+            self._send(404, {"message": "Not found"})
+
+    def do_GET(self):
+        if not self._authorized():
+            return
+        url = urlparse(self.path)
+        if url.path.startswith("/v1/vaults"):
+            self._connect(url)
+            return
+        query = {key: values[0] for key, values in parse_qs(url.query).items()}
+        start_time, end_time = int(query.get("startTime", 0)), int(query.get("endTime", 2 ** 53))
+        path = url.path[len(API_PREFIX):]
+
+        if path == ENDPOINTS["user_bookings"]:
+            with self.state.lock:
+                mine = [b for b in self.state.overlapping(start_time, end_time) if b["owner"] == "me"]
+            self._send(200, {"results": mine})
+            return
+
+        availability = re.fullmatch(ENDPOINTS["availability"].replace("{office_id}", "(?P<office_id>[^/]+)"), path)
+        if availability:
+            if availability.group("office_id") != self.state.office_id or query.get("floorId") != self.state.floor_id:
+                self._send(404, {"message": "Unknown office or floor"})
+                return
+            with self.state.lock:
+                taken = {b["zoneItemId"] for b in self.state.overlapping(start_time, end_time)}
+                desks = [dict(desk, isAvailable=desk["id"] not in taken) for desk in self.state.desks]
+            self._send(200, {"results": desks})
+            return
+
+        self._send(404, {"message": f"No stub for {path}"})
+
+    def do_POST(self):
+        if not self._authorized():
+            return
+        path = urlparse(self.path).path[len(API_PREFIX):]
+        if path != ENDPOINTS["create_booking"]:
+            self._send(404, {"message": f"No stub for {path}"})
+            return
+        length = int(self.headers.get("Content-Length", 0))
+        request = json.loads(self.rfile.read(length) or b"{}")["bookings"][0]
+        with self.state.lock:
+            clash = [b for b in self.state.overlapping(request["bookingStartTime"], request["bookingEndTime"])
+                     if b["zoneItemId"] == request["zoneItemId"]]
+            if clash:
+                self._send(409, {"message": "Desk is already booked"})
+                return
+            booking = dict(request, id=f"booking-{len(self.state.bookings) + 1}", owner="me")
+            self.state.bookings.append(booking)
+            lost = self.state.fail_after_commit > 0
+            self.state.fail_after_commit -= lost
+        if lost:
+            self._send(502, {"message": "Bad gateway"})
+            return
+        self._send(201, {"successfulBookings": [booking]})
+
+
+def start_stub_server(state=None, host="127.0.0.1", port=0):
+    """Start the stub in a background thread and return (server, base_url)"""
+    handler = type("BoundStubHandler", (StubHandler,), {"state": state or StubState()})
+    server = ThreadingHTTPServer((host, port), handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    base_url = f"http://{host}:{server.server_address[1]}{API_PREFIX}"
+    logger.info(f"Deskbird API stub listening on {base_url}")
+    return server, base_url
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run an offline Deskbird API stub")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8099)
+    parser.add_argument("--office-id", default="office-1")
+    parser.add_argument("--floor-id", default="floor-1")
+    parser.add_argument("--desks", type=int, default=20)
+    parser.add_argument("--taken", action="append", default=[], help="Desk name to mark as booked by someone else")
+    parser.add_argument("--connect-items", help="JSON file mapping 1Password item titles to items to serve")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    items = None
+    if args.connect_items:
+        with open(args.connect_items) as f:
+            items = json.load(f)
+    state = StubState(args.office_id, args.floor_id, args.desks, args.taken, items)
+    handler = type("BoundStubHandler", (StubHandler,), {"state": state})
+    server = ThreadingHTTPServer((args.host, args.port), handler)
+    logger.info(f"Deskbird API stub listening on http://{args.host}:{args.port}{API_PREFIX} (token: {STUB_TOKEN})")
+    server.serve_forever()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,59 @@
+"""RFC 6238 one-time codes generated locally from the 1Password TOTP secret
+
+Codes are only handed out when enough of the current 30-second window is left
+for Microsoft to verify them; otherwise the generator waits for the next
+window. The margin is ``OTP_MIN_REMAINING_SECONDS`` (default 5).
+"""
+import os
+import hmac
+import time
+import base64
+import struct
+import logging
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_PERIOD = 30
+DEFAULT_DIGITS = 6
+
+
+def decode_secret(secret):
+    """Decode a base32 secret, tolerating spaces, lower case and missing padding"""
+    secret = secret.replace(" ", "").upper()
+    try:
+        return base64.b32decode(secret + "=" * (-len(secret) % 8))
+    except ValueError:
+        raise ValueError("TOTP secret is not valid base32")
+
+
+def hotp(key, counter, digits=DEFAULT_DIGITS, digest="sha1"):
+    """RFC 4226 code for one counter value"""
+    mac = hmac.new(key, struct.pack(">Q", counter), digest).digest()
+    offset = mac[-1] & 0x0F
+    value = struct.unpack(">I", mac[offset:offset + 4])[0] & 0x7FFFFFFF
+    return str(value % 10 ** digits).zfill(digits)
+
+
+def totp(secret, for_time=None, period=DEFAULT_PERIOD, digits=DEFAULT_DIGITS, digest="sha1"):
+    """RFC 6238 code for ``for_time`` (now by default)"""
+    for_time = time.time() if for_time is None else for_time
+    return hotp(decode_secret(secret), int(for_time // period), digits, digest)
+
+
+def seconds_remaining(for_time=None, period=DEFAULT_PERIOD):
+    """Seconds until the current code rolls over"""
+    for_time = time.time() if for_time is None else for_time
+    return period - (for_time % period)
+
+
+def fresh_code(secret, min_remaining=None, period=DEFAULT_PERIOD, clock=time.time, sleep=time.sleep):
+    """Current code, or the next one if the current window is about to close"""
+    if min_remaining is None:
+        min_remaining = float(os.environ.get("OTP_MIN_REMAINING_SECONDS", "5"))
+    now = clock()
+    remaining = seconds_remaining(now, period)
+    if remaining < min_remaining:
+        logger.info(f"Only {remaining:.1f}s left on the current code, waiting for the next window")
+        sleep(remaining + 0.05)
+        now = clock()
+    return totp(secret, now, period)
@@ -0,0 +1,41 @@
+"""Deskbird web app URLs, kept free of selenium so they can be worked out without a browser"""
+import os
+import logging
+
+logger = logging.getLogger(__name__)
+
+DESKBIRD_ORIGIN = "https://app.deskbird.com"
+
+
+def app_origin():
+    """Origin of the Deskbird web app, overridable with DESKBIRD_APP_URL (e.g. for deskbird.mock_site)"""
+    return os.environ.get("DESKBIRD_APP_URL", DESKBIRD_ORIGIN).rstrip("/")
+
+
+def app_url(path=""):
+    """URL of a page in the Deskbird web app, on the DESKBIRD_APP_URL origin when set"""
+    return app_origin() + path
+
+
+def on_app(url):
+    """Whether a URL belongs to the Deskbird web app (any deskbird.com host for the real one)"""
+    base = app_url()
+    return "deskbird.com" in url if base == DESKBIRD_ORIGIN else url.startswith(base)
+
+
+def booking_window(booking_date):
+    """Return the full-day (6 AM - 6 PM) window for a date in epoch milliseconds"""
+    start_of_day = booking_date.replace(hour=6, minute=0, second=0, microsecond=0)
+    end_of_day = booking_date.replace(hour=18, minute=0, second=0, microsecond=0)
+    logger.debug(f"Booking time range: {start_of_day} to {end_of_day}")
+    return int(start_of_day.timestamp() * 1000), int(end_of_day.timestamp() * 1000)
+
+
+def dashboard_url(office_id):
+    return app_url(f"/office/{office_id}/bookings/dashboard")
+
+
+def booking_url(office_id, floor_id, booking_date):
+    """The dashboard's flex desk card view for a floor on the booking date"""
+    start_time, end_time = booking_window(booking_date)
+    return app_url(f"/office/{office_id}/bookings/dashboard?floorId={floor_id}&viewType=card&areaType=flexDesk&startTime={start_time}&endTime={end_time}&isFullDay=true")
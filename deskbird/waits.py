@@ -0,0 +1,179 @@
+"""Readiness waits that return as soon as the page signals it is ready
+
+Every wait belongs to a named step whose timeout can be overridden with a
+``WAIT_TIMEOUT_<STEP>`` environment variable (seconds), e.g.
+``WAIT_TIMEOUT_DASHBOARD=45``.
+"""
+import os
+import time
+import logging
+
+from selenium.webdriver.support.ui import WebDriverWait
+from selenium.webdriver.support import expected_conditions as EC
+from selenium.common.exceptions import WebDriverException
+
+logger = logging.getLogger(__name__)
+
+POLL_INTERVAL = 0.1
+
+# Default per-step timeouts in seconds
+DEFAULT_TIMEOUTS = {
+    "login_form": 10,
+    "sso_button": 10,
+    "sso_popup": 10,
+    "ms_form": 10,
+    "ms_next_page": 15,
+    "stay_signed_in": 10,
+    "auth_complete": 60,
+    "dashboard": 20,
+    "desk_cards": 30,
+    "lazy_cards": 5,
+    "quick_book": 10,
+    "full_day_toggle": 3,
+    "booking_modal": 10,
+    "booking_confirmed": 10,
+}
+
+# True once Angular reports no pending macrotasks or HTTP calls; pages without
+# Angular fall back to document.readyState
+ANGULAR_STABLE_SCRIPT = """
+if (document.readyState !== "complete") {
+    return false;
+}
+if (typeof window.getAllAngularTestabilities !== "function") {
+    return true;
+}
+return window.getAllAngularTestabilities().every(t => t.isStable());
+"""
+
+# Counts the fetch and XMLHttpRequest calls a page starts and how many are
+# still in flight. Installed on every new document, since the resource timing
+# buffer only lists requests once they have finished (and stops at 150 entries).
+REQUEST_TRACKER_SCRIPT = """
+(() => {
+    if (window.__deskbirdRequests) {
+        return;
+    }
+    const state = window.__deskbirdRequests = {started: 0, pending: 0};
+    const begin = () => { state.started++; state.pending++; };
+    const end = () => { state.pending = Math.max(0, state.pending - 1); };
+    if (window.fetch) {
+        const fetch = window.fetch;
+        window.fetch = function () {
+            begin();
+            try {
+                return fetch.apply(this, arguments).finally(end);
+            } catch (e) {
+                end();
+                throw e;
+            }
+        };
+    }
+    const send = XMLHttpRequest.prototype.send;
+    XMLHttpRequest.prototype.send = function () {
+        begin();
+        this.addEventListener("loadend", end, {once: true});
+        try {
+            return send.apply(this, arguments);
+        } catch (e) {
+            end();
+            throw e;
+        }
+    };
+})();
+"""
+
+# [requests started, requests in flight], or null before the tracker is installed
+NETWORK_ACTIVITY_SCRIPT = """
+const state = window.__deskbirdRequests;
+return state ? [state.started, state.pending] : null;
+"""
+
+
+def step_timeout(step):
+    """Timeout for a step, from WAIT_TIMEOUT_<STEP> or the built-in default"""
+    override = os.environ.get(f"WAIT_TIMEOUT_{step.upper()}")
+    if override:
+        return float(override)
+    return DEFAULT_TIMEOUTS.get(step, 10)
+
+
+def wait_until(driver, step, condition, message=None, timeout=None):
+    """Poll condition(driver) until it returns something truthy and return that value"""
+    timeout = timeout if timeout is not None else step_timeout(step)
+    logger.debug(f"Waiting up to {timeout}s for {step}")
+    return WebDriverWait(driver, timeout, poll_frequency=POLL_INTERVAL).until(
+        condition, message or f"Timed out after {timeout}s waiting for {step}"
+    )
+
+
+def wait_for_element(driver, step, locator, clickable=False, timeout=None):
+    """Wait for an element to be present (or clickable) and return it"""
+    condition = EC.element_to_be_clickable(locator) if clickable else EC.presence_of_element_located(locator)
+    return wait_until(driver, step, condition, f"{step}: element {locator[1][:80]} not found", timeout)
+
+
+def wait_for_any(driver, step, *conditions, timeout=None):
+    """Wait for the first of several conditions and return its index"""
+    def first_ready(d):
+        for index, condition in enumerate(conditions):
+            try:
+                if condition(d):
+                    return index + 1
+            except WebDriverException:
+                continue
+        return 0
+    return wait_until(driver, step, first_ready, timeout=timeout) - 1
+
+
+def wait_for_url(driver, step, predicate, timeout=None):
+    """Wait until predicate(current_url) holds and return the URL"""
+    return wait_until(driver, step, lambda d: predicate(d.current_url) and d.current_url, timeout=timeout)
+
+
+def wait_for_window_count(driver, step, count, timeout=None):
+    """Wait until exactly ``count`` browser windows are open"""
+    return wait_until(driver, step, lambda d: len(d.window_handles) == count, timeout=timeout)
+
+
+def wait_for_angular_stable(driver, step, timeout=None):
+    """Wait for the Angular app (or a plain page) to finish rendering and loading data"""
+    return wait_until(driver, step, lambda d: d.execute_script(ANGULAR_STABLE_SCRIPT), timeout=timeout)
+
+
+def track_requests(driver):
+    """Count fetch/XHR calls on every page the driver opens, for wait_for_network_idle"""
+    try:
+        driver.execute_cdp_cmd("Page.addScriptToEvaluateOnNewDocument", {"source": REQUEST_TRACKER_SCRIPT})
+    except WebDriverException as e:
+        logger.debug(f"Could not install the request tracker: {str(e)[:100]}")
+
+
+def wait_for_network_idle(driver, step, quiet_period=0.5, timeout=None):
+    """Wait until no fetch/XHR is in flight and none has started for ``quiet_period`` seconds"""
+    state = {"count": None, "since": None}
+
+    def idle(d):
+        activity = d.execute_script(NETWORK_ACTIVITY_SCRIPT)
+        if activity is None:
+            # A page opened before the tracker was installed: count from now on
+            d.execute_script(REQUEST_TRACKER_SCRIPT)
+            activity = [0, 0]
+        count, pending = activity
+        now = time.monotonic()
+        if count != state["count"] or pending:
+            state["count"], state["since"] = count, now
+            return False
+        return now - state["since"] >= quiet_period
+
+    return wait_until(driver, step, idle, timeout=timeout)
+
+
+def settle(driver, step, timeout=None):
+    """Best-effort wait for the page to settle; logs instead of raising on timeout"""
+    try:
+        wait_for_angular_stable(driver, step, timeout)
+        return True
+    except WebDriverException as e:
+        logger.debug(f"{step}: page did not settle ({type(e).__name__}), continuing")
+        return False
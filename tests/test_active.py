@@ -0,0 +1,53 @@
+import threading
+
+from deskbird.active import ActiveRun
+from deskbird.capture import DebugCapture
+from deskbird.checkpoints import Checkpoints, current_checkpoints, reach
+from deskbird.metrics import RunMetrics, current_run, note_retry
+
+
+def test_helpers_are_no_ops_outside_a_run():
+    reach("sign_in")
+    note_retry("sign_in")
+    assert current_checkpoints().last() is None
+
+
+def test_active_run_activates_and_deactivates_everything(tmp_path):
+    with ActiveRun() as active:
+        metrics = active.add(RunMetrics("alice"))
+        checkpoints = active.add(Checkpoints())
+        active.add(DebugCapture(str(tmp_path), debug=False))
+        assert active.add(None) is None
+        reach("sign_in")
+        note_retry("sign_in")
+        assert current_run() is metrics
+    assert checkpoints.last() == "sign_in"
+    assert metrics.steps["sign_in"]["retries"] == 1
+    assert current_run() is not metrics
+    assert current_checkpoints() is not checkpoints
+
+
+def test_finished_metrics_stop_recording():
+    metrics = RunMetrics("alice").activate()
+    metrics.finish(True)
+    note_retry("sign_in")
+    assert metrics.steps == {}
+    metrics.deactivate()
+
+
+def test_each_thread_sees_its_own_run():
+    seen = {}
+    ready = threading.Barrier(2)
+
+    def run(user):
+        with ActiveRun() as active:
+            active.add(RunMetrics(user))
+            ready.wait()
+            seen[user] = current_run().user
+
+    threads = [threading.Thread(target=run, args=(user,)) for user in ("alice", "bob")]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert seen == {"alice": "alice", "bob": "bob"}
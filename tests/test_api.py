@@ -0,0 +1,73 @@
+import pytest
+
+from deskbird.api import DeskbirdClient, DeskbirdApiError, book_full_day
+from deskbird.stub_server import StubState, STUB_TOKEN, start_stub_server
+
+WINDOW = (1_800_000_000_000, 1_800_043_200_000)
+
+
+@pytest.fixture
+def stub(monkeypatch):
+    monkeypatch.setenv("HISTORY_PATH", "off")
+    state = StubState(desk_count=8, taken=["5.01 A"])
+    server, base_url = start_stub_server(state)
+    yield state, base_url
+    server.shutdown()
+    server.server_close()
+
+
+def test_list_desks_reports_availability(stub):
+    state, base_url = stub
+    desks = DeskbirdClient(STUB_TOKEN, base_url).list_desks(state.office_id, state.floor_id, *WINDOW)
+    assert len(desks) == 8
+    assert [desk["name"] for desk in desks if not desk["isAvailable"]] == ["5.01 A"]
+
+
+def test_book_full_day_prefers_the_named_desk(stub):
+    state, base_url = stub
+    client = DeskbirdClient(STUB_TOKEN, base_url)
+    outcome = book_full_day(client, state.office_id, state.floor_id, *WINDOW, preferred_desk="5.02 B")
+    assert outcome["status"] == "booked"
+    assert outcome["desk"] == "5.02 B"
+    assert len(client.list_bookings(*WINDOW)) == 1
+
+
+def test_book_full_day_skips_a_taken_preferred_desk(stub):
+    state, base_url = stub
+    outcome = book_full_day(DeskbirdClient(STUB_TOKEN, base_url), state.office_id, state.floor_id, *WINDOW, preferred_desk="5.01 A")
+    assert outcome["status"] == "booked"
+    assert outcome["desk"] != "5.01 A"
+
+
+def test_book_full_day_does_not_book_twice(stub):
+    state, base_url = stub
+    client = DeskbirdClient(STUB_TOKEN, base_url)
+    first = book_full_day(client, state.office_id, state.floor_id, *WINDOW)
+    second = book_full_day(client, state.office_id, state.floor_id, *WINDOW)
+    assert second == {"status": "already_booked", "booking_id": first["booking_id"], "desk": None}
+
+
+def test_create_booking_returns_the_booking_committed_before_a_gateway_error(stub):
+    state, base_url = stub
+    state.fail_after_commit = 1
+    client = DeskbirdClient(STUB_TOKEN, base_url)
+    desk = client.list_desks(state.office_id, state.floor_id, *WINDOW)[1]
+    booking = client.create_booking(state.office_id, desk, *WINDOW)
+    assert booking["zoneItemId"] == desk["id"]
+    assert len([b for b in state.bookings if b["owner"] == "me"]) == 1
+
+
+def test_create_booking_conflict_is_not_retried(stub):
+    state, base_url = stub
+    client = DeskbirdClient(STUB_TOKEN, base_url)
+    taken = client.list_desks(state.office_id, state.floor_id, *WINDOW)[0]
+    with pytest.raises(DeskbirdApiError) as error:
+        client.create_booking(state.office_id, taken, *WINDOW)
+    assert error.value.status == 409
+
+
+def test_wrong_token_is_rejected(stub):
+    state, base_url = stub
+    with pytest.raises(DeskbirdApiError) as error:
+        DeskbirdClient("not-the-token", base_url).list_bookings(*WINDOW)
+    assert error.value.status == 401
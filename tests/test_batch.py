@@ -0,0 +1,52 @@
+import json
+from datetime import datetime
+
+import pytest
+
+from deskbird.batch import load_roster
+from deskbird.config import BookingConfig
+
+TODAY = datetime(2026, 10, 19, 9)
+
+
+@pytest.fixture
+def defaults():
+    return BookingConfig(office_id="office", floor_id="floor", artifact_dir="/tmp/artifacts")
+
+
+def write_roster(tmp_path, entries):
+    path = tmp_path / "roster.json"
+    path.write_text(json.dumps(entries))
+    return str(path)
+
+
+def test_roster_users_get_their_own_files_and_dates(tmp_path, defaults, monkeypatch):
+    monkeypatch.setenv("SESSION_STORE_PATH", "/var/lib/deskbird/session.enc")
+    path = write_roster(tmp_path, [
+        {"name": "Alice M", "op_item_name": "Alice Microsoft", "preferred_desk": "5.09 D"},
+        {"name": "bob", "floor_id": "other-floor", "booking_weekdays": "Tue,Thu"},
+    ])
+    (alice, alice_config, _), (bob, bob_config, bob_dates) = load_roster(path, defaults, TODAY)
+    assert (alice, alice_config.op_item_name, alice_config.preferred_desk) == ("Alice M", "Alice Microsoft", "5.09 D")
+    assert alice_config.artifact_dir == "/tmp/artifacts/deskbird-batch/alice-m"
+    assert alice_config.session_store_path == "/var/lib/deskbird/sessions/alice-m.enc"
+    assert (bob_config.office_id, bob_config.floor_id) == ("office", "other-floor")
+    assert {date.strftime("%a") for date in bob_dates} == {"Tue", "Thu"}
+
+
+@pytest.mark.parametrize("entry, message", [
+    ({"name": "carol", "floor": "typo"}, "Roster entry 'carol': Unknown configuration keys: floor"),
+    ({"name": "dave", "booking_backend": "carrier-pigeon"}, "Roster entry 'dave': BOOKING_BACKEND must be"),
+    ({"op_item_name": "Erin Microsoft", "booking_weekdays": "Someday"}, "Roster entry 'Erin Microsoft': "),
+])
+def test_bad_entries_name_the_user(tmp_path, defaults, entry, message):
+    path = write_roster(tmp_path, [{"name": "alice"}, entry])
+    with pytest.raises(ValueError) as error:
+        load_roster(path, defaults, TODAY)
+    assert str(error.value).startswith(message)
+
+
+def test_roster_names_must_be_unique(tmp_path, defaults):
+    path = write_roster(tmp_path, [{"name": "alice"}, {"name": "alice", "preferred_desk": "D"}])
+    with pytest.raises(ValueError, match="unique names"):
+        load_roster(path, defaults, TODAY)
@@ -0,0 +1,50 @@
+import json
+import zipfile
+
+from deskbird.capture import DebugCapture
+
+
+class FakeDriver:
+    def __init__(self):
+        self.source_reads = 0
+
+    def execute_script(self, script):
+        return ["https://app.deskbird.com/dashboard", "Dashboard", "<html>snapshot</html>"]
+
+    def get_screenshot_as_png(self):
+        return b"png"
+
+    @property
+    def page_source(self):
+        self.source_reads += 1
+        return "<html>live</html>"
+
+
+def test_snapshots_are_kept_in_a_ring(tmp_path):
+    capture = DebugCapture(str(tmp_path), debug=False, size=2)
+    for step in ("login", "dashboard", "desk_scan"):
+        capture.snapshot(FakeDriver(), step)
+    assert [entry["step"] for entry in capture.snapshots] == ["dashboard", "desk_scan"]
+    assert capture.snapshots[-1]["url"] == "https://app.deskbird.com/dashboard"
+    assert list(tmp_path.iterdir()) == []
+
+
+def test_dump_writes_the_bundle(tmp_path):
+    capture = DebugCapture(str(tmp_path), debug=False, keep_dom=True)
+    driver = FakeDriver()
+    capture.snapshot(driver, "dashboard")
+    path = capture.dump(driver, "error", RuntimeError("boom"))
+    with zipfile.ZipFile(path) as bundle:
+        assert json.loads(bundle.read("steps.json"))["error"] == "boom"
+        assert bundle.read("page.html") == b"<html>live</html>"
+        assert bundle.read("dom/00_dashboard.html") == b"<html>snapshot</html>"
+    assert (tmp_path / "deskbird_error.png").read_bytes() == b"png"
+    assert driver.source_reads == 1
+
+
+def test_dump_reuses_a_page_source_the_caller_already_read(tmp_path):
+    driver = FakeDriver()
+    path = DebugCapture(str(tmp_path), debug=False).dump(driver, "error", page_source="<html>read once</html>")
+    with zipfile.ZipFile(path) as bundle:
+        assert bundle.read("page.html") == b"<html>read once</html>"
+    assert driver.source_reads == 0
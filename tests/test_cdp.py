@@ -0,0 +1,177 @@
+import json
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+
+from deskbird.cdp import CdpConnection, CdpDriver, CdpError, _EventLoop
+
+
+class FakeWebSocket:
+    """A DevTools websocket whose replies and events the test pushes in by hand"""
+
+    def __init__(self):
+        self.sent = []
+        self.incoming = asyncio.Queue()
+
+    async def send(self, raw):
+        self.sent.append(json.loads(raw))
+
+    def push(self, **message):
+        self.incoming.put_nowait(json.dumps(message))
+
+    async def close(self):
+        self.incoming.put_nowait(None)
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        raw = await self.incoming.get()
+        if raw is None:
+            raise StopAsyncIteration
+        return raw
+
+
+def run(test):
+    """Run ``test(connection, websocket)`` on a fresh event loop"""
+    async def main():
+        websocket = FakeWebSocket()
+        connection = CdpConnection(websocket)
+        try:
+            return await test(connection, websocket)
+        finally:
+            await connection.close()
+    return asyncio.run(main())
+
+
+async def until_sent(websocket, count):
+    while len(websocket.sent) < count:
+        await asyncio.sleep(0)
+
+
+def test_replies_are_matched_to_commands_by_id():
+    async def test(connection, websocket):
+        first = asyncio.ensure_future(connection.send("Runtime.evaluate", {"expression": "1"}, session_id="s1"))
+        second = asyncio.ensure_future(connection.send("Target.getTargets"))
+        await until_sent(websocket, 2)
+        assert websocket.sent[0] == {"id": 1, "method": "Runtime.evaluate", "params": {"expression": "1"}, "sessionId": "s1"}
+        assert "sessionId" not in websocket.sent[1]
+        websocket.push(id=2, result={"targetInfos": []})
+        websocket.push(id=1, result={"result": {"value": 1}})
+        return await first, await second
+
+    assert run(test) == ({"result": {"value": 1}}, {"targetInfos": []})
+
+
+def test_error_replies_raise():
+    async def test(connection, websocket):
+        command = asyncio.ensure_future(connection.send("DOM.getDocument"))
+        await until_sent(websocket, 1)
+        websocket.push(id=1, error={"code": -32000, "message": "No target with given id"})
+        with pytest.raises(CdpError, match="No target with given id"):
+            await command
+
+    run(test)
+
+
+def test_events_reach_listeners_until_they_stop():
+    async def test(connection, websocket):
+        seen = []
+        stop = connection.listen(seen.append)
+        websocket.push(method="Target.targetCreated", params={"targetInfo": {"targetId": "t1"}})
+        await asyncio.sleep(0)
+        stop()
+        websocket.push(method="Target.targetDestroyed", params={"targetId": "t1"})
+        await asyncio.sleep(0)
+        return [message["method"] for message in seen]
+
+    assert run(test) == ["Target.targetCreated"]
+
+
+def test_expect_filters_by_session_and_predicate():
+    async def test(connection, websocket):
+        loaded = connection.expect("Page.frameNavigated", "s2", predicate=lambda params: params["frame"].get("parentId") is None)
+        websocket.push(method="Page.frameNavigated", sessionId="s1", params={"frame": {"id": "a"}})
+        websocket.push(method="Page.frameNavigated", sessionId="s2", params={"frame": {"id": "b", "parentId": "a"}})
+        websocket.push(method="Page.frameNavigated", sessionId="s2", params={"frame": {"id": "c"}})
+        params = await asyncio.wait_for(loaded, 1)
+        return params, connection._listeners
+
+    params, listeners = run(test)
+    assert params == {"frame": {"id": "c"}}
+    assert listeners == []
+
+
+def test_a_closed_connection_fails_pending_and_new_commands():
+    async def test(connection, websocket):
+        command = asyncio.ensure_future(connection.send("Page.navigate", {"url": "about:blank"}))
+        await until_sent(websocket, 1)
+        await websocket.close()
+        with pytest.raises(CdpError, match="connection closed"):
+            await command
+        assert connection.closed
+        with pytest.raises(CdpError, match="is closed"):
+            await connection.send("Page.enable")
+
+    run(test)
+
+
+class FakePage:
+    def __init__(self, url, browser=None):
+        self.url = url
+        self.target_id = url
+        self.browser = browser
+        self.closed = False
+
+    async def call(self, script, args=(), awaiting=False):
+        if "broken" in self.url:
+            raise CdpError("Cannot find context with specified id")
+        self.browser.running += 1
+        self.browser.peak = max(self.browser.peak, self.browser.running)
+        await asyncio.sleep(0.05)
+        self.browser.running -= 1
+        return [self.url, args, awaiting]
+
+    async def close(self):
+        self.closed = True
+
+
+class FakeBrowser:
+    def __init__(self):
+        self.opened = []
+        self.running = self.peak = 0
+        self.connection = SimpleNamespace(closed=False)
+        self.process = SimpleNamespace(pid=1)
+
+    async def new_page(self, url="about:blank"):
+        page = FakePage(url, self)
+        self.opened.append(page)
+        return page
+
+
+def test_evaluate_in_tabs_runs_every_tab_at_once():
+    events = _EventLoop()
+    try:
+        browser = FakeBrowser()
+        driver = CdpDriver(browser, events, FakePage("first"))
+        results = driver.evaluate_in_tabs(["a", "broken", "c"], "return 1;", 7, awaiting=True)
+    finally:
+        events.stop()
+    assert results[0] == ["a", (7,), True]
+    assert isinstance(results[1], CdpError)
+    assert results[2] == ["c", (7,), True]
+    assert browser.peak == 2
+    assert all(page.closed for page in browser.opened)
+
+
+def test_a_tab_driver_closes_only_its_tab():
+    events = _EventLoop()
+    try:
+        browser = FakeBrowser()
+        first = FakePage("first")
+        CdpDriver(browser, events, first).new_tab("https://example.com").quit()
+    finally:
+        events.stop()
+    assert [page.closed for page in browser.opened] == [True]
+    assert not first.closed
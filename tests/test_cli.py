@@ -0,0 +1,63 @@
+import sys
+import json
+
+import pytest
+
+from deskbird.cli import main
+
+SETTINGS = ("OFFICE_ID", "FLOOR_ID", "PREFERRED_DESK", "BOOKING_BACKEND", "BOOKING_LOCATIONS", "RACE_RELEASE_AT",
+            "BOOKING_DATES", "BOOKING_WEEKDAYS", "NETWORK_FILTER", "CREDENTIALS_BACKEND", "HISTORY_PATH")
+
+
+@pytest.fixture
+def env(monkeypatch, tmp_path):
+    for name in SETTINGS:
+        monkeypatch.delenv(name, raising=False)
+    monkeypatch.setenv("OFFICE_ID", "office-1")
+    monkeypatch.setenv("FLOOR_ID", "floor-1")
+    monkeypatch.setenv("CREDENTIALS_BACKEND", "env")
+    monkeypatch.setenv("HISTORY_PATH", str(tmp_path / "availability.jsonl"))
+    return monkeypatch
+
+
+@pytest.fixture
+def no_browser(monkeypatch):
+    """Make importing selenium or the browser flow fail for the duration of the test"""
+    for name in list(sys.modules):
+        if name == "selenium" or name.startswith("selenium.") or name in ("deskbird.flow", "deskbird.browser", "deskbird.waits", "deskbird.cdp"):
+            monkeypatch.delitem(sys.modules, name)
+    monkeypatch.setitem(sys.modules, "selenium", None)
+
+
+def test_validate_config_accepts_a_good_config(env, no_browser):
+    assert main(["validate-config"]) == 0
+
+
+@pytest.mark.parametrize("name, value", [
+    ("OFFICE_ID", ""),
+    ("NETWORK_FILTER", "everything"),
+    ("CREDENTIALS_BACKEND", "keychain"),
+    ("BOOKING_WEEKDAYS", "Funday"),
+    ("BOOKING_BACKEND", "carrier-pigeon"),
+])
+def test_validate_config_rejects_a_bad_setting(env, no_browser, name, value, caplog):
+    env.setenv(name, value)
+    assert main(["validate-config"]) == 1
+    assert caplog.records and caplog.records[-1].levelname == "ERROR"
+
+
+def test_dry_run_prints_the_plan_without_a_browser(env, no_browser, capsys):
+    env.setenv("BOOKING_DATES", "2999-01-05..2999-01-07")
+    env.setenv("PREFERRED_DESK", "5.09 D")
+    assert main(["dry-run", "--json"]) == 0
+    plan = json.loads(capsys.readouterr().out)
+    assert [entry["date"] for entry in plan] == ["2999-01-05", "2999-01-06", "2999-01-07"]
+    assert plan[0]["preferred_desk"] == "5.09 D"
+    assert "floorId=floor-1" in plan[0]["booking_url"]
+    assert "selenium" not in [name.split(".")[0] for name, module in sys.modules.items() if module is not None]
+    assert "deskbird.flow" not in sys.modules
+
+
+def test_dry_run_fails_on_bad_config(env, no_browser):
+    env.delenv("FLOOR_ID")
+    assert main(["dry-run"]) == 1
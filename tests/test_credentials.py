@@ -0,0 +1,128 @@
+import json
+
+import pytest
+
+from deskbird import credentials as credentials_module
+from deskbird.credentials import (
+    ConnectBackend, FileBackend, forget_credentials, load_credentials, parse_item, prefetch_credentials,
+)
+from deskbird.stub_server import STUB_TOKEN, StubState, start_stub_server
+from deskbird.totp import totp
+
+SECRET = "GEZDGNBVGY3TQOJQGEZDGNBVGY3TQOJQ"
+
+# Trimmed output of `op item get "Alice Microsoft" --format json`
+OP_ITEM = {
+    "id": "abcdefghijklmnopqrstuvwxyz",
+    "title": "Alice Microsoft",
+    "vault": {"id": "vault-1", "name": "Private"},
+    "category": "LOGIN",
+    "fields": [
+        {"id": "username", "type": "STRING", "purpose": "USERNAME", "label": "username", "value": "alice@example.com"},
+        {"id": "password", "type": "CONCEALED", "purpose": "PASSWORD", "label": "password", "value": "s3cret"},
+        {"id": "notesPlain", "type": "STRING", "purpose": "NOTES", "label": "notesPlain"},
+        {"id": "TOTP_abc", "section": {"id": "add more"}, "type": "OTP", "label": "one-time password",
+         "value": f"otpauth://totp/Microsoft:alice@example.com?secret={SECRET}&issuer=Microsoft", "totp": "123456"},
+    ],
+}
+
+
+class CountingBackend:
+    name = "counting"
+
+    def __init__(self):
+        self.fetches = 0
+
+    def fetch_item(self, item_name, vault):
+        self.fetches += 1
+        return OP_ITEM
+
+    def otp_source(self, item_name, vault, totp_secret):
+        return None
+
+
+@pytest.fixture(autouse=True)
+def empty_cache():
+    credentials_module._cache.clear()
+    yield
+    credentials_module._cache.clear()
+
+
+def test_parse_op_item():
+    assert parse_item(OP_ITEM, "Alice Microsoft") == ("alice@example.com", "s3cret", SECRET)
+
+
+def test_parse_item_by_label_and_bare_secret():
+    item = {"fields": [
+        {"label": "username", "value": "bob@example.com"},
+        {"label": "password", "value": "hunter2"},
+        {"type": "OTP", "value": "gezd gnbv gy3t qojq gezd gnbv gy3t qojq"},
+    ]}
+    assert parse_item(item, "Bob") == ("bob@example.com", "hunter2", SECRET.lower())
+
+
+def test_parse_item_without_password():
+    with pytest.raises(ValueError, match="password"):
+        parse_item({"fields": OP_ITEM["fields"][:1]}, "Alice Microsoft")
+
+
+def test_file_backend_single_item_and_mapping(tmp_path):
+    single, mapping = tmp_path / "item.json", tmp_path / "items.json"
+    single.write_text(json.dumps(OP_ITEM))
+    mapping.write_text(json.dumps({"Alice Microsoft": OP_ITEM}))
+    for path in (single, mapping):
+        credentials = load_credentials("Alice Microsoft", "Private", FileBackend(str(path)))
+        credentials_module._cache.clear()
+        assert credentials.email == "alice@example.com"
+        assert credentials.otp() == totp(SECRET)
+
+
+def test_file_backend_falls_back_to_the_current_code(tmp_path):
+    path = tmp_path / "item.json"
+    item = json.loads(json.dumps(OP_ITEM))
+    item["fields"][3]["value"] = "not base32!"
+    path.write_text(json.dumps(item))
+    assert load_credentials("Alice Microsoft", "Private", FileBackend(str(path))).otp() == "123456"
+
+
+def test_connect_backend_against_the_stub():
+    server, _ = start_stub_server(StubState(items={"Alice Microsoft": OP_ITEM}))
+    try:
+        backend = ConnectBackend(f"http://127.0.0.1:{server.server_address[1]}", STUB_TOKEN)
+        credentials = load_credentials("Alice Microsoft", "Private", backend)
+        assert (credentials.email, credentials.password) == ("alice@example.com", "s3cret")
+        with pytest.raises(ValueError, match="not found"):
+            backend.fetch_item("Nobody", "Private")
+    finally:
+        server.shutdown()
+        server.server_close()
+
+
+def test_credentials_are_cached_until_the_ttl(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(credentials_module.time, "monotonic", lambda: now[0])
+    monkeypatch.setenv("CREDENTIALS_CACHE_TTL_SECONDS", "60")
+    backend = CountingBackend()
+    first = load_credentials("Alice Microsoft", "Private", backend)
+    now[0] += 59
+    assert load_credentials("Alice Microsoft", "Private", backend) is first
+    assert backend.fetches == 1
+    now[0] += 2
+    assert load_credentials("Alice Microsoft", "Private", backend) is not first
+    assert backend.fetches == 2
+
+
+def test_forget_credentials_drops_the_cache():
+    backend = CountingBackend()
+    load_credentials("Alice Microsoft", "Private", backend)
+    load_credentials("Other", "Private", backend)
+    forget_credentials("Alice Microsoft", "Private")
+    load_credentials("Alice Microsoft", "Private", backend)
+    load_credentials("Other", "Private", backend)
+    assert backend.fetches == 3
+
+
+def test_prefetch_resolves_in_the_background():
+    pending = prefetch_credentials("Alice Microsoft", "Private", CountingBackend())
+    assert pending.email == "alice@example.com"
+    assert pending.password == "s3cret"
@@ -0,0 +1,45 @@
+from datetime import datetime
+
+import pytest
+
+from deskbird.daemon import CronSchedule, parse_cron_field
+
+
+def test_parse_cron_field():
+    assert parse_cron_field("*/15", 0, 59) == {0, 15, 30, 45}
+    assert parse_cron_field("1,4", 0, 7) == {1, 4}
+    assert parse_cron_field("9-11", 0, 23) == {9, 10, 11}
+    with pytest.raises(ValueError):
+        parse_cron_field("60", 0, 59)
+
+
+def test_default_schedule_runs_monday_and_thursday_at_one():
+    schedule = CronSchedule("0 1 * * 1,4")
+    # Saturday 2026-10-17
+    assert schedule.next_after(datetime(2026, 10, 17, 12, 30)) == datetime(2026, 10, 19, 1, 0)
+    assert schedule.next_after(datetime(2026, 10, 19, 1, 0)) == datetime(2026, 10, 22, 1, 0)
+
+
+def test_next_after_is_strictly_later():
+    schedule = CronSchedule("*/30 * * * *")
+    assert schedule.next_after(datetime(2026, 10, 17, 9, 0, 0)) == datetime(2026, 10, 17, 9, 30)
+    assert schedule.next_after(datetime(2026, 10, 17, 9, 29, 59)) == datetime(2026, 10, 17, 9, 30)
+
+
+def test_sunday_is_zero_or_seven():
+    assert CronSchedule("0 8 * * 0").next_after(datetime(2026, 10, 17)) == datetime(2026, 10, 18, 8, 0)
+    assert CronSchedule("0 8 * * 7").next_after(datetime(2026, 10, 17)) == datetime(2026, 10, 18, 8, 0)
+
+
+def test_restricted_day_and_weekday_match_either():
+    # The 1st of the month or any Friday, as in cron
+    schedule = CronSchedule("0 6 1 * 5")
+    assert schedule.next_after(datetime(2026, 10, 17)) == datetime(2026, 10, 23, 6, 0)
+    assert schedule.next_after(datetime(2026, 10, 30, 7, 0)) == datetime(2026, 11, 1, 6, 0)
+
+
+def test_invalid_schedules():
+    with pytest.raises(ValueError):
+        CronSchedule("0 1 * *")
+    with pytest.raises(ValueError):
+        CronSchedule("0 0 31 2 *").next_after(datetime(2026, 1, 1))
@@ -0,0 +1,107 @@
+import json
+import threading
+from datetime import date, datetime, timedelta
+
+from deskbird.history import DAY, AvailabilityHistory, observe, plan_desks
+
+BOOKING_DATE = date(2026, 10, 23)
+NOW = datetime(2026, 10, 16, 8).timestamp()
+
+
+def record_weeks(history, weeks, desks, office="office", floor="floor"):
+    """One snapshot in each earlier week, a week ahead of that week's Friday like this run"""
+    for week in range(weeks, 0, -1):
+        day = BOOKING_DATE - timedelta(weeks=week)
+        history.observe(office, floor, day.strftime("%Y-%m-%d"), desks, now=NOW - week * 7 * DAY)
+
+
+def test_observe_keeps_when_desks_were_first_seen_taken(tmp_path):
+    history = AvailabilityHistory(str(tmp_path / "availability.jsonl"))
+    history.observe("office", "floor", "2026-10-23", [("5.08 B", True), ("5.09 D", True)], now=100)
+    history.observe("office", "floor", "2026-10-23", [("5.08 B", False), ("5.09 D", True)], now=200)
+    snapshot = history.observe("office", "floor", "2026-10-23", [("5.08 B", False), ("5.09 D", False)], now=300)
+    assert snapshot["free"] == []
+    assert snapshot["taken"] == {"5.08 B": 200, "5.09 D": 300}
+    assert snapshot["w"] == BOOKING_DATE.weekday()
+
+
+def test_plan_ranks_desks_by_recorded_availability(tmp_path):
+    history = AvailabilityHistory(str(tmp_path / "availability.jsonl"))
+    assert plan_desks(history, [("office", "floor")], BOOKING_DATE, now=NOW) == []
+    record_weeks(history, 6, [("5.08 B", True), ("5.09 D", False), ("5.10 D", True)])
+    history.observe("office", "floor", "2026-10-16", [("5.10 D", False)], now=NOW - 7 * DAY)
+    # Another floor's history does not count
+    record_weeks(history, 6, [("5.09 D", True)], floor="other")
+
+    plan = plan_desks(history, [("office", "floor")], BOOKING_DATE, now=NOW)
+    assert [name for name, _ in plan] == ["5.08 B", "5.10 D", "5.09 D"]
+    assert plan[0][1] > 0.8 > plan[1][1] > plan[2][1]
+
+
+def test_plan_expands_preferences_and_keeps_unseen_ones(tmp_path):
+    history = AvailabilityHistory(str(tmp_path / "availability.jsonl"))
+    record_weeks(history, 4, [("5.08 B", True), ("5.09 D", False), ("5.10 D", True)])
+
+    plan = plan_desks(history, [("office", "floor")], BOOKING_DATE, preferred_desk="D, 7.01 A", now=NOW)
+    assert [name for name, _ in plan] == ["5.10 D", "5.09 D", "7.01 A", "5.08 B"]
+    assert plan[2] == ("7.01 A", None)
+
+
+def test_observe_records_into_the_active_history_only(tmp_path):
+    history = AvailabilityHistory(str(tmp_path / "availability.jsonl"))
+    observe("office", "floor", BOOKING_DATE, [("5.08 B", True)])
+    assert history.snapshots() == []
+    history.activate()
+    try:
+        observe("office", "floor", BOOKING_DATE, [("5.08 B", True)])
+    finally:
+        history.deactivate()
+    assert [s["d"] for s in history.snapshots()] == ["2026-10-23"]
+
+
+def test_compaction_once_the_cap_is_hit(tmp_path):
+    path = tmp_path / "availability.jsonl"
+    history = AvailabilityHistory(str(path), retention_days=30, max_bytes=2000)
+    desks = [(f"5.{number:02d} A", number % 2 == 0) for number in range(5)]
+    for index in range(40):
+        history.observe("office", "floor", "2026-10-23", desks, now=NOW + index)
+        assert path.stat().st_size <= 2000
+    kept = [json.loads(line) for line in path.read_text().splitlines()]
+    assert len(kept) < 40
+    assert kept[-1]["t"] == NOW + 39
+    assert [s["t"] for s in history.snapshots()] == [s["t"] for s in kept]
+
+
+def test_compaction_drops_expired_snapshots(tmp_path):
+    history = AvailabilityHistory(str(tmp_path / "availability.jsonl"), retention_days=30)
+    history.observe("office", "floor", "2026-08-14", [("5.08 B", True)], now=NOW - 60 * DAY)
+    history.observe("office", "floor", "2026-10-23", [("5.08 B", True)], now=NOW)
+    history.compact(now=NOW)
+    assert [s["d"] for s in history.snapshots()] == ["2026-10-23"]
+
+
+def test_concurrent_appends_from_several_instances(tmp_path):
+    path = str(tmp_path / "availability.jsonl")
+    histories = [AvailabilityHistory(path), AvailabilityHistory(path)]
+
+    def append(history, worker):
+        for index in range(25):
+            history.observe("office", f"floor-{worker}", "2026-10-23", [("5.08 B", index % 2 == 0)], now=NOW + index)
+
+    threads = [threading.Thread(target=append, args=(histories[worker % 2], worker)) for worker in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    with open(path) as f:
+        lines = [json.loads(line) for line in f]
+    assert len(lines) == 100
+    for history in histories:
+        assert len(history.snapshots()) == 100
+    # Every append saw the previous snapshot of its own floor, so each change was noticed
+    for worker in range(4):
+        floor = [s for s in lines if s["f"] == f"floor-{worker}"]
+        assert [s["t"] for s in floor] == [NOW + index for index in range(25)]
+        assert floor[-2]["taken"] == {"5.08 B": NOW + 23}
+        assert "taken" not in floor[-1]
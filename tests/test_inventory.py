@@ -0,0 +1,47 @@
+from deskbird.inventory import Desk, DeskInventory, parse_preferences, preferred_matches
+
+API_DESKS = [
+    {"id": "desk-1", "name": "5.08 B"},
+    {"id": "desk-2", "name": "5.09 D"},
+    {"id": "desk-3", "name": "Desk 5.10 D"},
+    {"id": "desk-4", "name": "5.11 A"},
+]
+INVENTORY = DeskInventory([
+    Desk("B", "5.08", available=True),
+    Desk("D", "5.09", available=True),
+    Desk("D", "5.10", available=False),
+    Desk("A", "5.11", available=True, favourite=True),
+])
+
+
+def test_parse_preferences():
+    assert parse_preferences("5.09 D, Desk 5.08 B, 510, D") == [("5.09", "D"), ("5.08", "B"), ("510", None), (None, "D")]
+    assert parse_preferences("") == []
+    assert parse_preferences(None) == []
+
+
+def test_get_by_desk_id():
+    assert INVENTORY.get("Desk 5.09  d").number == "5.09"
+    assert INVENTORY.get("5.12 A") is None
+
+
+def test_available_desks_favourites_first():
+    assert [desk.id for desk in INVENTORY.available()] == ["5.11 A", "5.08 B", "5.09 D"]
+
+
+def test_ranked_keeps_the_preference_order_and_skips_taken_desks():
+    assert [desk.id for desk in INVENTORY.ranked("5.10 D, 5.09 D, 508")] == ["5.09 D", "5.08 B"]
+    assert [desk.id for desk in INVENTORY.ranked("D")] == ["5.09 D"]
+    assert INVENTORY.pick("6.01") is None
+    assert INVENTORY.pick("5.08 B, 5.09 D").id == "5.08 B"
+
+
+def test_preferred_matches_keeps_the_preference_order():
+    assert [desk["id"] for desk in preferred_matches(API_DESKS, "5.08 B, 5.09 D")] == ["desk-1", "desk-2"]
+    assert [desk["id"] for desk in preferred_matches(API_DESKS, "5.09 D, 5.08 B")] == ["desk-2", "desk-1"]
+
+
+def test_preferred_matches_by_number_or_label():
+    assert [desk["id"] for desk in preferred_matches(API_DESKS, "510")] == ["desk-3"]
+    assert [desk["id"] for desk in preferred_matches(API_DESKS, "D")] == ["desk-2", "desk-3"]
+    assert preferred_matches(API_DESKS, "6.01") == []
@@ -0,0 +1,119 @@
+import socket
+import subprocess
+import sys
+import time
+
+import pytest
+
+from deskbird import ledger as ledger_module
+from deskbird.ledger import BookingLedger, owner_alive, run_owner
+
+DATES = ["2026-10-19", "2026-10-22"]
+
+
+@pytest.fixture
+def ledger(tmp_path):
+    return BookingLedger(str(tmp_path / "ledger.db"))
+
+
+def dead_owner():
+    process = subprocess.Popen([sys.executable, "-c", "pass"])
+    process.wait()
+    return f"{socket.gethostname()}:{process.pid}"
+
+
+def test_claim_is_free_for_the_first_run(ledger):
+    assert ledger.claim("alice", "office-1", DATES) == {}
+
+
+def test_claim_held_by_another_live_run(ledger, monkeypatch):
+    monkeypatch.setattr(ledger_module, "run_owner", lambda: "other-host:1234")
+    ledger.claim("alice", "office-1", DATES)
+    monkeypatch.undo()
+    assert ledger.claim("alice", "office-1", DATES) == {date: "other-host:1234" for date in DATES}
+    # Another user's dates are not affected
+    assert ledger.claim("bob", "office-1", DATES) == {}
+
+
+def test_claim_taken_over_from_a_dead_run(ledger, monkeypatch):
+    owner = dead_owner()
+    monkeypatch.setattr(ledger_module, "run_owner", lambda: owner)
+    ledger.claim("alice", "office-1", DATES)
+    monkeypatch.undo()
+    assert ledger.claim("alice", "office-1", DATES) == {}
+
+
+def test_claim_taken_over_after_the_ttl(tmp_path, monkeypatch):
+    ledger = BookingLedger(str(tmp_path / "ledger.db"), claim_ttl=0)
+    monkeypatch.setattr(ledger_module, "run_owner", lambda: "other-host:1234")
+    ledger.claim("alice", "office-1", DATES)
+    monkeypatch.undo()
+    assert ledger.claim("alice", "office-1", DATES) == {}
+
+
+def test_released_claims_are_free_again(ledger, monkeypatch):
+    monkeypatch.setattr(ledger_module, "run_owner", lambda: "other-host:1234")
+    ledger.claim("alice", "office-1", DATES)
+    ledger.release("alice", "office-1", DATES[:1])
+    monkeypatch.undo()
+    assert ledger.claim("alice", "office-1", DATES) == {DATES[1]: "other-host:1234"}
+
+
+def test_owner_alive():
+    assert owner_alive(run_owner()) is False
+    assert owner_alive(dead_owner()) is False
+    assert owner_alive(f"{socket.gethostname()}:1") is True
+    assert owner_alive("other-host:1234") is True
+
+
+def test_record_and_reconcile(ledger):
+    ledger.record("alice", "office-1", "2026-10-19", "floor-1", "5.09 D", "booking-1")
+    assert ledger.booked("alice", "office-1", DATES) == {"2026-10-19": {"floor_id": "floor-1", "desk": "5.09 D", "booking_id": "booking-1"}}
+    live = [{"id": "booking-2", "zoneItemName": "5.08 B", "bookingStartTime": 1792648800000}]  # 2026-10-22 morning
+    added, removed = ledger.reconcile("alice", "office-1", "2026-10-19", "2026-10-23", live)
+    assert (added, removed) == (1, 1)
+    assert list(ledger.booked("alice", "office-1", DATES)) == ["2026-10-22"]
+
+
+def age_claims(ledger, seconds):
+    with ledger._connect() as db:
+        db.execute("UPDATE claims SET claimed_at = claimed_at - ?", (seconds,))
+
+
+def test_claim_from_another_host_expires_without_a_heartbeat(ledger, monkeypatch):
+    monkeypatch.setattr(ledger_module, "run_owner", lambda: "other-host:1234")
+    ledger.claim("alice", "office-1", DATES)
+    age_claims(ledger, ledger.claim_ttl + 1)
+    monkeypatch.undo()
+    assert ledger.claim("alice", "office-1", DATES) == {}
+
+
+def test_refreshed_claim_stays_held(ledger, monkeypatch):
+    monkeypatch.setattr(ledger_module, "run_owner", lambda: "other-host:1234")
+    ledger.claim("alice", "office-1", DATES)
+    age_claims(ledger, ledger.claim_ttl + 1)
+    ledger.refresh("alice", "office-1", DATES)
+    monkeypatch.undo()
+    assert ledger.claim("alice", "office-1", DATES) == {date: "other-host:1234" for date in DATES}
+
+
+def test_heartbeat_refreshes_claims(tmp_path):
+    ledger = BookingLedger(str(tmp_path / "ledger.db"), claim_ttl=4)
+    ledger.claim("alice", "office-1", DATES)
+    age_claims(ledger, 100)
+    heartbeat = ledger.keep_claims("alice", "office-1", DATES)
+    try:
+        with ledger._connect() as db:
+            deadline = time.time() + 5
+            while db.execute("SELECT MIN(claimed_at) FROM claims").fetchone()[0] < time.time() - 50 and time.time() < deadline:
+                time.sleep(0.1)
+            assert db.execute("SELECT MIN(claimed_at) FROM claims").fetchone()[0] > time.time() - 5
+    finally:
+        heartbeat.stop()
+    assert not heartbeat.is_alive()
+
+
+def test_dates_being_booked_elsewhere_fail_the_run():
+    from deskbird.flow import log_outcomes
+    assert log_outcomes([{"date": DATES[0], "status": "already_booked"}, {"date": DATES[1], "status": "booked"}]) == 0
+    assert log_outcomes([{"date": DATES[0], "status": "already_booked"}, {"date": DATES[1], "status": "in_progress"}]) == 1
@@ -0,0 +1,17 @@
+from deskbird.race import candidate_desks
+
+DESKS = [
+    {"id": "desk-1", "name": "5.08 B", "isAvailable": True},
+    {"id": "desk-2", "name": "5.09 D", "isAvailable": True},
+    {"id": "desk-3", "name": "5.10 D", "isAvailable": False},
+    {"id": "desk-4", "name": "5.11 A", "isAvailable": True},
+]
+
+
+def test_candidate_desks_puts_preferred_desks_first():
+    assert [desk["id"] for desk in candidate_desks(DESKS, "5.11 A, 5.09 D")] == ["desk-4", "desk-2", "desk-1"]
+    assert [desk["id"] for desk in candidate_desks(DESKS)] == ["desk-1", "desk-2", "desk-4"]
+
+
+def test_candidate_desks_only_lists_available_desks():
+    assert [desk["id"] for desk in candidate_desks(DESKS, "5.10 D, 5.11 A")] == ["desk-4", "desk-1", "desk-2"]
@@ -0,0 +1,55 @@
+from datetime import datetime
+
+import pytest
+
+from deskbird.scan import TAB_SCAN_SCRIPT, best_desk, parse_locations, scan_location_tabs
+
+BOOKING_DATE = datetime(2026, 10, 23)
+
+
+class TabDriver:
+    """Answers evaluate_in_tabs with canned desk cards per floor, like the DevTools driver"""
+
+    def __init__(self, floors):
+        self.floors = floors
+        self.calls = []
+
+    def evaluate_in_tabs(self, urls, script, *args, awaiting=False):
+        self.calls.append((urls, script, args, awaiting))
+        results = []
+        for url in urls:
+            cards = next(cards for floor, cards in self.floors.items() if f"floorId={floor}&" in url)
+            results.append(cards)
+        return results
+
+
+def test_parse_locations():
+    assert parse_locations("111:1, 222:2") == [("111", "1"), ("222", "2")]
+    assert parse_locations(None, "111", "1, 2") == [("111", "1"), ("111", "2")]
+    with pytest.raises(ValueError):
+        parse_locations("111")
+
+
+def test_tab_scan_reads_every_floor_in_one_call(monkeypatch):
+    monkeypatch.delenv("DESKBIRD_APP_URL", raising=False)
+    driver = TabDriver({
+        "1": [["D", "5.09", False], ["B", "5.08", True]],
+        "2": RuntimeError("Cannot find context with specified id"),
+        "3": [],
+    })
+    results = scan_location_tabs(driver, [("111", "1"), ("111", "2"), ("222", "3")], BOOKING_DATE, timeout=5)
+
+    (urls, script, args, awaiting), = driver.calls
+    assert urls[2].startswith("https://app.deskbird.com/office/222/bookings/dashboard?floorId=3&")
+    assert (script, args, awaiting) == (TAB_SCAN_SCRIPT, (5000,), True)
+    assert [result.desks for result in results] == [
+        [{"name": "5.09 D", "isAvailable": False}, {"name": "5.08 B", "isAvailable": True}], [], []]
+    assert [result.error for result in results] == [None, "Cannot find context with specified id", "No desk cards rendered"]
+    assert [result.rank for result in results] == [0, 1, 2]
+
+
+def test_tab_results_pick_a_desk_like_api_results():
+    driver = TabDriver({"1": [["D", "5.09", False]], "2": [["A", "7.01", True], ["D", "7.09", True]]})
+    results = scan_location_tabs(driver, [("111", "1"), ("111", "2")], BOOKING_DATE)
+    location, desk = best_desk(results, "D")
+    assert (location.floor_id, desk["name"]) == ("2", "7.09 D")
@@ -0,0 +1,51 @@
+from datetime import datetime
+
+import pytest
+
+from deskbird.schedule import booking_dates, booking_dates_from_env, parse_date_range, parse_weekdays
+
+# A Saturday
+TODAY = datetime(2026, 10, 17, 9, 30)
+
+
+def days(dates):
+    return [date.strftime("%Y-%m-%d") for date in dates]
+
+
+def test_parse_weekdays():
+    assert parse_weekdays("Mon,Tue,Thu") == {0, 1, 3}
+    assert parse_weekdays("mon-wed, fri") == {0, 1, 2, 4}
+    assert parse_weekdays("Friday-Monday") == {4, 5, 6, 0}
+    with pytest.raises(ValueError):
+        parse_weekdays("Funday")
+    with pytest.raises(ValueError):
+        parse_weekdays(",")
+
+
+def test_parse_date_range():
+    assert days(parse_date_range("2026-10-19..2026-10-21")) == ["2026-10-19", "2026-10-20", "2026-10-21"]
+    assert days(parse_date_range("2026-10-22, 2026-10-19")) == ["2026-10-19", "2026-10-22"]
+    with pytest.raises(ValueError):
+        parse_date_range("2026-10-21..2026-10-19")
+
+
+def test_default_is_one_day_ahead():
+    assert days(booking_dates(TODAY)) == ["2026-10-24"]
+    assert days(booking_dates(TODAY, days_ahead=3)) == ["2026-10-20"]
+
+
+def test_weekdays_within_the_horizon():
+    assert days(booking_dates(TODAY, weekdays="Mon,Thu", horizon_days=14)) == ["2026-10-19", "2026-10-22", "2026-10-26", "2026-10-29"]
+
+
+def test_explicit_dates_drop_the_past_and_filter_by_weekday():
+    assert days(booking_dates(TODAY, dates="2026-10-16..2026-10-20")) == ["2026-10-17", "2026-10-18", "2026-10-19", "2026-10-20"]
+    assert days(booking_dates(TODAY, dates="2026-10-16..2026-10-23", weekdays="Tue,Thu")) == ["2026-10-20", "2026-10-22"]
+
+
+def test_from_env_with_overrides(monkeypatch):
+    monkeypatch.setenv("BOOKING_WEEKDAYS", "Mon")
+    monkeypatch.setenv("BOOKING_HORIZON_DAYS", "7")
+    monkeypatch.delenv("BOOKING_DATES", raising=False)
+    assert days(booking_dates_from_env(TODAY)) == ["2026-10-19"]
+    assert days(booking_dates_from_env(TODAY, weekdays="Wed")) == ["2026-10-21"]
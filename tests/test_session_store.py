@@ -0,0 +1,130 @@
+import os
+import json
+import stat
+
+import pytest
+from cryptography.fernet import Fernet
+
+from deskbird.session_store import (
+    INDEXED_DB_CAPTURE_SCRIPT,
+    SessionStore,
+    capture_session,
+    open_session_store,
+    restore_session,
+)
+
+AUTH_ROW = {
+    "fbase_key": "firebase:authUser:key:[DEFAULT]",
+    "value": {"uid": "u1", "stsTokenManager": {"refreshToken": "refresh", "accessToken": "id-token"}},
+}
+
+
+@pytest.fixture
+def store(tmp_path):
+    return SessionStore(str(tmp_path / "session.enc"), Fernet.generate_key(), 3600)
+
+
+class FakeDriver:
+    """Records DevTools commands and answers the scripts capture_session runs"""
+
+    def __init__(self, url="https://app.deskbird.com/dashboard", cookies=(), local_storage=None, rows=None):
+        self.current_url = url
+        self.cookies = list(cookies)
+        self.local_storage = local_storage or {}
+        self.rows = rows or []
+        self.commands = []
+
+    def execute_cdp_cmd(self, command, params):
+        self.commands.append((command, params))
+        if command == "Network.getAllCookies":
+            return {"cookies": self.cookies}
+        if command == "Page.addScriptToEvaluateOnNewDocument":
+            return {"identifier": "7"}
+        return {}
+
+    def execute_script(self, script):
+        return self.local_storage
+
+    def execute_async_script(self, script):
+        assert script == INDEXED_DB_CAPTURE_SCRIPT
+        return self.rows
+
+
+def test_round_trip_is_encrypted_and_owner_only(store):
+    store.save([{"name": "sid", "value": "secret-cookie"}], {"token": "x"}, [AUTH_ROW])
+    with open(store.path, "rb") as f:
+        assert b"secret-cookie" not in f.read()
+    assert stat.S_IMODE(os.stat(store.path).st_mode) == 0o600
+
+    session = store.load()
+    assert session["cookies"] == [{"name": "sid", "value": "secret-cookie"}]
+    assert session["local_storage"] == {"token": "x"}
+    assert session["indexed_db"] == [AUTH_ROW]
+
+
+def test_corrupt_or_foreign_files_are_ignored(store):
+    with open(store.path, "wb") as f:
+        f.write(b"not a token")
+    assert store.load() is None
+
+    SessionStore(store.path, Fernet.generate_key(), 3600).save([], {})
+    assert store.load() is None
+    # Left in place, so a run with the right key could still use it
+    assert os.path.exists(store.path)
+
+
+def test_expired_session_is_removed(store, monkeypatch):
+    store.save([], {})
+    monkeypatch.setattr("deskbird.session_store.time.time", lambda: 1e12)
+    assert store.load() is None
+    assert not os.path.exists(store.path)
+
+
+def test_open_session_store_needs_a_valid_key(tmp_path, monkeypatch):
+    monkeypatch.delenv("SESSION_STORE_KEY", raising=False)
+    assert open_session_store(str(tmp_path / "session.enc")) is None
+    monkeypatch.setenv("SESSION_STORE_KEY", "not-a-fernet-key")
+    assert open_session_store(str(tmp_path / "session.enc")) is None
+    monkeypatch.setenv("SESSION_STORE_KEY", Fernet.generate_key().decode())
+    monkeypatch.setenv("SESSION_TTL_HOURS", "2")
+    assert open_session_store(str(tmp_path / "session.enc")).ttl_seconds == 7200
+
+
+def test_capture_keeps_session_cookies_and_firebase_rows(monkeypatch):
+    monkeypatch.delenv("DESKBIRD_APP_URL", raising=False)
+    driver = FakeDriver(
+        cookies=[
+            {"name": "sid", "value": "1", "domain": ".deskbird.com", "session": True, "expires": -1, "size": 4},
+            {"name": "ESTSAUTH", "value": "2", "domain": "login.microsoftonline.com", "expires": 1900000000},
+            {"name": "_ga", "value": "3", "domain": ".tracker.example"},
+        ],
+        local_storage={"lang": "en"},
+        rows=[AUTH_ROW],
+    )
+    cookies, local_storage, indexed_db = capture_session(driver)
+    assert cookies == [
+        {"name": "sid", "value": "1", "domain": ".deskbird.com"},
+        {"name": "ESTSAUTH", "value": "2", "domain": "login.microsoftonline.com", "expires": 1900000000},
+    ]
+    assert local_storage == {"lang": "en"}
+    assert indexed_db == [AUTH_ROW]
+
+
+def test_capture_skips_storage_off_the_app_origin(monkeypatch):
+    monkeypatch.delenv("DESKBIRD_APP_URL", raising=False)
+    driver = FakeDriver(url="https://login.microsoftonline.com/", local_storage={"lang": "en"}, rows=[AUTH_ROW])
+    assert capture_session(driver) == ([], {}, [])
+
+
+def test_restore_seeds_cookies_storage_and_auth_rows(store, monkeypatch):
+    monkeypatch.setenv("DESKBIRD_APP_URL", "http://localhost:8080/")
+    store.save([{"name": "sid", "value": "1"}], {"lang": "en"}, [AUTH_ROW])
+    driver = FakeDriver()
+    assert restore_session(driver, store.load()) == "7"
+
+    commands = dict(driver.commands)
+    assert commands["Network.setCookies"] == {"cookies": [{"name": "sid", "value": "1"}]}
+    script = commands["Page.addScriptToEvaluateOnNewDocument"]["source"]
+    assert 'window.location.origin === "http://localhost:8080"' in script
+    assert json.dumps([AUTH_ROW]) in script
+    assert json.dumps({"lang": "en"}) in script
@@ -0,0 +1,51 @@
+import base64
+
+import pytest
+
+from deskbird.totp import totp, fresh_code, seconds_remaining
+
+# RFC 6238 appendix B: the ASCII seed "1234567890" repeated to the key length of each digest
+SECRETS = {
+    "sha1": base64.b32encode(b"12345678901234567890").decode(),
+    "sha256": base64.b32encode(b"12345678901234567890123456789012").decode(),
+    "sha512": base64.b32encode(b"1234567890" * 6 + b"1234").decode(),
+}
+VECTORS = [
+    (59, "94287082", "46119246", "90693936"),
+    (1111111109, "07081804", "68084774", "25091201"),
+    (1111111111, "14050471", "67062674", "99943326"),
+    (1234567890, "89005924", "91819424", "93441116"),
+    (2000000000, "69279037", "90698825", "38618901"),
+    (20000000000, "65353130", "77737706", "47863826"),
+]
+
+
+@pytest.mark.parametrize("for_time, sha1, sha256, sha512", VECTORS)
+def test_rfc_6238_vectors(for_time, sha1, sha256, sha512):
+    for digest, expected in (("sha1", sha1), ("sha256", sha256), ("sha512", sha512)):
+        assert totp(SECRETS[digest], for_time, digits=8, digest=digest) == expected
+
+
+def test_secret_formatting_is_tolerated():
+    secret = SECRETS["sha1"]
+    spaced = " ".join(secret[i:i + 4] for i in range(0, len(secret), 4)).lower().rstrip("=")
+    assert totp(spaced, 59) == totp(secret, 59) == "287082"
+
+
+def test_fresh_code_waits_for_the_next_window():
+    now = [1111111109.0]
+    slept = []
+
+    def sleep(seconds):
+        slept.append(seconds)
+        now[0] += seconds
+
+    code = fresh_code(SECRETS["sha1"], min_remaining=5, clock=lambda: now[0], sleep=sleep)
+    assert slept and slept[0] == pytest.approx(seconds_remaining(1111111109.0) + 0.05)
+    assert code == totp(SECRETS["sha1"], now[0])
+    assert code != totp(SECRETS["sha1"], 1111111109)
+
+
+def test_fresh_code_uses_the_current_window_when_enough_is_left():
+    code = fresh_code(SECRETS["sha1"], min_remaining=5, clock=lambda: 1111111111.0, sleep=pytest.fail)
+    assert code == "050471"
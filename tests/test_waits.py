@@ -0,0 +1,63 @@
+import json
+import shutil
+import subprocess
+
+import pytest
+from selenium.common.exceptions import TimeoutException
+
+from deskbird.waits import NETWORK_ACTIVITY_SCRIPT, REQUEST_TRACKER_SCRIPT, wait_for_network_idle
+
+
+class FakePage:
+    """Replays [started, pending] readings for the network activity script"""
+
+    def __init__(self, readings):
+        self.readings = list(readings)
+        self.installed = False
+
+    def execute_script(self, script):
+        if script == REQUEST_TRACKER_SCRIPT:
+            self.installed = True
+            return None
+        assert script == NETWORK_ACTIVITY_SCRIPT
+        if not self.installed:
+            return None
+        return self.readings.pop(0) if len(self.readings) > 1 else self.readings[0]
+
+
+def test_waits_for_requests_in_flight():
+    page = FakePage([[1, 1], [2, 2], [2, 1], [2, 0]])
+    wait_for_network_idle(page, "lazy_cards", quiet_period=0.2, timeout=5)
+    assert page.installed
+    assert page.readings == [[2, 0]]
+
+
+def test_never_idle_while_a_request_hangs():
+    with pytest.raises(TimeoutException):
+        wait_for_network_idle(FakePage([[1, 1]]), "lazy_cards", quiet_period=0.1, timeout=0.5)
+
+
+@pytest.mark.skipif(not shutil.which("node"), reason="needs node to run the tracker script")
+def test_tracker_counts_fetch_and_xhr_until_they_finish():
+    harness = """
+    const listeners = [];
+    global.window = global;
+    global.fetch = () => new Promise(resolve => setTimeout(resolve, 20));
+    global.XMLHttpRequest = function () {};
+    XMLHttpRequest.prototype.addEventListener = (name, callback) => listeners.push(callback);
+    XMLHttpRequest.prototype.send = () => {};
+    const activity = () => (function () { %(activity)s })();
+    %(tracker)s
+    %(tracker)s
+    const readings = [];
+    fetch("/desks").then(() => {
+        readings.push(activity());
+        listeners.forEach(callback => callback());
+        readings.push(activity());
+        console.log(JSON.stringify(readings));
+    });
+    new XMLHttpRequest().send();
+    readings.push(activity());
+    """ % {"tracker": REQUEST_TRACKER_SCRIPT, "activity": NETWORK_ACTIVITY_SCRIPT}
+    output = subprocess.run(["node", "-e", harness], capture_output=True, text=True, check=True).stdout
+    assert json.loads(output) == [[2, 2], [2, 1], [2, 0]]